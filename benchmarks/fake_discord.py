@@ -0,0 +1,172 @@
+import asyncio
+import random
+from collections import Counter
+
+
+class FakeRateLimited(Exception):
+    """Discordの429応答を模した例外"""
+
+    status = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class FakeChannel:
+    def __init__(self, discord, channel_id: int, name: str = None, guild=None):
+        self.discord = discord
+        self.id = channel_id
+        self.name = name or f"channel-{channel_id}"
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+
+    async def send(self, content=None, *, embed=None, nonce=None, **kwargs):
+        await self.discord.call("send_message")
+        self.discord.sent.append((self.id, nonce))
+
+
+class FakeUser:
+    def __init__(self, discord, user_id: int):
+        self.discord = discord
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.display_name = f"user-{user_id}"
+        self.dm_channel = None
+
+    async def create_dm(self):
+        await self.discord.call("create_dm")
+        self.dm_channel = FakeChannel(self.discord, self.id + 1)
+        return self.dm_channel
+
+
+class FakeGuild:
+    def __init__(self, discord, guild_id: int, channel_ids, member_ids):
+        self.discord = discord
+        self.id = guild_id
+        self.text_channels = [FakeChannel(discord, channel_id, guild=self) for channel_id in channel_ids]
+        self._channels = {channel.id: channel for channel in self.text_channels}
+        self._members = {member_id: FakeUser(discord, member_id) for member_id in member_ids}
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+    def get_member(self, user_id: int):
+        if self.discord.random.random() >= self.discord.member_cache_ratio:
+            return None
+        return self._members.get(user_id)
+
+    async def fetch_member(self, user_id: int):
+        await self.discord.call("fetch_member")
+        return self._members.get(user_id)
+
+
+class FakeResponse:
+    def __init__(self):
+        self.messages = []
+        self.edits = []
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append(content)
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.edits.append(kwargs)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content or kwargs.get("embed"))
+
+
+class FakeInteraction:
+    """スラッシュコマンドのコールバックに渡すための最小限のInteraction"""
+
+    def __init__(self, user, guild, channel):
+        self.user = user
+        self.guild = guild
+        self.channel = channel
+        self.command = None
+        self.message = None
+        self.client = None
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    async def edit_original_response(self, **kwargs):
+        self.followup.messages.append(kwargs.get("embed"))
+
+
+class FakeDiscord:
+    """ボットが使うDiscord APIを、遅延と429応答を設定できるインプロセスの偽物に差し替える"""
+
+    def __init__(self, guild_count: int = 10, channels_per_guild: int = 5, members_per_guild: int = 50,
+                 latency: float = 0.05, rate_limit_ratio: float = 0.0, retry_after: float = 0.5,
+                 member_cache_ratio: float = 0.5, rate_limited_endpoints=("send_message",), seed: int = 0):
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.member_cache_ratio = member_cache_ratio
+        self.rate_limited_endpoints = frozenset(rate_limited_endpoints)
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.sent = []
+        self.guilds = {}
+        self._channels = {}
+        self._users = {}
+        for index in range(guild_count):
+            guild_id = (10 ** 17) + index * 1_000_003
+            channel_ids = [guild_id + 1000 + offset for offset in range(channels_per_guild)]
+            member_ids = [guild_id + 100_000 + offset * 2 for offset in range(members_per_guild)]
+            guild = FakeGuild(self, guild_id, channel_ids, member_ids)
+            self.guilds[guild_id] = guild
+            self._channels.update((channel.id, channel) for channel in guild.text_channels)
+            self._users.update(guild._members)
+
+    @property
+    def users(self):
+        return list(self._users.values())
+
+    async def call(self, endpoint: str):
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if endpoint in self.rate_limited_endpoints and self.random.random() < self.rate_limit_ratio:
+            self.rate_limited[endpoint] += 1
+            raise FakeRateLimited(self.retry_after)
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+    def get_user(self, user_id: int):
+        return None
+
+    async def fetch_user(self, user_id: int):
+        await self.call("fetch_user")
+        return self._users.get(user_id)
+
+    async def fetch_channel(self, channel_id: int):
+        await self.call("fetch_channel")
+        return self._channels.get(channel_id)
+
+    def get_partial_messageable(self, channel_id: int, guild_id: int = None):
+        return self._channels.get(channel_id) or FakeChannel(self, channel_id)
+
+    def install(self, bot):
+        """discord.Client のインスタンスのAPIをこの偽物に差し替える"""
+        for name in ("get_guild", "get_channel", "get_user", "fetch_user", "fetch_channel", "get_partial_messageable"):
+            setattr(bot, name, getattr(self, name))
@@ -0,0 +1,105 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+from dateutil.parser import parse as dateutil_parse
+
+from remind.timeutil import TIMEZONE
+
+
+def legacy_parse_time_string(time_str: str, now: datetime):
+    """正規表現を順に試す旧実装の parse_time_string。ベンチマークの比較用"""
+    time_str_lower = time_str.lower()
+    trigger_time = None
+    is_recurring = False
+    recurrence_rule_str = None
+
+    match = re.fullmatch(r"(\d{4})/(\d{1,2})/(\d{1,2})\s+(\d{1,2}):(\d{1,2})", time_str)
+    if match:
+        try:
+            year, month, day, hour, minute = map(int, match.groups())
+            trigger_time = datetime(year, month, day, hour, minute, tzinfo=TIMEZONE)
+            if trigger_time < now:
+                 trigger_time += timedelta(days=1)
+            return trigger_time, False, None
+        except ValueError:
+            pass
+
+    match = re.fullmatch(r"(\d{1,2}):(\d{1,2})", time_str)
+    if match:
+        try:
+            hour, minute = map(int, match.groups())
+            trigger_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if trigger_time < now:
+                trigger_time += timedelta(days=1)
+            return trigger_time, False, None
+        except ValueError:
+            pass
+
+    match = re.fullmatch(r"in\s+(\d+)\s+(minutes?|min|m|hours?|h|days?|d|seconds?|sec|s)", time_str_lower)
+    if match:
+        value = int(match.group(1))
+        unit = match.group(2)
+        delta = timedelta()
+        if unit.startswith("minute") or unit == "min" or unit == "m":
+            delta = timedelta(minutes=value)
+        elif unit.startswith("hour") or unit == "h":
+            delta = timedelta(hours=value)
+        elif unit.startswith("day") or unit == "d":
+            delta = timedelta(days=value)
+        elif unit.startswith("second") or unit == "sec" or unit == "s":
+            delta = timedelta(seconds=value)
+        trigger_time = now + delta
+        return trigger_time, False, None
+
+    match = re.fullmatch(r"tomorrow\s+at\s+(\d{1,2}):(\d{1,2})", time_str_lower)
+    if match:
+        hour, minute = map(int, match.groups())
+        trigger_time = (now + timedelta(days=1)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return trigger_time, False, None
+
+    match = re.fullmatch(r"every\s+day\s+at\s+(\d{1,2}):(\d{1,2})", time_str_lower)
+    if match:
+        hour, minute = map(int, match.groups())
+        trigger_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if trigger_time < now:
+            trigger_time += timedelta(days=1)
+        recurrence_rule_str = f"FREQ=DAILY;BYHOUR={hour};BYMINUTE={minute}"
+        return trigger_time, True, recurrence_rule_str
+
+    weekdays = {"monday": "MO", "tuesday": "TU", "wednesday": "WE", "thursday": "TH", "friday": "FR", "saturday": "SA", "sunday": "SU"}
+    weekday_pattern = "|".join(weekdays.keys())
+    match = re.fullmatch(rf"every\s+({weekday_pattern})\s+at\s+(\d{{1,2}}):(\d{{1,2}})", time_str_lower)
+    if match:
+        day_name_str = match.group(1)
+        hour, minute = map(int, match.group(2,3))
+        target_weekday_ical = weekdays[day_name_str]
+        trigger_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        current_weekday_num = trigger_time.weekday()
+        py_weekdays_map = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+        target_weekday_num = py_weekdays_map[target_weekday_ical]
+        days_ahead = target_weekday_num - current_weekday_num
+        if days_ahead < 0 or (days_ahead == 0 and trigger_time < now) :
+            days_ahead += 7
+        trigger_time += timedelta(days=days_ahead)
+        recurrence_rule_str = f"FREQ=WEEKLY;BYDAY={target_weekday_ical};BYHOUR={hour};BYMINUTE={minute}"
+        return trigger_time, True, recurrence_rule_str
+
+    try:
+        parsed_dt_naive = dateutil_parse(time_str, default=now.replace(tzinfo=None))
+        if parsed_dt_naive.tzinfo is None:
+            trigger_time = TIMEZONE.localize(parsed_dt_naive)
+        else:
+            trigger_time = parsed_dt_naive.astimezone(TIMEZONE)
+
+        if trigger_time < now:
+            if (parsed_dt_naive.hour == trigger_time.hour and
+                parsed_dt_naive.minute == trigger_time.minute and
+                parsed_dt_naive.second == trigger_time.second and
+                parsed_dt_naive.date() == now.date()):
+                trigger_time += timedelta(days=1)
+
+        return trigger_time, False, None
+    except (ValueError, OverflowError) as e:
+        logging.debug(f"dateutil.parserでの時刻パース失敗: {time_str}, error: {e}")
+        return None, False, None
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_discord import FakeDiscord, FakeInteraction
+from remind.storage import BACKENDS
+
+RESULT_VERSION = 1
+
+
+class FastForwardClock:
+    """実時間に、待機中にスキップした時間を足した仮想時計。処理中の配信がなければ待機を即座に終える"""
+
+    def __init__(self, idle):
+        self.idle = idle
+        self.skipped = 0.0
+
+    def time(self) -> float:
+        return time.time() + self.skipped
+
+    async def sleep(self, delay: float):
+        if self.idle():
+            self.skipped += delay
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(min(delay, 0.01))
+
+
+def percentiles(samples, points=(0.5, 0.95, 0.99)) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {f"p{int(point * 100)}": None for point in points} | {"max": None}
+    result = {f"p{int(point * 100)}": samples[min(len(samples) - 1, int(point * len(samples)))] for point in points}
+    result["max"] = samples[-1]
+    return result
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_rows(discord: FakeDiscord, count: int, start: int, horizon: int, overdue_ratio: float,
+                   recurring_ratio: float, user_target_ratio: float, rng: random.Random):
+    guilds = list(discord.guilds.values())
+    for index in range(count):
+        guild = guilds[index % len(guilds)]
+        author = rng.choice(list(guild._members))
+        if rng.random() < overdue_ratio:
+            fire_at = start - rng.randint(1, 3600)
+        else:
+            fire_at = start + rng.randint(0, horizon)
+        if rng.random() < user_target_ratio:
+            target_type, target_id = "user", author
+        else:
+            target_type, target_id = "channel", rng.choice(guild.text_channels).id
+        recurring = rng.random() < recurring_ratio
+        rule = f"FREQ=DAILY;BYHOUR={time.localtime(fire_at).tm_hour};BYMINUTE={time.localtime(fire_at).tm_min}" if recurring else None
+        yield (str(author), str(guild.id), str(guild.text_channels[0].id), target_type, str(target_id),
+               f"load test {index}", fire_at, fire_at, recurring, rule, "2024-01-01 00:00:00", 0)
+
+
+def seed_sqlite(db_path: str, rows, batch_size: int = 10_000):
+    """合成リマインドを executemany で一括投入する"""
+    from remind.migrations import migrate
+    from remind.repository import INSERT_REMINDER_SQL
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    migrate(conn)
+    with conn:
+        while True:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            conn.executemany(INSERT_REMINDER_SQL, batch)
+    conn.close()
+
+
+async def seed_store(store, rows, batch_size: int = 10_000):
+    """合成リマインドをリポジトリの add_many で投入する"""
+    await store.open()
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        await store.add_many(batch)
+
+
+async def run_commands(app, discord: FakeDiscord, count: int, rng: random.Random) -> dict:
+    """/remind set, list, delete のコールバックを偽のInteractionで呼び出し、所要時間を計測する"""
+    latencies = {"set": [], "list": [], "delete": []}
+    group = app.remind_commands
+    created = []
+    guilds = list(discord.guilds.values())
+    times = ["in 1 minute", "2分後", "in 3m", "1分30秒後"]
+    for index in range(count):
+        guild = guilds[index % len(guilds)]
+        author = rng.choice(list(guild._members.values()))
+        interaction = FakeInteraction(author, guild, guild.text_channels[0])
+        target = "@me" if index % 2 else f"#{guild.text_channels[0].name}"
+        started = time.perf_counter()
+        await group.set_reminder.callback(group, interaction, target, times[index % len(times)], f"command {index}")
+        latencies["set"].append(time.perf_counter() - started)
+        message = interaction.response.messages[-1] if interaction.response.messages else ""
+        if "ID: `" in message:
+            created.append((author, guild, int(message.split("ID: `")[1].split("`")[0])))
+
+        interaction = FakeInteraction(author, guild, guild.text_channels[0])
+        started = time.perf_counter()
+        await group.list_reminders.callback(group, interaction)
+        latencies["list"].append(time.perf_counter() - started)
+
+    deleted = 0
+    for author, guild, reminder_id in created[::2]:
+        interaction = FakeInteraction(author, guild, guild.text_channels[0])
+        started = time.perf_counter()
+        await group.delete_reminder.callback(group, interaction, reminder_id)
+        latencies["delete"].append(time.perf_counter() - started)
+        deleted += 1
+    return {
+        "created": len(created),
+        "deleted": deleted,
+        "latency_seconds": {name: {"count": len(samples)} | percentiles(samples) for name, samples in latencies.items()},
+    }
+
+
+async def run(args) -> dict:
+    """シード投入、起動、コマンド実行、早送りした時計での配信を行い、計測結果を返す"""
+    from remind.app import create_app
+    from remind.settings import Settings
+
+    app = create_app(Settings.from_env(send_global_rate=args.global_rate, send_route_rate=args.route_rate,
+                                       dispatch_concurrency=args.concurrency, metrics_port=0, db_path=args.db,
+                                       storage_backend=args.storage))
+    logging.getLogger().setLevel(args.log_level)
+
+    rng = random.Random(args.seed)
+    discord = FakeDiscord(guild_count=args.guilds, channels_per_guild=args.channels, members_per_guild=args.members,
+                          latency=args.latency, rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after,
+                          seed=args.seed)
+    discord.install(app)
+
+    start = int(time.time())
+    started = time.perf_counter()
+    rows = synthetic_rows(discord, args.reminders, start, args.horizon, args.overdue_ratio, args.recurring_ratio,
+                          args.user_target_ratio, rng)
+    if args.storage == "sqlite":
+        seed_sqlite(args.db, rows)
+    else:
+        await seed_store(app.repository, rows)
+    seed_seconds = time.perf_counter() - started
+
+    clock = FastForwardClock(lambda: not app.engine.firing and app.send_queue.depth == 0)
+    app.engine.clock = clock.time
+    app.engine.sleep = clock.sleep
+    app.dispatcher.clock = clock.time
+    lags = []
+    expected = None
+    finished = asyncio.Event()
+    send_reminder = app.dispatcher.deliver
+    send_digest = app.dispatcher.deliver_digest
+
+    def record(rows):
+        lags.extend(clock.time() - row['next_fire_at'] for row in rows)
+        if expected is not None and len(lags) >= expected:
+            finished.set()
+
+    async def deliver(row, key):
+        done = await send_reminder(row, key)
+        record([row])
+        return done
+
+    async def deliver_digest(rows, key):
+        done = await send_digest(rows, key)
+        record(rows)
+        return done
+
+    app.dispatcher.deliver = deliver
+    if send_digest is not None:
+        app.dispatcher.deliver_digest = deliver_digest
+
+    started = time.perf_counter()
+    await app.repository.open()
+    app.send_queue.start()
+    await app.engine.start()
+    startup_seconds = time.perf_counter() - started
+    loaded = len(app.engine)
+    dispatch_started = time.perf_counter()
+
+    commands = await run_commands(app, discord, args.commands, rng)
+    expected = args.reminders + commands["created"] - commands["deleted"]
+
+    if len(lags) >= expected:
+        finished.set()
+    try:
+        await asyncio.wait_for(finished.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        pass
+    dispatch_seconds = time.perf_counter() - dispatch_started
+
+    await app.engine.stop()
+    await app.send_queue.stop()
+    await app.repository.close()
+
+    return {
+        "version": RESULT_VERSION,
+        "parameters": vars(args),
+        "seed_seconds": seed_seconds,
+        "startup_seconds": startup_seconds,
+        "loaded_at_startup": loaded,
+        "peak_rss_mb": peak_rss_mb(),
+        "expected_deliveries": expected,
+        "deliveries": len(lags),
+        "completed": len(lags) >= expected,
+        "dispatch_seconds": dispatch_seconds,
+        "throughput_per_second": len(lags) / dispatch_seconds if dispatch_seconds else None,
+        "virtual_seconds_skipped": clock.skipped,
+        "fire_lag_seconds": percentiles(lags),
+        "commands": commands,
+        "rest_calls": dict(discord.calls),
+        "rate_limited": dict(discord.rate_limited),
+        "messages_sent": len(discord.sent),
+        "send_queue": app.send_queue.stats(),
+        "target_cache": app.target_resolver.stats(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="偽のDiscordクライアントと早送りした時計でボットの負荷試験を行い、結果をJSONで出力する")
+    parser.add_argument("--reminders", type=int, default=10_000)
+    parser.add_argument("--horizon", type=int, default=300, help="発火時刻を散らす範囲 (秒)")
+    parser.add_argument("--overdue-ratio", type=float, default=0.0, help="起動時点で発火時刻を過ぎている割合")
+    parser.add_argument("--recurring-ratio", type=float, default=0.1)
+    parser.add_argument("--user-target-ratio", type=float, default=0.3)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="偽のREST呼び出しの遅延 (秒)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="送信が429になる確率")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--global-rate", type=int, default=1000)
+    parser.add_argument("--route-rate", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--storage", choices=BACKENDS, default="sqlite", help="リマインドの保存先")
+    parser.add_argument("--db", default=None, help="SQLiteファイルのパス (省略時は一時ファイル)")
+    parser.add_argument("--output", default=None, help="結果JSONの出力先 (省略時は標準出力)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.db is None:
+            args.db = os.path.join(directory, "reminders.db")
+        result = asyncio.run(run(args))
+    output = json.dumps(result, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if result["completed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RESULT_VERSION = 1
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_MODULES = ("bot", "remind.settings", "remind.time_parser", "remind.recurrence", "remind.repository", "remind.app")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": len(sys.modules), "discord": "discord" in sys.modules}}))
+"""
+
+COLD_START_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from remind.app import create_app
+from remind.settings import Settings
+imported = time.perf_counter()
+
+
+async def main():
+    app = create_app(Settings(db_path={db_path!r}, prefetch_seconds=0))
+    built = time.perf_counter()
+    await app.repository.open()
+    await app.engine.start()
+    ready = time.perf_counter()
+    await app.engine.stop()
+    await app.repository.close()
+    return built, ready
+
+
+built, ready = asyncio.run(main())
+print(json.dumps({{"import_seconds": imported - started, "build_seconds": built - imported,
+                  "open_seconds": ready - built, "seconds": ready - started}}))
+"""
+
+
+def run_script(script: str) -> dict:
+    """新しいインタプリタでスクリプトを実行し、出力したJSONにプロセス全体の所要時間を加えて返す"""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    lines = completed.stdout.strip().splitlines()
+    return (json.loads(lines[-1]) if lines else {}) | {"process_seconds": elapsed}
+
+
+def summarize(samples) -> dict:
+    return {"min": min(samples), "median": statistics.median(samples), "max": max(samples)}
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    """モジュールを空のインタプリタから読み込む時間を計測する"""
+    runs = [run_script(IMPORT_SCRIPT.format(module=module)) for _ in range(repeat)]
+    return {"seconds": summarize([run["seconds"] for run in runs]),
+            "process_seconds": summarize([run["process_seconds"] for run in runs]),
+            "modules": runs[-1]["modules"], "imports_discord": runs[-1]["discord"]}
+
+
+def measure_cold_start(repeat: int, directory: str) -> dict:
+    """ボットの組み立てから DB のオープン、スケジューラの起動までを空のインタプリタで計測する"""
+    runs = []
+    for index in range(repeat):
+        db_path = os.path.join(directory, f"cold-start-{index}.db")
+        runs.append(run_script(COLD_START_SCRIPT.format(db_path=db_path)))
+    return {key: summarize([run[key] for run in runs]) for key in runs[0]}
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        return {
+            "version": RESULT_VERSION,
+            "python": sys.version.split()[0],
+            "parameters": vars(args),
+            "interpreter_seconds": summarize([run_script("pass")["process_seconds"] for _ in range(args.repeat)]),
+            "imports": {module: measure_import(module, args.repeat) for module in args.modules},
+            "cold_start": measure_cold_start(args.repeat, directory),
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="モジュールの読み込み時間と、Discordに接続しないボットの起動時間を計測し、結果をJSONで出力する")
+    parser.add_argument("--repeat", type=int, default=5, help="各計測を新しいプロセスで繰り返す回数")
+    parser.add_argument("--modules", nargs="+", default=list(DEFAULT_MODULES))
+    parser.add_argument("--output", default=None, help="結果JSONの出力先 (省略時は標準出力)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from remind.storage import BACKENDS, create_store
+
+RESULT_VERSION = 1
+START = 1_700_000_000
+
+
+def synthetic_rows(count: int, horizon: int, users: int, guilds: int, recurring_ratio: float, rng: random.Random):
+    for index in range(count):
+        guild_id = str((index % guilds + 1) << 22)
+        user_id = str(rng.randrange(users))
+        fire_at = START + rng.randint(1, horizon)
+        recurring = rng.random() < recurring_ratio
+        yield (user_id, guild_id, "100", "user", user_id, f"bench {index}", fire_at, fire_at, recurring,
+               "FREQ=DAILY" if recurring else None, None, 0)
+
+
+async def measure_backend(backend: str, args, directory: str) -> dict:
+    """1つの保存先で投入・発火範囲の走査・クレームと完了・一覧を行い、各段階の所要時間を返す"""
+    store = create_store(backend, os.path.join(directory, f"{backend}.db"))
+    await store.open()
+    rng = random.Random(args.seed)
+    rows = list(synthetic_rows(args.reminders, args.horizon, args.users, args.guilds, args.recurring_ratio, rng))
+    phases = {}
+    try:
+        started = time.perf_counter()
+        for offset in range(0, len(rows), args.batch):
+            await store.add_many(rows[offset:offset + args.batch])
+        phases["insert"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        due = []
+        for after in range(START, START + args.horizon, args.window):
+            due.extend(await store.list_due_between(after, after + args.window))
+        phases["scan"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for offset in range(0, len(due), args.batch):
+            batch = due[offset:offset + args.batch]
+            firings = [(row["id"], row["next_fire_at"], f"{row['id']}:{row['next_fire_at']}") for row in batch]
+            token = f"t{offset}"
+            claimed = set(await store.claim_deliveries(firings, "bench", token, START, START - 300))
+            loaded = {row["id"]: row for row in await store.get_many(claimed)}
+            finished = [(reminder_id, key, fire_at + 86400 if loaded[reminder_id]["is_recurring"] else None)
+                        for reminder_id, fire_at, key in firings if reminder_id in loaded]
+            await store.complete(token, finished, START, prune_before=START - 86400)
+        phases["dispatch"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for user in range(args.users):
+            for guild in range(args.guilds):
+                await store.list_active_page_for_user(str(user), str((guild + 1) << 22), START)
+        phases["list"] = time.perf_counter() - started
+        remaining = len(await store.list_due_between(START, START + 2 * 86400 + args.horizon))
+    finally:
+        await store.close()
+    counts = {"insert": len(rows), "scan": len(due), "dispatch": len(due), "list": args.users * args.guilds}
+    return {
+        "seconds": phases,
+        "per_second": {phase: counts[phase] / seconds for phase, seconds in phases.items() if seconds},
+        "due": len(due),
+        "remaining": remaining,
+    }
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        return {
+            "version": RESULT_VERSION,
+            "parameters": vars(args),
+            "backends": {backend: await measure_backend(backend, args, directory) for backend in args.backends},
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="保存先ごとに投入・発火範囲の走査・クレームと完了・一覧の速度を比較し、結果をJSONで出力する")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--reminders", type=int, default=50_000)
+    parser.add_argument("--horizon", type=int, default=3600, help="発火時刻を散らす範囲 (秒)")
+    parser.add_argument("--window", type=int, default=60, help="発火範囲を走査する幅 (秒)")
+    parser.add_argument("--batch", type=int, default=500, help="投入・クレームの1回あたりの件数")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--recurring-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="結果JSONの出力先 (省略時は標準出力)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime
+
+import discord
+from discord.ext import commands, tasks
+
+from remind.command_sync import sync_if_changed
+from remind.commands import RemindCommands
+from remind.delivery import ReminderDelivery
+from remind.dispatch import Dispatcher
+from remind.engine import ReminderEngine
+from remind.leases import LeaseManager, shard_of
+from remind.metrics import REGISTRY, MetricsServer
+from remind.quotas import Quotas
+from remind.send_queue import DISCORD_REST_SECONDS, SendQueue
+from remind.settings import Settings
+from remind.snooze import ReminderActionButton
+from remind.storage import create_store
+from remind.targets import TargetResolver
+
+COMMAND_SECONDS = REGISTRY.histogram("remind_command_seconds", "スラッシュコマンドの受信から処理完了までの時間", ("command",))
+COMMAND_RESULTS = REGISTRY.counter("remind_commands_total", "スラッシュコマンドの実行回数 (結果別)", ("command", "result"))
+REMINDERS_PURGED = REGISTRY.counter("remind_reminders_purged_total", "サーバー・チャンネル・メンバーがなくなったために削除したリマインドの件数 (理由別)", ("reason",))
+HISTORY_PRUNED = REGISTRY.counter("remind_history_pruned_total", "保持期間を過ぎて削除した配信履歴の件数")
+DONE_PRUNED = REGISTRY.counter("remind_done_reminders_pruned_total", "スヌーズできる期間を過ぎて削除した配信済みの単発リマインドの件数")
+DB_VACUUMED_PAGES = REGISTRY.counter("remind_db_vacuumed_pages_total", "incremental_vacuum で切り詰めた空きページ数")
+
+
+class RemindBot(commands.Bot):
+    """設定から各コンポーネントを組み立て、Discordのイベントとスラッシュコマンドに結びつけるボット本体"""
+
+    def __init__(self, settings: Settings, **options):
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.members = True
+        super().__init__(command_prefix=commands.when_mentioned_or("!"), intents=intents, **options)
+        self.settings = settings
+        self.repository = create_store(settings.storage_backend, settings.db_path, settings.db_busy_timeout_ms,
+                                       settings.db_vacuum_on_open)
+        self.quotas = Quotas.from_settings(settings)
+        self.target_resolver = TargetResolver(self, maxsize=settings.target_cache_size, ttl=settings.target_cache_ttl)
+        self.send_queue = SendQueue(route_rate=settings.send_route_rate, route_per=settings.send_route_per,
+                                    global_rate=settings.send_global_rate, global_per=settings.send_global_per,
+                                    max_attempts=settings.send_max_attempts)
+        self.lease_manager = LeaseManager(
+            self.repository, settings.shard_count, preferred=settings.shard_ids or range(settings.shard_count),
+            ttl=settings.lease_ttl_seconds, renew_interval=settings.lease_renew_interval,
+            on_change=self.load_claimed_shards) if settings.shard_count else None
+        self.delivery = ReminderDelivery(self, settings, self.target_resolver, self.send_queue, self.repository, self.lease_manager)
+        self.dispatcher = Dispatcher(
+            self.repository, self.delivery.send_reminder, concurrency=settings.dispatch_concurrency,
+            on_missing=self.unschedule_many, on_advanced=lambda reminder_id, fire_at: self.engine.schedule(reminder_id, fire_at),
+            owns=self.delivery.owns if self.lease_manager else None,
+            owner=self.lease_manager.owner if self.lease_manager else None,
+            claim_timeout=settings.delivery_claim_timeout, retention=settings.delivery_retention_seconds,
+            deliver_digest=self.delivery.send_digest if settings.digest_enabled else None, digest_size=settings.digest_max_items,
+            snoozable=self.delivery.snoozable, on_undelivered=lambda pairs: self.engine.schedule_many(pairs),
+            retry_delay=settings.delivery_retry_seconds, max_attempts=settings.delivery_max_attempts,
+            lookahead=settings.digest_window_seconds if settings.digest_enabled else 0,
+            max_retry_delay=min(settings.delivery_retry_max_seconds,
+                                settings.scheduler_window_seconds - settings.scheduler_refill_interval))
+        self.engine = ReminderEngine(
+            self.repository, self.dispatch_due,
+            window_seconds=settings.scheduler_window_seconds, refill_interval=settings.scheduler_refill_interval,
+            scope=self.lease_manager.scope if self.lease_manager else None, max_batch=settings.dispatch_max_batch,
+            lookahead=settings.digest_window_seconds if settings.digest_enabled else 0,
+            prefetch=self.delivery.prewarm_targets if settings.prefetch_seconds > 0 else None,
+            prefetch_seconds=settings.prefetch_seconds, sweep_seconds=settings.scheduler_sweep_seconds)
+        self.metrics_server = MetricsServer(REGISTRY, settings.metrics_host, settings.metrics_port) if settings.metrics_port else None
+        self.maintain_history = tasks.loop(seconds=max(settings.history_prune_interval, 1))(self.prune_history)
+        self.reconcile_orphans = tasks.loop(seconds=max(settings.reconcile_interval_seconds, 1))(self.purge_orphans)
+        self.remind_commands = RemindCommands(self)
+        self.tree.add_command(self.remind_commands)
+        self.tree.error(self.on_app_command_error)
+        self.add_dynamic_items(ReminderActionButton)
+
+        REGISTRY.gauge("remind_engine_pending", "スケジューラの時間窓に読み込まれている予定の件数", lambda: len(self.engine))
+        REGISTRY.gauge("remind_send_queue_depth", "送信キューで待機中の送信の件数", lambda: self.send_queue.depth)
+        REGISTRY.gauge("remind_send_queue_in_flight", "送信中の件数", lambda: self.send_queue.stats()["in_flight"])
+        if self.lease_manager is not None:
+            REGISTRY.gauge("remind_owned_shards", "このプロセスが配信を担当しているシャードの数", lambda: len(self.lease_manager.owned))
+
+    async def setup_hook(self):
+        settings = self.settings
+        guild_obj = None
+        if settings.discord_test_guild_id:
+            try:
+                guild_obj = discord.Object(id=int(settings.discord_test_guild_id))
+                self.tree.copy_global_to(guild=guild_obj)
+            except ValueError:
+                logging.error(f"環境変数 DISCORD_TEST_GUILD_ID の値が無効です: {settings.discord_test_guild_id}。グローバル同期にフォールバックします。")
+        scope = f"テストギルド {guild_obj.id}" if guild_obj else "グローバル"
+        if await sync_if_changed(self.tree, settings.command_sync_state_path, guild=guild_obj, force=settings.command_sync_force):
+            logging.info(f"コマンドを{scope}に同期しました。" + ("" if guild_obj else "反映に時間がかかる場合があります。"))
+        else:
+            logging.info(f"コマンドの定義に変更がないため、{scope}への同期を省略しました。")
+
+    async def close(self):
+        self.reconcile_orphans.cancel()
+        self.maintain_history.cancel()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.engine.stop()
+        if self.lease_manager is not None:
+            await self.lease_manager.stop()
+        await self.send_queue.stop()
+        await self.repository.close()
+        await super().close()
+
+    def unschedule_many(self, reminder_ids):
+        for reminder_id in reminder_ids:
+            self.engine.cancel(reminder_id)
+
+    async def load_claimed_shards(self, claimed, lost):
+        await self.engine.load_shards(claimed)
+
+    async def dispatch_due(self, reminder_ids):
+        """エンジンが発火したリマインドを配信し、送信キューの状況を記録する"""
+        await self.dispatcher.dispatch(reminder_ids)
+        logging.info(f"{len(reminder_ids)} 件のリマインドを配信しました。送信キュー: {self.send_queue.stats()}, 宛先キャッシュ: {self.target_resolver.stats()}")
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        COMMAND_SECONDS.observe((discord.utils.utcnow() - interaction.created_at).total_seconds(), command.qualified_name)
+        COMMAND_RESULTS.inc(command.qualified_name, "ok")
+
+    async def on_app_command_error(self, interaction: discord.Interaction, error: discord.app_commands.AppCommandError):
+        name = interaction.command.qualified_name if interaction.command else "unknown"
+        COMMAND_SECONDS.observe((discord.utils.utcnow() - interaction.created_at).total_seconds(), name)
+        COMMAND_RESULTS.inc(name, "error")
+        logging.error(f"コマンド {name} の実行中にエラーが発生しました: {error}", exc_info=error)
+
+    async def on_ready(self):
+        settings = self.settings
+        logging.info(f'{self.user} としてログインしました。')
+        await self.repository.open()
+        if self.lease_manager is not None:
+            await self.lease_manager.start()
+            logging.info(f"プロセス {self.lease_manager.owner} がシャード {sorted(self.lease_manager.owned)} / {settings.shard_count} の配信を担当します。")
+        self.send_queue.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+            logging.info(f"メトリクスを http://{settings.metrics_host}:{settings.metrics_port}/metrics で公開しています。")
+        await self.engine.start()
+        if settings.reconcile_interval_seconds and not self.reconcile_orphans.is_running():
+            self.reconcile_orphans.start()
+        if settings.history_prune_interval and not self.maintain_history.is_running():
+            self.maintain_history.start()
+        logging.info(f"スケジューラを開始し、未配信の過去分と直近 {settings.scheduler_window_seconds} 秒のリマインド {len(self.engine)} 件を読み込みました。")
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.target_resolver.invalidate_user(after.id)
+
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        self.target_resolver.invalidate_user(after.id)
+
+    async def on_member_remove(self, member: discord.Member):
+        self.target_resolver.invalidate_user(member.id)
+        await self.purge_reminders(await self.repository.purge_targets([(member.guild.id, 'user', member.id)]), "member_remove")
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        await self.purge_reminders(await self.repository.purge_guilds([guild.id]), "guild_remove")
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        await self.purge_reminders(await self.repository.purge_targets([(channel.guild.id, 'channel', channel.id)]), "channel_delete")
+
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
+        await self.purge_reminders(await self.repository.purge_targets([(payload.guild_id, 'channel', payload.thread_id)]), "channel_delete")
+
+    async def purge_reminders(self, reminder_ids, reason: str):
+        """削除済みのリマインドをスケジューラからまとめて取り除く"""
+        if not reminder_ids:
+            return
+        self.unschedule_many(reminder_ids)
+        REMINDERS_PURGED.inc(reason, amount=len(reminder_ids))
+        logging.info(f"{reason} により {len(reminder_ids)} 件のリマインドを削除しました: {reminder_ids}")
+
+    def handles_gateway_guild(self, guild_id: int) -> bool:
+        """このプロセスのゲートウェイ接続がサーバーのイベントを受け取るかを返す"""
+        shard_count = self.settings.shard_count
+        return not shard_count or self.shard_ids is None or shard_of(guild_id, shard_count) in self.shard_ids
+
+    async def target_exists(self, guild: discord.Guild, target_type: str, target_id: int) -> bool:
+        """キャッシュにない宛先をRESTで確かめる。NotFound以外のエラーは存在するものとして扱う"""
+        try:
+            if target_type == 'channel':
+                if guild.get_channel_or_thread(target_id) is not None:
+                    return True
+                with DISCORD_REST_SECONDS.time("fetch_channel"):
+                    await self.fetch_channel(target_id)
+            else:
+                if not guild.chunked or guild.get_member(target_id) is not None:
+                    return True
+                with DISCORD_REST_SECONDS.time("fetch_member"):
+                    await guild.fetch_member(target_id)
+        except discord.NotFound:
+            return False
+        except discord.HTTPException:
+            return True
+        return True
+
+    async def guild_left(self, guild_id: int) -> bool:
+        """キャッシュにないサーバーから本当に退出したかをRESTで確かめる。確かめられない場合は退出していないとみなす"""
+        try:
+            with DISCORD_REST_SECONDS.time("fetch_guild"):
+                await self.fetch_guild(guild_id, with_counts=False)
+        except (discord.NotFound, discord.Forbidden):
+            return True
+        except discord.HTTPException:
+            return False
+        return False
+
+    async def find_orphans(self):
+        """宛先がなくなったリマインドを探す"""
+        guilds, targets, present = set(), [], set()
+        for row in await self.repository.list_targets():
+            guild_id = int(row['guild_id'])
+            if not self.handles_gateway_guild(guild_id) or guild_id in guilds or guild_id in present:
+                continue
+            guild = self.get_guild(guild_id)
+            if guild is None:
+                if await self.guild_left(guild_id):
+                    guilds.add(guild_id)
+                else:
+                    present.add(guild_id)
+            elif not guild.unavailable and not await self.target_exists(guild, row['target_type'], int(row['target_id'])):
+                targets.append((guild_id, row['target_type'], row['target_id']))
+        return guilds, targets
+
+    async def prune_in_batches(self, prune, before: int) -> int:
+        settings = self.settings
+        pruned = 0
+        while True:
+            deleted = await prune(before, settings.history_prune_batch)
+            pruned += deleted
+            if deleted < settings.history_prune_batch:
+                return pruned
+            await asyncio.sleep(settings.history_prune_pause)
+
+    async def prune_history(self):
+        """古い配信履歴と配信済みの単発を少しずつ削除する"""
+        settings = self.settings
+        now = int(datetime.now().timestamp())
+        try:
+            pruned = await self.prune_in_batches(self.repository.prune_history, now - settings.history_retention_seconds)
+            done = await self.prune_in_batches(self.repository.prune_done, now - settings.snooze_retention_seconds)
+            vacuumed, remaining = await self.repository.incremental_vacuum(settings.vacuum_pages)
+        except sqlite3.Error as e:
+            logging.error(f"配信履歴の整理中にDBエラー: {e}")
+            return
+        HISTORY_PRUNED.inc(amount=pruned)
+        DONE_PRUNED.inc(amount=done)
+        DB_VACUUMED_PAGES.inc(amount=vacuumed)
+        if pruned or done or vacuumed:
+            logging.info(f"配信履歴を {pruned} 件、配信済みの単発を {done} 件削除し、空きページを {vacuumed} ページ切り詰めました (残り {remaining} ページ)。")
+
+    async def purge_orphans(self):
+        """イベントを取りこぼした場合に備え、宛先がなくなったリマインドを定期的にまとめて削除する"""
+        if not self.is_ready():
+            return
+        try:
+            guilds, targets = await self.find_orphans()
+            await self.purge_reminders(await self.repository.purge_guilds(guilds), "reconcile_guild")
+            await self.purge_reminders(await self.repository.purge_targets(targets), "reconcile_target")
+        except sqlite3.Error as e:
+            logging.error(f"宛先のなくなったリマインドの整理中にDBエラー: {e}")
+
+
+class ShardedRemindBot(RemindBot, commands.AutoShardedBot):
+    """SHARD_COUNT を指定した場合に使う、複数シャードのゲートウェイ接続を持つボット"""
+
+
+def create_app(settings: Settings = None) -> RemindBot:
+    """設定 (省略時は環境変数) からボットを組み立てる。Discordへの接続や DB のオープンは行わない"""
+    settings = settings or Settings.from_env()
+    if settings.shard_count:
+        return ShardedRemindBot(settings, shard_count=settings.shard_count, shard_ids=list(settings.shard_ids) or None)
+    return RemindBot(settings)
@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import csv
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import pytz
+
+from remind.recurrence import compile_rule, next_fire_at
+from remind.time_parser import parse_time_string
+from remind.timeutil import TIMEZONE, from_epoch, to_epoch
+
+FORMATS = ("csv", "jsonl", "ics")
+FORMAT_ALIASES = {"json": "jsonl", "ndjson": "jsonl", "ical": "ics", "ifb": "ics"}
+CSV_FIELDS = ("id", "user_id", "target", "time", "message", "recurrence_rule", "next_fire_at", "fire_count")
+EXPORT_TIME_FORMAT = "%Y/%m/%d %H:%M"
+ICS_TIME_FORMAT = "%Y%m%dT%H%M%S"
+ICS_DATE_FORMAT = "%Y%m%d"
+ICS_LINE_OCTETS = 75
+ICS_PRODID = "-//discord-remind//bulk export//JA"
+MAX_REPORTED_ERRORS = 100
+TARGET_RE = re.compile(r"^(?:<#(?P<channel_mention>\d+)>|<@!?(?P<user_mention>\d+)>|(?P<type>user|channel):(?P<id>\d+))$")
+ICS_PROPERTY_RE = re.compile(r'^(?P<name>[A-Za-z0-9-]+)(?P<params>(?:;[^:;]+=(?:"[^"]*"|[^:;]*))*):(?P<value>.*)$')
+
+
+@dataclass
+class ImportResult:
+    """一括インポートの件数と、行番号付きのエラー"""
+
+    imported: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+    scheduled: list = field(default_factory=list)
+
+    def reject(self, line: int, reason: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, reason))
+
+
+def format_for(filename: str, requested: str = None) -> str:
+    """指定された形式、またはファイル名の拡張子から入出力形式を決める"""
+    candidate = requested or (filename.rsplit(".", 1)[-1] if "." in filename else "")
+    candidate = FORMAT_ALIASES.get(candidate.lower(), candidate.lower())
+    if candidate not in FORMATS:
+        raise ValueError(f"未対応の形式です: {requested or filename}")
+    return candidate
+
+
+def parse_target(value: str, owner_id: str):
+    """宛先の指定を (target_type, target_id) に変換する"""
+    value = (value or "@me").strip()
+    if value.lower() == "@me":
+        return "user", str(owner_id)
+    match = TARGET_RE.match(value)
+    if match is None:
+        return None
+    if match.group("channel_mention"):
+        return "channel", match.group("channel_mention")
+    if match.group("user_mention"):
+        return "user", match.group("user_mention")
+    return match.group("type"), match.group("id")
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, {"_error": f"JSONとして解釈できません ({e.msg})"}
+            continue
+        yield line_number, record if isinstance(record, dict) else {"_error": "JSONオブジェクトではありません"}
+
+
+def _unfold(stream):
+    pending_number, pending = None, None
+    for line_number, raw in enumerate(stream, 1):
+        line = raw.rstrip("\r\n")
+        if pending is not None and line[:1] in (" ", "\t"):
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_number, pending
+        pending_number, pending = line_number, line
+    if pending is not None:
+        yield pending_number, pending
+
+
+def _ics_unescape(value: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def _ics_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _ics_params(raw: str) -> dict:
+    params = {}
+    for part in filter(None, raw.split(";")):
+        key, _, value = part.partition("=")
+        params[key.upper()] = value.strip('"')
+    return params
+
+
+def _ics_epoch(value: str, params: dict) -> int:
+    if value.endswith("Z"):
+        return to_epoch(datetime.strptime(value[:-1], ICS_TIME_FORMAT).replace(tzinfo=timezone.utc))
+    naive = datetime.strptime(value, ICS_TIME_FORMAT if "T" in value else ICS_DATE_FORMAT)
+    try:
+        zone = pytz.timezone(params["TZID"]) if "TZID" in params else TIMEZONE
+    except pytz.UnknownTimeZoneError:
+        zone = TIMEZONE
+    return to_epoch(zone.localize(naive))
+
+
+def read_ics(stream):
+    """iCalendar の VEVENT を1件ずつ (開始行番号, レコード) で返す"""
+    event, start = None, None
+    for line_number, line in _unfold(stream):
+        match = ICS_PROPERTY_RE.match(line)
+        if match is None:
+            continue
+        name, value = match.group("name").upper(), match.group("value")
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event, start = {}, line_number
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            yield start, event
+            event = None
+        elif event is not None:
+            try:
+                if name == "DTSTART":
+                    event["dtstart"] = _ics_epoch(value, _ics_params(match.group("params")))
+                elif name == "RRULE":
+                    event["recurrence_rule"] = value
+                elif name in ("SUMMARY", "DESCRIPTION") and "message" not in event:
+                    event["message"] = _ics_unescape(value)
+                elif name == "X-REMIND-TARGET":
+                    event["target"] = value
+                elif name == "X-REMIND-USER":
+                    event["user_id"] = value
+                elif name == "X-REMIND-FIRE-COUNT":
+                    event["fire_count"] = value
+            except ValueError as e:
+                event["_error"] = f"{name} を解釈できません ({e})"
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "ics": read_ics}
+
+
+def build_row(record: dict, owner_id: str, guild_id: str, channel_id: str, now: datetime, resolve_target, created_at,
+              check_rule=None):
+    """1件のレコードを reminders の行に変換する。不正な場合は理由を添えて ValueError を送出する"""
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    message = str(record.get("message") or "").strip()
+    if not message:
+        raise ValueError("message が空です")
+    target = resolve_target(str(record.get("target") or "@me"))
+    if target is None:
+        raise ValueError(f"宛先 {record.get('target')} を解釈できません")
+    rule = str(record.get("recurrence_rule") or "").strip() or None
+    if "dtstart" in record:
+        trigger_time = int(record["dtstart"])
+    else:
+        trigger_datetime, _, parsed_rule = parse_time_string(str(record.get("time") or ""), now)
+        if trigger_datetime is None:
+            raise ValueError(f"時刻 {record.get('time')} を解釈できません")
+        trigger_time = to_epoch(trigger_datetime)
+        rule = rule or parsed_rule
+    if rule is not None:
+        compile_rule(rule)
+        if check_rule is not None:
+            check_rule(rule, trigger_time)
+    try:
+        fire_count = int(record.get("fire_count") or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"fire_count {record.get('fire_count')} が数値ではありません")
+
+    now_epoch = to_epoch(now)
+    if trigger_time >= now_epoch:
+        following = trigger_time
+    elif rule is not None:
+        following = next_fire_at(rule, trigger_time, now_epoch, fire_count)
+        if following is None:
+            raise ValueError("繰り返しルールが終了しています")
+    else:
+        raise ValueError(f"時刻 {from_epoch(trigger_time).strftime(EXPORT_TIME_FORMAT)} は過去です")
+    return (str(record.get("user_id") or owner_id), str(guild_id), str(channel_id), target[0], str(target[1]), message,
+            trigger_time, following, rule is not None, rule, created_at, fire_count)
+
+
+async def import_stream(repository, stream, fmt: str, owner_id: str, guild_id: str, channel_id: str,
+                        resolve_target=None, now: datetime = None, batch_size: int = 500, schedule_until: int = None,
+                        max_rows: int = None, check_rule=None, is_member=None, remaining_for_user=None):
+    """ファイルを1件ずつ読み、batch_size 件ごとにまとめて登録する"""
+    now = now or datetime.now(TIMEZONE)
+    created_at = datetime.now()
+    resolve_target = resolve_target or (lambda value: parse_target(value, owner_id))
+    result = ImportResult()
+    batch = []
+    members = {str(owner_id): True}
+    user_remaining = {}
+
+    async def check_members(row):
+        for user_id in {row[0], row[4]} if row[3] == "user" else {row[0]}:
+            if user_id not in members:
+                members[user_id] = is_member is not None and bool(await is_member(user_id))
+            if not members[user_id]:
+                raise ValueError(f"ユーザー {user_id} はこのサーバーのメンバーとして確認できません")
+
+    async def check_user_quota(row):
+        if remaining_for_user is None:
+            return
+        if row[0] not in user_remaining:
+            user_remaining[row[0]] = await remaining_for_user(row[0])
+        if user_remaining[row[0]] is None:
+            return
+        if user_remaining[row[0]] <= 0:
+            raise ValueError(f"ユーザー {row[0]} が登録できる件数の上限に達しました")
+        user_remaining[row[0]] -= 1
+
+    async def flush():
+        ids = await repository.add_many(batch)
+        result.imported += len(ids)
+        if schedule_until is not None:
+            result.scheduled.extend((reminder_id, row[7]) for reminder_id, row in zip(ids, batch) if row[7] <= schedule_until)
+        batch.clear()
+
+    for line_number, record in READERS[fmt](stream):
+        if max_rows is not None and result.imported + len(batch) >= max_rows:
+            result.reject(line_number, f"登録できる件数の上限 ({max_rows} 件) に達しました")
+            continue
+        try:
+            row = build_row(record, owner_id, guild_id, channel_id, now, resolve_target, created_at, check_rule)
+            await check_members(row)
+            await check_user_quota(row)
+            batch.append(row)
+        except ValueError as e:
+            result.reject(line_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return result
+
+
+async def iter_guild_reminders(repository, guild_id: str, page_size: int = 500):
+    """サーバーのリマインドを id 順にページ単位で読み出す"""
+    after_id = 0
+    while True:
+        rows = await repository.list_page_for_guild(str(guild_id), after_id, page_size)
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]['id']
+
+
+def export_record(row) -> dict:
+    start = row['trigger_time'] if row['is_recurring'] else row['next_fire_at']
+    return {
+        "id": row['id'],
+        "user_id": row['user_id'],
+        "target": f"{row['target_type']}:{row['target_id']}",
+        "time": from_epoch(start).strftime(EXPORT_TIME_FORMAT),
+        "message": row['message'],
+        "recurrence_rule": row['recurrence_rule'] or "",
+        "next_fire_at": from_epoch(row['next_fire_at']).isoformat(),
+        "fire_count": row['fire_count'],
+    }
+
+
+def _fold(line: str) -> str:
+    encoded = line.encode()
+    if len(encoded) <= ICS_LINE_OCTETS:
+        return line + "\r\n"
+    parts, current, limit = [], "", ICS_LINE_OCTETS
+    for char in line:
+        if len((current + char).encode()) > limit:
+            parts.append(current)
+            current, limit = "", ICS_LINE_OCTETS - 1
+        current += char
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ics_event(row, stamp: str) -> str:
+    start = row['trigger_time'] if row['is_recurring'] else row['next_fire_at']
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:reminder-{row['id']}-{row['guild_id']}@discord-remind",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;TZID={TIMEZONE.zone}:{from_epoch(start).strftime(ICS_TIME_FORMAT)}",
+    ]
+    if row['is_recurring'] and row['recurrence_rule']:
+        lines.append(f"RRULE:{row['recurrence_rule']}")
+        lines.append(f"X-REMIND-FIRE-COUNT:{row['fire_count']}")
+    lines += [
+        f"SUMMARY:{_ics_escape(row['message'])}",
+        f"X-REMIND-TARGET:{row['target_type']}:{row['target_id']}",
+        f"X-REMIND-USER:{row['user_id']}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+ICS_HEADER = (
+    "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{ICS_PRODID}", "CALSCALE:GREGORIAN",
+    "BEGIN:VTIMEZONE", f"TZID:{TIMEZONE.zone}", "BEGIN:STANDARD", "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0900", "TZOFFSETTO:+0900", "TZNAME:JST", "END:STANDARD", "END:VTIMEZONE",
+)
+
+
+async def export_stream(repository, guild_id: str, fmt: str, stream, page_size: int = 500) -> int:
+    """サーバーのリマインドをページ単位で読み出しながら stream に書き出し、件数を返す"""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, CSV_FIELDS)
+        writer.writeheader()
+    elif fmt == "ics":
+        stream.write("".join(_fold(line) for line in ICS_HEADER))
+        stamp = datetime.now(timezone.utc).strftime(ICS_TIME_FORMAT) + "Z"
+    async for row in iter_guild_reminders(repository, guild_id, page_size):
+        if fmt == "csv":
+            writer.writerow(export_record(row))
+        elif fmt == "jsonl":
+            stream.write(json.dumps(export_record(row), ensure_ascii=False) + "\n")
+        else:
+            stream.write(ics_event(row, stamp))
+        count += 1
+    if fmt == "ics":
+        stream.write(_fold("END:VCALENDAR"))
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m remind.bulk", description="リマインドの一括インポート・エクスポート")
+    parser.add_argument("--db", default="data/reminders.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="CSV / JSON Lines / iCalendar ファイルから登録する")
+    importer.add_argument("file")
+    importer.add_argument("--guild-id", required=True)
+    importer.add_argument("--user-id", required=True, help="所有者 (レコードに user_id がない場合と @me の宛先に使う)")
+    importer.add_argument("--channel-id", default="BULK_IMPORT")
+    importer.add_argument("--format", choices=FORMATS)
+    importer.add_argument("--batch-size", type=int, default=500)
+    importer.add_argument("--allow-foreign-users", action="store_true",
+                          help="所有者以外の user_id と user:ID の宛先を、サーバーのメンバーか確かめずに登録する")
+    exporter = commands.add_parser("export", help="サーバーのリマインドを書き出す")
+    exporter.add_argument("--guild-id", required=True)
+    exporter.add_argument("--format", choices=FORMATS, default="csv")
+    exporter.add_argument("--output", default="-")
+    return parser.parse_args(argv)
+
+
+def user_quota(repository, quotas, guild_id: str):
+    """ユーザーごとの件数上限の残りを返す関数を作る"""
+    async def remaining_for_user(user_id):
+        user_active, _ = await repository.usage(user_id, guild_id)
+        return quotas.remaining_for_user(user_active)
+    return remaining_for_user
+
+
+async def _any_user(user_id: str) -> bool:
+    return True
+
+
+async def run(args) -> int:
+    from remind.quotas import Quotas
+    from remind.repository import ReminderRepository
+    from remind.settings import Settings
+
+    quotas = Quotas.from_settings(Settings.from_env())
+    repository = ReminderRepository(args.db)
+    await repository.open()
+    try:
+        if args.command == "import":
+            _, guild_active = await repository.usage(args.user_id, args.guild_id)
+            with open(args.file, encoding="utf-8-sig", newline="") as stream:
+                result = await import_stream(repository, stream, format_for(args.file, args.format), args.user_id,
+                                             args.guild_id, args.channel_id, batch_size=args.batch_size,
+                                             max_rows=quotas.remaining_for_guild(guild_active), check_rule=quotas.check_rule,
+                                             is_member=_any_user if args.allow_foreign_users else None,
+                                             remaining_for_user=user_quota(repository, quotas, args.guild_id))
+            for line_number, reason in result.errors:
+                print(f"{args.file}:{line_number}: {reason}", file=sys.stderr)
+            print(f"{result.imported} 件を登録し、{result.skipped} 件をスキップしました。", file=sys.stderr)
+            return 0 if not result.skipped else 1
+        if args.output == "-":
+            count = await export_stream(repository, args.guild_id, args.format, sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as stream:
+                count = await export_stream(repository, args.guild_id, args.format, stream)
+        print(f"{count} 件を書き出しました。", file=sys.stderr)
+        return 0
+    finally:
+        await repository.close()
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
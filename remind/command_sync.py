@@ -0,0 +1,54 @@
+import hashlib
+import json
+import logging
+import os
+
+
+def command_fingerprint(tree, guild=None) -> str:
+    """コマンドツリーをDiscordに送るペイロードと同じ形にシリアライズし、そのハッシュを返す"""
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+                     key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def sync_scope(application_id, guild=None) -> str:
+    return f"{application_id}:{guild.id if guild is not None else 'global'}"
+
+
+def load_fingerprints(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            fingerprints = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"コマンド同期の記録 {path} を読み込めませんでした: {e}")
+        return {}
+    return fingerprints if isinstance(fingerprints, dict) else {}
+
+
+def save_fingerprint(path: str, scope: str, fingerprint: str):
+    """同期済みのフィンガープリントを一時ファイル経由で書き換える"""
+    fingerprints = load_fingerprints(path)
+    fingerprints[scope] = fingerprint
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=2, sort_keys=True)
+    os.replace(temporary, path)
+
+
+async def sync_if_changed(tree, path: str, guild=None, force: bool = False) -> bool:
+    """前回同期したときからコマンドの定義が変わった場合 (または force の場合) だけ同期し、同期したかを返す"""
+    scope = sync_scope(tree.client.application_id, guild)
+    fingerprint = command_fingerprint(tree, guild)
+    if not force and load_fingerprints(path).get(scope) == fingerprint:
+        return False
+    await tree.sync(guild=guild)
+    try:
+        save_fingerprint(path, scope, fingerprint)
+    except OSError as e:
+        logging.warning(f"コマンド同期の記録 {path} を保存できませんでした: {e}")
+    return True
@@ -0,0 +1,703 @@
+import asyncio
+import io
+import logging
+import re
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import discord
+
+from remind.metrics import REGISTRY
+from remind.quotas import QuotaExceeded
+from remind.recurrence import compile_rule
+from remind.send_queue import DISCORD_REST_SECONDS
+from remind.time_parser import parse_time_string
+from remind.timeutil import TIMEZONE, from_epoch, to_epoch
+
+QUOTA_REJECTIONS = REGISTRY.counter("remind_quota_rejections_total", "上限によって拒否したリマインド作成の回数 (上限の種類別)", ("kind",))
+
+
+async def reject_quota(interaction: discord.Interaction, error: QuotaExceeded):
+    QUOTA_REJECTIONS.inc(error.kind)
+    logging.info(f"ユーザー {interaction.user.id} のリマインド作成を上限 ({error.kind}) により拒否しました。")
+    await interaction.response.send_message(str(error), ephemeral=True)
+
+
+async def render_targets(bot, guild, author_id: str, reminders) -> dict:
+    """一覧の宛先表示を、キャッシュを優先しつつ未キャッシュ分だけ並列数を制限して解決する"""
+    semaphore = asyncio.Semaphore(bot.settings.list_fetch_concurrency)
+    keys = {(r['target_type'], r['target_id']) for r in reminders}
+
+    async def render(target_type, target_id):
+        if target_type == 'user':
+            if target_id == author_id:
+                return "@me"
+            async with semaphore:
+                try:
+                    user = await bot.target_resolver.resolve_user(guild, int(target_id))
+                except discord.HTTPException:
+                    user = None
+            return user.mention if user else f"User ID: {target_id}"
+        channel = await bot.target_resolver.resolve_channel(guild, int(target_id))
+        if channel is None:
+            async with semaphore:
+                try:
+                    with DISCORD_REST_SECONDS.time("fetch_channel"):
+                        channel = await bot.fetch_channel(int(target_id))
+                except discord.HTTPException:
+                    channel = None
+        return channel.mention if channel else f"Channel ID: {target_id}"
+
+    rendered = await asyncio.gather(*(render(*key) for key in keys))
+    return dict(zip(keys, rendered))
+
+
+class ReminderListView(discord.ui.View):
+    """/remind list のページ送りを (next_fire_at, id) のキーセットで行うビュー"""
+
+    def __init__(self, bot, owner: discord.abc.User, guild: discord.Guild):
+        super().__init__(timeout=bot.settings.list_view_timeout)
+        self.bot = bot
+        self.owner = owner
+        self.guild = guild
+        self.cursors = [None]
+        self.next_cursor = None
+
+    async def load_page(self):
+        """現在のカーソルから1ページ分だけ取得し、Embedを組み立てる"""
+        settings = self.bot.settings
+        now = to_epoch(datetime.now(TIMEZONE))
+        rows = await self.bot.repository.list_active_page_for_user(
+            str(self.owner.id), str(self.guild.id), now, after=self.cursors[-1], limit=settings.list_page_size + 1)
+        has_next = len(rows) > settings.list_page_size
+        rows = rows[:settings.list_page_size]
+        self.next_cursor = (rows[-1]['next_fire_at'], rows[-1]['id']) if has_next else None
+        self.previous_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = not has_next
+        if not rows:
+            return None
+
+        targets = await render_targets(self.bot, self.guild, str(self.owner.id), rows)
+        output_lines = []
+        for r_dict in rows:
+            formatted_time = from_epoch(r_dict['next_fire_at']).strftime('%Y/%m/%d %H:%M') + " JST"
+            r_message = r_dict['message']
+            if len(r_message) > settings.list_message_preview:
+                r_message = r_message[:settings.list_message_preview] + "…"
+            target_display = targets[(r_dict['target_type'], r_dict['target_id'])]
+            line = f"**ID: {r_dict['id']}** | {formatted_time} | 宛先: {target_display} | `{r_message}`"
+            if r_dict['is_recurring']: line += f" ({r_dict['recurrence_rule'] or '繰り返し'})"
+            if r_dict['paused_at'] is not None: line += " (一時停止中)"
+            output_lines.append(line)
+
+        embed = discord.Embed(title=f"{self.owner.display_name} のリマインド一覧", color=discord.Color.blue())
+        embed.description = "\n".join(output_lines)[:4096]
+        embed.set_footer(text=f"ページ {len(self.cursors)}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner.id
+
+    async def show(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        embed = await self.load_page()
+        await interaction.edit_original_response(embed=embed, view=self)
+
+    @discord.ui.button(label="前へ", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await self.show(interaction)
+
+    @discord.ui.button(label="次へ", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        await self.show(interaction)
+
+
+def bulk_target_resolver(guild: discord.Guild, owner_id: str):
+    """インポートの宛先を解決する。#チャンネル名 と、このサーバーにないチャンネルIDも扱う"""
+    from remind.bulk import parse_target
+
+    def resolve(value: str):
+        if value.startswith("#"):
+            channel = discord.utils.get(guild.text_channels, name=value[1:])
+            return ('channel', str(channel.id)) if channel else None
+        target = parse_target(value, owner_id)
+        if target is not None and target[0] == 'channel' and guild.get_channel(int(target[1])) is None:
+            return None
+        return target
+    return resolve
+
+
+def bulk_member_checker(guild: discord.Guild):
+    """インポートのユーザーがこのサーバーのメンバーかを確かめる"""
+    async def is_member(user_id: str) -> bool:
+        try:
+            if guild.get_member(int(user_id)) is not None:
+                return True
+            with DISCORD_REST_SECONDS.time("fetch_member"):
+                return await guild.fetch_member(int(user_id)) is not None
+        except (ValueError, discord.NotFound, discord.HTTPException):
+            return False
+    return is_member
+
+
+async def download_attachment(attachment: discord.Attachment, spool, chunk_bytes: int):
+    """添付ファイルを分割して受信し、一時ファイルに書き込む"""
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_bytes):
+                spool.write(chunk)
+    spool.seek(0)
+
+
+async def parse_schedule(interaction: discord.Interaction, time: str):
+    """時刻の指定を解析する。無効なら応答してNoneを返す"""
+    now_aware = datetime.now(TIMEZONE)
+    parsed_time_data = parse_time_string(time, now_aware)
+
+    if not parsed_time_data or not parsed_time_data[0]:
+        await interaction.response.send_message(
+            f"時刻の形式が無効です: `{time}`\n"
+            "例: `15:30`, `in 30 minutes`, `tomorrow at 10:00`, `every day at 9:00`",
+            ephemeral=True)
+        return None
+
+    trigger_datetime, is_recurring, recurrence_rule = parsed_time_data
+
+    if is_recurring:
+        try:
+            compile_rule(recurrence_rule)
+        except ValueError as e:
+            await interaction.response.send_message(f"繰り返しルールが無効です: `{recurrence_rule}` ({e})", ephemeral=True)
+            return None
+
+    if trigger_datetime < now_aware:
+        await interaction.response.send_message(
+            f"指定された時刻 `{time}` (解決結果: {trigger_datetime.strftime('%Y-%m-%d %H:%M')}) は過去です。",
+            ephemeral=True)
+        return None
+    return parsed_time_data
+
+
+def is_bulk_admin(interaction: discord.Interaction) -> bool:
+    permissions = getattr(interaction.user, "guild_permissions", None)
+    return bool(permissions and permissions.manage_guild)
+
+
+class RemindCommands(discord.app_commands.Group):
+    """/remind 以下のスラッシュコマンド"""
+
+    def __init__(self, bot):
+        super().__init__(name="remind", description="リマインダー関連のコマンド")
+        self.bot = bot
+
+    @discord.app_commands.command(name="set", description="新しいリマインドを設定します。")
+    @discord.app_commands.describe(
+        target="リマインド先 (@me, #チャンネル名, またはユーザー/チャンネルメンション)",
+        time="リマインド時刻 (例: 15:30, 30分後, 明日 10時, 毎週月曜 9:00, in 1h30m, next friday 9am)",
+        message="リマインドするメッセージ内容"
+    )
+    async def set_reminder(
+        self,
+        interaction: discord.Interaction,
+        target: str,
+        time: str,
+        message: str
+    ):
+        """スラッシュコマンドによるリマインド設定"""
+        bot = self.bot
+        author = interaction.user
+        guild = interaction.guild
+
+        if not guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+
+        target_type = None
+        target_id = None
+        target_display_name = target
+
+        if target.lower() == "@me":
+            target_type = 'user'
+            target_id = str(author.id)
+            target_display_name = author.mention
+        elif target.startswith("<#") and target.endswith(">"):
+            match = re.match(r"<#(\d+)>", target)
+            if match:
+                ch_id = int(match.group(1))
+                ch = guild.get_channel(ch_id)
+                if ch and isinstance(ch, discord.TextChannel):
+                    target_type = 'channel'
+                    target_id = str(ch.id)
+                    target_display_name = ch.mention
+                else:
+                    await interaction.response.send_message(f"指定されたチャンネルメンション {target} が見つかりません。", ephemeral=True)
+                    return
+            else:
+                await interaction.response.send_message(f"無効なチャンネルメンション形式: {target}", ephemeral=True)
+                return
+        elif target.startswith("<@") and target.endswith(">"):
+            match = re.match(r"<@!?(\d+)>", target)
+            if match:
+                user_id_val = int(match.group(1))
+                try:
+                    usr = await bot.target_resolver.resolve_user(guild, user_id_val)
+                except Exception as e:
+                    logging.error(f"ユーザーメンション {target} の解決エラー: {e}")
+                    await interaction.response.send_message("ユーザーメンションの解決中にエラー。", ephemeral=True)
+                    return
+                if not usr:
+                    await interaction.response.send_message(f"指定されたユーザーメンション {target} が見つかりません。", ephemeral=True)
+                    return
+                target_type = 'user'
+                target_id = str(usr.id)
+                target_display_name = usr.mention
+            else:
+                await interaction.response.send_message(f"無効なユーザーメンション形式: {target}", ephemeral=True)
+                return
+        elif target.startswith("#"):
+            ch_name = target.lstrip("#")
+            found_channel = discord.utils.get(guild.text_channels, name=ch_name)
+            if found_channel:
+                target_type = 'channel'
+                target_id = str(found_channel.id)
+                target_display_name = found_channel.mention
+            else:
+                await interaction.response.send_message(f"チャンネル名 #{ch_name} が見つかりません。", ephemeral=True)
+                return
+        else:
+            await interaction.response.send_message(
+                f"リマインド先の指定 `{target}` が無効です。\n"
+                "`@me`、`#チャンネル名`、またはユーザー/チャンネルをメンションで指定してください。",
+                ephemeral=True)
+            return
+
+        if not target_type or not target_id:
+            await interaction.response.send_message("リマインド先の特定に失敗しました。", ephemeral=True)
+            return
+
+        schedule = await parse_schedule(interaction, time)
+        if schedule is None:
+            return
+        trigger_datetime, is_recurring, recurrence_rule = schedule
+
+        try:
+            if is_recurring:
+                bot.quotas.check_rule(recurrence_rule, to_epoch(trigger_datetime))
+            bot.quotas.admit(str(author.id))
+        except QuotaExceeded as e:
+            await reject_quota(interaction, e)
+            return
+
+        added = False
+        try:
+            command_channel_id = str(interaction.channel.id) if interaction.channel else "DM_FALLBACK"
+
+            reminder_id = await bot.repository.add(
+                str(author.id), str(guild.id), command_channel_id, target_type, target_id, message,
+                to_epoch(trigger_datetime), is_recurring, recurrence_rule, datetime.now(), check=bot.quotas.check_usage)
+            added = True
+
+            if bot.delivery.owns({'guild_id': guild.id}):
+                bot.engine.schedule(reminder_id, to_epoch(trigger_datetime))
+            logging.info(f"{'繰り返し' if is_recurring else '単発'}リマインドID {reminder_id} を {trigger_datetime} でスケジュール。")
+
+            await interaction.response.send_message(
+                f"リマインドを設定しました！ (ID: `{reminder_id}`)\n"
+                f"時刻: `{trigger_datetime.strftime('%Y-%m-%d %H:%M:%S %Z')}`\n"
+                f"宛先: {target_display_name}\n"
+                f"メッセージ: `{message}`\n"
+                f"タイプ: {'繰り返し' if is_recurring else '単発'}",
+                ephemeral=False
+            )
+
+        except QuotaExceeded as e:
+            await reject_quota(interaction, e)
+        except sqlite3.Error as e:
+            logging.error(f"DBエラー (set_reminder): {e}")
+            await interaction.response.send_message(f"DBエラーが発生しました: {e}", ephemeral=True)
+        except Exception as e:
+            logging.error(f"リマインド設定中の予期せぬエラー (set_reminder): {e}")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f"予期せぬエラーが発生しました: {e}", ephemeral=True)
+            else:
+                await interaction.followup.send(f"予期せぬエラーが発生しました: {e}", ephemeral=True)
+        finally:
+            if not added:
+                bot.quotas.refund(str(author.id))
+
+    @discord.app_commands.command(name="list", description="設定されているリマインドの一覧を表示します。")
+    async def list_reminders(self, interaction: discord.Interaction):
+        """スラッシュコマンドによるリマインド一覧表示"""
+        guild = interaction.guild
+
+        if not guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        view = ReminderListView(self.bot, interaction.user, guild)
+        embed = await view.load_page()
+
+        if embed is None:
+            await interaction.followup.send("設定されている有効なリマインドはありません。", ephemeral=True)
+            return
+
+        if view.next_page.disabled:
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        else:
+            await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+
+    @discord.app_commands.command(name="delete", description="指定IDのリマインド、または条件に一致する自分のリマインドをまとめて削除します。")
+    @discord.app_commands.describe(
+        reminder_id="削除するリマインドのID",
+        target="この宛先 (@me, #チャンネル名, メンション) のリマインドを削除",
+        contains="メッセージにこの文字列を含むリマインドを削除",
+        recurring_only="繰り返しのリマインドだけを削除",
+    )
+    async def delete_reminder(self, interaction: discord.Interaction, reminder_id: int = None, target: str = None,
+                              contains: str = None, recurring_only: bool = False):
+        """スラッシュコマンドによるリマインド削除"""
+        if not interaction.guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+
+        filtered = target is not None or bool(contains) or recurring_only
+        if (reminder_id is None) == (not filtered):
+            await interaction.response.send_message(
+                "削除するリマインドのIDか、絞り込み条件 (`target` / `contains` / `recurring_only`) のどちらか一方を指定してください。",
+                ephemeral=True)
+            return
+        if filtered:
+            await self.delete_matching(interaction, target, contains, recurring_only)
+            return
+
+        author_id = str(interaction.user.id)
+        guild_id = str(interaction.guild.id)
+        try:
+            deleted = await self.bot.repository.delete_owned(reminder_id, author_id, guild_id)
+        except sqlite3.Error as e:
+            logging.error(f"リマインド削除エラー (ID: {reminder_id}): {e}")
+            await interaction.response.send_message(f"リマインド削除中にエラーが発生しました。", ephemeral=True)
+            return
+
+        if not deleted:
+            await interaction.response.send_message(f"ID `{reminder_id}` のリマインドが見つからないか、削除権限がありません。", ephemeral=True)
+            return
+
+        self.bot.engine.cancel(reminder_id)
+        await interaction.response.send_message(f"リマインド ID `{reminder_id}` を削除しました。", ephemeral=False)
+
+    async def delete_matching(self, interaction: discord.Interaction, target: str, contains: str, recurring_only: bool):
+        """条件に一致する自分のリマインドを1回のDELETEで削除し、スケジューラからもまとめて外す"""
+        author_id = str(interaction.user.id)
+        target_key = None
+        if target is not None:
+            target_key = bulk_target_resolver(interaction.guild, author_id)(target)
+            if target_key is None:
+                await interaction.response.send_message(
+                    f"リマインド先の指定 `{target}` が無効です。`@me`、`#チャンネル名`、またはメンションで指定してください。", ephemeral=True)
+                return
+        try:
+            deleted = await self.bot.repository.delete_matching(
+                author_id, str(interaction.guild.id), target=target_key, contains=contains or None,
+                recurring=True if recurring_only else None)
+        except sqlite3.Error as e:
+            logging.error(f"リマインドの一括削除エラー: {e}")
+            await interaction.response.send_message("リマインド削除中にエラーが発生しました。", ephemeral=True)
+            return
+
+        if not deleted:
+            await interaction.response.send_message("条件に一致するリマインドはありません。", ephemeral=True)
+            return
+
+        self.bot.unschedule_many(deleted)
+        logging.info(f"ユーザー {author_id} がリマインド {len(deleted)} 件をまとめて削除しました: {deleted}")
+        preview = self.bot.settings.delete_id_preview
+        ids = ", ".join(f"`{reminder_id}`" for reminder_id in deleted[:preview])
+        if len(deleted) > preview:
+            ids += f" ほか {len(deleted) - preview} 件"
+        await interaction.response.send_message(f"{len(deleted)} 件のリマインドを削除しました (ID: {ids})。", ephemeral=False)
+
+    async def load_owned(self, interaction: discord.Interaction, reminder_id: int):
+        """自分のリマインドを読み込む。見つからない場合は応答してNoneを返す"""
+        if not interaction.guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return None
+        row = await self.bot.repository.get(reminder_id)
+        if (row is None or row['next_fire_at'] is None or row['user_id'] != str(interaction.user.id)
+                or row['guild_id'] != str(interaction.guild.id)):
+            await interaction.response.send_message(f"ID `{reminder_id}` のリマインドが見つからないか、変更する権限がありません。", ephemeral=True)
+            return None
+        return row
+
+    def reschedule(self, row):
+        """更新後の行に合わせてスケジューラの登録を差し替える"""
+        if row['next_fire_at'] is None or row['paused_at'] is not None:
+            self.bot.engine.cancel(row['id'])
+        elif self.bot.delivery.owns(row):
+            self.bot.engine.schedule(row['id'], row['next_fire_at'])
+
+    @discord.app_commands.command(name="edit", description="指定IDのリマインドの時刻やメッセージを変更します (IDは変わりません)。")
+    @discord.app_commands.describe(
+        reminder_id="変更するリマインドのID",
+        time="新しい時刻 (例: 15:30, 30分後, 毎週月曜 9:00)。変更すると一時停止は解除されます",
+        message="新しいメッセージ内容",
+    )
+    async def edit_reminder(self, interaction: discord.Interaction, reminder_id: int, time: str = None, message: str = None):
+        """スラッシュコマンドによるリマインドの変更"""
+        bot = self.bot
+        if time is None and message is None:
+            await interaction.response.send_message("変更する時刻 (`time`) かメッセージ (`message`) を指定してください。", ephemeral=True)
+            return
+        if not interaction.guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+
+        changes = {}
+        if message is not None:
+            changes['message'] = message
+        if time is not None:
+            schedule = await parse_schedule(interaction, time)
+            if schedule is None:
+                return
+            trigger_datetime, is_recurring, recurrence_rule = schedule
+            trigger_time = to_epoch(trigger_datetime)
+            if is_recurring:
+                try:
+                    bot.quotas.check_rule(recurrence_rule, trigger_time)
+                except QuotaExceeded as e:
+                    await reject_quota(interaction, e)
+                    return
+            changes.update(trigger_time=trigger_time, next_fire_at=trigger_time, is_recurring=is_recurring,
+                           recurrence_rule=recurrence_rule, fire_count=0, paused_at=None)
+
+        try:
+            row = await bot.repository.update_owned(reminder_id, str(interaction.user.id), str(interaction.guild.id), **changes)
+        except sqlite3.Error as e:
+            logging.error(f"リマインド変更エラー (ID: {reminder_id}): {e}")
+            await interaction.response.send_message("リマインドの変更中にエラーが発生しました。", ephemeral=True)
+            return
+        if row is None:
+            await interaction.response.send_message(f"ID `{reminder_id}` のリマインドが見つからないか、変更する権限がありません。", ephemeral=True)
+            return
+
+        self.reschedule(row)
+        logging.info(f"リマインドID {reminder_id} を変更しました: {sorted(changes)}")
+        lines = [f"リマインド ID `{reminder_id}` を変更しました。"]
+        if time is not None:
+            lines.append(f"時刻: `{from_epoch(row['next_fire_at']).strftime('%Y-%m-%d %H:%M:%S %Z')}`"
+                         + (f" ({row['recurrence_rule']})" if row['is_recurring'] else ""))
+        if message is not None:
+            lines.append(f"メッセージ: `{row['message']}`")
+        await interaction.response.send_message("\n".join(lines), ephemeral=False)
+
+    @discord.app_commands.command(name="pause", description="指定IDの繰り返しリマインドを一時停止します。")
+    @discord.app_commands.describe(reminder_id="一時停止する繰り返しリマインドのID")
+    async def pause_reminder(self, interaction: discord.Interaction, reminder_id: int):
+        """スラッシュコマンドによる繰り返しリマインドの一時停止"""
+        try:
+            row = await self.load_owned(interaction, reminder_id)
+            if row is None:
+                return
+            if not row['is_recurring']:
+                await interaction.response.send_message(
+                    "一時停止できるのは繰り返しのリマインドだけです。単発のリマインドは `/remind edit` で時刻を変更できます。", ephemeral=True)
+                return
+            if row['paused_at'] is not None:
+                await interaction.response.send_message(f"ID `{reminder_id}` のリマインドは既に一時停止しています。", ephemeral=True)
+                return
+            row = await self.bot.repository.update_owned(
+                reminder_id, row['user_id'], row['guild_id'], paused_at=int(datetime.now().timestamp()))
+        except sqlite3.Error as e:
+            logging.error(f"リマインドの一時停止エラー (ID: {reminder_id}): {e}")
+            await interaction.response.send_message("リマインドの一時停止中にエラーが発生しました。", ephemeral=True)
+            return
+
+        self.reschedule(row)
+        logging.info(f"リマインドID {reminder_id} を一時停止しました。")
+        await interaction.response.send_message(
+            f"リマインド ID `{reminder_id}` を一時停止しました。`/remind resume` で再開できます。", ephemeral=False)
+
+    @discord.app_commands.command(name="resume", description="一時停止中の繰り返しリマインドを再開します。")
+    @discord.app_commands.describe(reminder_id="再開する繰り返しリマインドのID")
+    async def resume_reminder(self, interaction: discord.Interaction, reminder_id: int):
+        """スラッシュコマンドによる繰り返しリマインドの再開。停止中に過ぎた回はまとめて送らず、次の回から再開する"""
+        try:
+            row = await self.load_owned(interaction, reminder_id)
+            if row is None:
+                return
+            if row['paused_at'] is None:
+                await interaction.response.send_message(f"ID `{reminder_id}` のリマインドは一時停止していません。", ephemeral=True)
+                return
+            following = self.bot.dispatcher.resume_occurrence(row, int(datetime.now().timestamp()))
+            if following is None:
+                await self.bot.repository.delete_owned(reminder_id, row['user_id'], row['guild_id'])
+                self.bot.engine.cancel(reminder_id)
+                await interaction.response.send_message(
+                    f"ID `{reminder_id}` の繰り返しルールには次の回がないため、リマインドを削除しました。", ephemeral=False)
+                return
+            row = await self.bot.repository.update_owned(
+                reminder_id, row['user_id'], row['guild_id'], paused_at=None, next_fire_at=following)
+        except sqlite3.Error as e:
+            logging.error(f"リマインドの再開エラー (ID: {reminder_id}): {e}")
+            await interaction.response.send_message("リマインドの再開中にエラーが発生しました。", ephemeral=True)
+            return
+
+        self.reschedule(row)
+        logging.info(f"リマインドID {reminder_id} を再開しました。次回: {from_epoch(following)}")
+        await interaction.response.send_message(
+            f"リマインド ID `{reminder_id}` を再開しました。次回: `{from_epoch(following).strftime('%Y-%m-%d %H:%M:%S %Z')}`",
+            ephemeral=False)
+
+    @discord.app_commands.command(name="history", description="指定IDのリマインドの配信履歴を表示します。")
+    @discord.app_commands.describe(reminder_id="履歴を表示するリマインドのID")
+    async def reminder_history(self, interaction: discord.Interaction, reminder_id: int):
+        """スラッシュコマンドによる配信履歴の表示"""
+        settings = self.bot.settings
+        if not interaction.guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+
+        try:
+            rows = await self.bot.repository.history_for_user(
+                reminder_id, str(interaction.user.id), str(interaction.guild.id), settings.history_list_limit)
+        except sqlite3.Error as e:
+            logging.error(f"配信履歴の取得エラー (ID: {reminder_id}): {e}")
+            await interaction.response.send_message("配信履歴の取得中にエラーが発生しました。", ephemeral=True)
+            return
+
+        if not rows:
+            await interaction.response.send_message(
+                f"ID `{reminder_id}` の配信履歴はありません (保持期間は {settings.history_retention_seconds // 86400} 日です)。", ephemeral=True)
+            return
+
+        labels = {"sent": "送信済み", "forbidden": "権限不足で送信失敗", "undelivered": "再試行の上限で送信失敗"}
+        lines = [
+            f"{from_epoch(row['fire_at']).strftime('%Y/%m/%d %H:%M')} JST | {labels.get(row['outcome'], row['outcome'])} | 遅れ {row['lag_ms'] / 1000:.1f} 秒"
+            for row in rows
+        ]
+        embed = discord.Embed(title=f"リマインド ID {reminder_id} の配信履歴", description="\n".join(lines), color=discord.Color.blue())
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @discord.app_commands.command(name="import", description="CSV / JSON Lines / iCalendar ファイルからリマインドを一括登録します (サーバー管理権限が必要)。")
+    @discord.app_commands.describe(file="インポートするファイル (.csv, .jsonl, .ics)")
+    async def import_reminders(self, interaction: discord.Interaction, file: discord.Attachment):
+        """スラッシュコマンドによるリマインドの一括インポート"""
+        import aiohttp
+        from remind.bulk import FORMATS, format_for, import_stream, user_quota
+
+        bot = self.bot
+        settings = bot.settings
+        guild = interaction.guild
+        if not guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+        if not is_bulk_admin(interaction):
+            await interaction.response.send_message("このコマンドにはサーバー管理権限が必要です。", ephemeral=True)
+            return
+        try:
+            fmt = format_for(file.filename)
+        except ValueError as e:
+            await interaction.response.send_message(f"{e} (対応形式: {', '.join(FORMATS)})", ephemeral=True)
+            return
+        if file.size > settings.bulk_max_bytes:
+            await interaction.response.send_message(f"ファイルが大きすぎます (上限 {settings.bulk_max_bytes} バイト)。", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        author_id = str(interaction.user.id)
+        channel_id = str(interaction.channel.id) if interaction.channel else "DM_FALLBACK"
+        try:
+            _, guild_active = await bot.repository.usage(author_id, str(guild.id))
+            with tempfile.SpooledTemporaryFile(max_size=settings.bulk_spool_bytes) as spool:
+                await download_attachment(file, spool, settings.bulk_chunk_bytes)
+                stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+                result = await import_stream(
+                    bot.repository, stream, fmt, author_id, str(guild.id), channel_id,
+                    resolve_target=bulk_target_resolver(guild, author_id), batch_size=settings.bulk_batch_size,
+                    schedule_until=bot.engine.loaded_until or 0, max_rows=bot.quotas.remaining_for_guild(guild_active),
+                    check_rule=bot.quotas.check_rule, is_member=bulk_member_checker(guild),
+                    remaining_for_user=user_quota(bot.repository, bot.quotas, str(guild.id)))
+                stream.detach()
+        except (aiohttp.ClientError, UnicodeDecodeError) as e:
+            logging.error(f"インポートファイルの読み込みに失敗しました: {e}")
+            await interaction.followup.send(f"ファイルを読み込めませんでした: {e}", ephemeral=True)
+            return
+        except sqlite3.Error as e:
+            logging.error(f"DBエラー (import_reminders): {e}")
+            await interaction.followup.send(f"DBエラーが発生しました。登録済みの件数は一覧で確認してください: {e}", ephemeral=True)
+            return
+
+        if bot.delivery.owns({'guild_id': guild.id}):
+            bot.engine.schedule_many(result.scheduled)
+        logging.info(f"サーバー {guild.id} に {result.imported} 件のリマインドをインポートしました ({result.skipped} 件スキップ)。")
+        lines = [f"{result.imported} 件のリマインドを登録しました。"]
+        if result.skipped:
+            lines.append(f"{result.skipped} 件をスキップしました:")
+            lines += [f"- {line_number} 行目: {reason}" for line_number, reason in result.errors[:settings.bulk_error_lines]]
+            if result.skipped > settings.bulk_error_lines:
+                lines.append(f"…ほか {result.skipped - settings.bulk_error_lines} 件")
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+    @discord.app_commands.command(name="export", description="このサーバーのリマインドをファイルに書き出します (サーバー管理権限が必要)。")
+    @discord.app_commands.describe(format="出力形式")
+    @discord.app_commands.choices(format=[
+        discord.app_commands.Choice(name="CSV", value="csv"),
+        discord.app_commands.Choice(name="JSON Lines", value="jsonl"),
+        discord.app_commands.Choice(name="iCalendar", value="ics"),
+    ])
+    async def export_reminders(self, interaction: discord.Interaction, format: discord.app_commands.Choice[str]):
+        """スラッシュコマンドによるリマインドのエクスポート"""
+        from remind.bulk import export_stream
+
+        settings = self.bot.settings
+        guild = interaction.guild
+        if not guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+        if not is_bulk_admin(interaction):
+            await interaction.response.send_message("このコマンドにはサーバー管理権限が必要です。", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            with tempfile.SpooledTemporaryFile(max_size=settings.bulk_spool_bytes) as spool:
+                stream = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+                count = await export_stream(self.bot.repository, str(guild.id), format.value, stream, settings.bulk_batch_size)
+                stream.flush()
+                stream.detach()
+                spool.seek(0)
+                await interaction.followup.send(
+                    f"{count} 件のリマインドを書き出しました。",
+                    file=discord.File(spool, filename=f"reminders-{guild.id}.{format.value}"), ephemeral=True)
+        except sqlite3.Error as e:
+            logging.error(f"DBエラー (export_reminders): {e}")
+            await interaction.followup.send(f"DBエラーが発生しました: {e}", ephemeral=True)
+
+    @discord.app_commands.command(name="help", description="ボットの使い方やコマンドのヘルプを表示します。")
+    async def show_help(self, interaction: discord.Interaction):
+        """スラッシュコマンドによるヘルプ表示"""
+        readme_url = "https://github.com/eraiza0816/discord-remind/blob/main/README.md"
+        embed = discord.Embed(
+            title="Discord Remind Bot ヘルプ",
+            description=f"詳しい使い方は、こちらの [README]({readme_url}) をご覧ください。",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="`/remind set target:... time:... message:...`", value="新しいリマインドを設定します。", inline=False)
+        embed.add_field(name="`/remind list`", value="設定済みのリマインド一覧を表示します。", inline=False)
+        embed.add_field(name="`/remind delete reminder_id:...`", value="指定IDのリマインドを削除します。", inline=False)
+        embed.add_field(name="`/remind delete target:... contains:... recurring_only:...`", value="条件に一致する自分のリマインドをまとめて削除します。", inline=False)
+        embed.add_field(name="`/remind edit reminder_id:... time:... message:...`", value="指定IDのリマインドの時刻やメッセージを変更します。", inline=False)
+        embed.add_field(name="`/remind pause reminder_id:...` / `/remind resume reminder_id:...`", value="繰り返しリマインドを一時停止・再開します。", inline=False)
+        embed.add_field(name="`/remind history reminder_id:...`", value="指定IDのリマインドが送信されたかを表示します。", inline=False)
+        embed.add_field(name="`/remind import file:...` / `/remind export format:...`", value="リマインドを一括で登録・書き出しします (サーバー管理権限が必要)。", inline=False)
+        embed.add_field(name="`/remind help`", value="このヘルプを表示します。", inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
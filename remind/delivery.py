@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+from remind.dispatch import delivery_nonce
+from remind.metrics import REGISTRY
+from remind.snooze import action_view
+from remind.timeutil import from_epoch
+
+SEND_REMINDER_SECONDS = REGISTRY.histogram("remind_send_reminder_seconds", "宛先の解決から送信完了までの所要時間", ("kind",))
+SEND_REMINDER_RESULTS = REGISTRY.counter("remind_send_reminder_total", "リマインド送信の回数 (結果別)", ("kind", "result"))
+LATE_DELIVERIES = REGISTRY.counter("remind_late_deliveries_total", "予定時刻から LATE_NOTICE_SECONDS 秒以上遅れて送信したリマインドの件数")
+PREFETCHED_TARGETS = REGISTRY.counter("remind_prefetched_targets_total", "発火前に先読みした宛先の件数 (結果別)", ("result",))
+
+
+class ReminderDelivery:
+    """リマインドの宛先を解決し、送信キュー経由でDiscordに送信する"""
+
+    def __init__(self, bot, settings, target_resolver, send_queue, repository, lease_manager=None, clock=time.time):
+        self.bot = bot
+        self.settings = settings
+        self.target_resolver = target_resolver
+        self.send_queue = send_queue
+        self.repository = repository
+        self.lease_manager = lease_manager
+        self.clock = clock
+
+    def owns(self, reminder) -> bool:
+        return self.lease_manager is None or self.lease_manager.owns_guild(reminder['guild_id'])
+
+    def snoozable(self, reminder) -> bool:
+        """スヌーズ・完了ボタンを付けるかを返す。対象は単発のリマインドだけ"""
+        return self.settings.snooze_enabled and not reminder['is_recurring']
+
+    def reminder_text(self, reminder) -> str:
+        """送信する本文を組み立てる。予定時刻から大きく遅れた場合は予定時刻を添える"""
+        text = f"リマインダー: {reminder['message']}"
+        if self.clock() - reminder['next_fire_at'] > self.settings.late_notice_seconds:
+            LATE_DELIVERIES.inc()
+            text += f"\n(予定時刻 {from_epoch(reminder['next_fire_at']).strftime('%Y/%m/%d %H:%M')} JST から遅れて配信されました)"
+        return text
+
+    async def resolve_target(self, reminder):
+        """リマインドの宛先 (チャンネルまたはDMチャンネル) を解決する。見つからない場合はNoneを返す"""
+        reminder_id = reminder['id']
+        target_type = reminder['target_type']
+        target_id = reminder['target_id']
+        guild_id = reminder['guild_id']
+
+        guild = self.bot.get_guild(int(guild_id))
+        if not guild and self.lease_manager is None:
+            logging.error(f"サーバー {guild_id} が見つかりません。リマインドID: {reminder_id}")
+            return None
+
+        if target_type == 'user':
+            try:
+                user = await self.target_resolver.resolve_user(guild, int(target_id))
+                if not user:
+                    logging.error(f"ユーザー {target_id} が見つかりません。リマインドID: {reminder_id}")
+                    return None
+                return await self.target_resolver.dm_channel(user)
+            except Exception as e:
+                logging.error(f"ユーザー {target_id} の取得中にエラー: {e}。リマインドID: {reminder_id}")
+                return None
+        if target_type == 'channel':
+            target = await self.target_resolver.resolve_channel(
+                guild, int(target_id), guild_id=int(guild_id) if self.lease_manager else None)
+            if not target:
+                logging.warning(f"チャンネル {target_id} がサーバー {guild_id} に見つかりません。リマインドID: {reminder_id}")
+            return target
+        logging.error(f"不明なターゲットタイプ: {target_type}。リマインドID: {reminder_id}")
+        return None
+
+    async def send_reminder(self, reminder, idempotency_key: str):
+        """リマインドを送信し、結果を返す。再試行する場合はFalseを返す"""
+        with SEND_REMINDER_SECONDS.time("single"):
+            return await self._send_reminder(reminder, idempotency_key)
+
+    async def _send_reminder(self, reminder, idempotency_key: str):
+        reminder_id = reminder['id']
+        target_type = reminder['target_type']
+        target_id = reminder['target_id']
+        message_content = reminder['message']
+
+        target = await self.resolve_target(reminder)
+        if target is None:
+            SEND_REMINDER_RESULTS.inc("single", "no_target")
+            return False
+
+        try:
+            text = self.reminder_text(reminder)
+            nonce = delivery_nonce(idempotency_key)
+            extra = {"view": action_view(self.settings, reminder_id)} if self.snoozable(reminder) else {}
+            await self.send_queue.send(('channel', target.id), lambda: target.send(text, nonce=nonce, **extra))
+            outcome = "sent"
+            logging.info(f"リマインド送信完了: ID {reminder_id}, 宛先 {target_type} {target_id}, メッセージ「{message_content}」")
+        except discord.Forbidden:
+            outcome = "forbidden"
+            logging.error(f"リマインド送信失敗 (権限不足): ID {reminder_id}, 宛先 {target_type} {target_id}")
+        except Exception as e:
+            SEND_REMINDER_RESULTS.inc("single", "error")
+            logging.error(f"リマインド送信中に予期せぬエラー (再試行します): ID {reminder_id}, {e}")
+            return False
+        SEND_REMINDER_RESULTS.inc("single", outcome)
+        return outcome
+
+    def digest_embed(self, reminders) -> discord.Embed:
+        """同じ宛先に同時に発火した複数のリマインドを1つのEmbedにまとめる"""
+        lines = []
+        for reminder in reminders:
+            message = reminder['message']
+            if len(message) > self.settings.digest_line_length:
+                message = message[:self.settings.digest_line_length] + "..."
+            lines.append(f"`{from_epoch(reminder['next_fire_at']).strftime('%H:%M')}` {message}")
+        return discord.Embed(title=f"リマインダー ({len(reminders)}件)", description="\n".join(lines), color=discord.Color.blue())
+
+    async def send_digest(self, reminders, idempotency_key: str):
+        """同じ宛先のリマインドをまとめて1通で送信する。戻り値は send_reminder と同じ"""
+        with SEND_REMINDER_SECONDS.time("digest"):
+            return await self._send_digest(reminders, idempotency_key)
+
+    async def _send_digest(self, reminders, idempotency_key: str):
+        reminder_ids = [reminder['id'] for reminder in reminders]
+        target_type = reminders[0]['target_type']
+        target_id = reminders[0]['target_id']
+
+        target = await self.resolve_target(reminders[0])
+        if target is None:
+            SEND_REMINDER_RESULTS.inc("digest", "no_target")
+            return False
+
+        try:
+            embed = self.digest_embed(reminders)
+            nonce = delivery_nonce(idempotency_key)
+            await self.send_queue.send(('channel', target.id), lambda: target.send(embed=embed, nonce=nonce))
+            outcome = "sent"
+            logging.info(f"リマインドをまとめて送信しました: ID {reminder_ids}, 宛先 {target_type} {target_id}")
+        except discord.Forbidden:
+            outcome = "forbidden"
+            logging.error(f"リマインドのまとめ送信失敗 (権限不足): ID {reminder_ids}, 宛先 {target_type} {target_id}")
+        except Exception as e:
+            SEND_REMINDER_RESULTS.inc("digest", "error")
+            logging.error(f"リマインドのまとめ送信中に予期せぬエラー (再試行します): ID {reminder_ids}, {e}")
+            return False
+        SEND_REMINDER_RESULTS.inc("digest", outcome)
+        return outcome
+
+    async def prewarm_targets(self, reminder_ids):
+        """まもなく発火するリマインドの宛先を解決して宛先キャッシュに載せておく"""
+        targets = {}
+        for reminder in await self.repository.get_many(reminder_ids):
+            if self.owns(reminder):
+                targets.setdefault((reminder['guild_id'], reminder['target_type'], reminder['target_id']), reminder)
+        semaphore = asyncio.Semaphore(self.settings.prefetch_concurrency)
+
+        async def warm(reminder):
+            async with semaphore:
+                try:
+                    target = await self.resolve_target(reminder)
+                except Exception as e:
+                    logging.warning(f"宛先の先読みに失敗しました: リマインドID {reminder['id']}, {e}")
+                    target = None
+            PREFETCHED_TARGETS.inc("resolved" if target is not None else "missing")
+
+        await asyncio.gather(*(warm(reminder) for reminder in targets.values()))
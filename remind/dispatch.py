@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+
+from remind.leases import default_owner
+from remind.metrics import REGISTRY
+from remind.recurrence import next_fire_at
+
+NONCE_MAX_LENGTH = 25
+
+DISPATCHED = REGISTRY.counter("remind_dispatched_total", "配信処理に渡されたリマインドの件数 (結果別)", ("result",))
+FIRE_LAG_SECONDS = REGISTRY.histogram("remind_fire_lag_seconds", "予定時刻 (next_fire_at) から送信完了までの遅れ")
+
+
+def delivery_key(row) -> str:
+    """発火1回ごとに一意な冪等キーを返す"""
+    return f"{row['id']}:{row['next_fire_at']}"
+
+
+def delivery_nonce(key: str) -> str:
+    """冪等キーをDiscordのnonceに収まる長さに変換する"""
+    if len(key) <= NONCE_MAX_LENGTH:
+        return key
+    return hashlib.sha1(key.encode()).hexdigest()[:NONCE_MAX_LENGTH]
+
+
+class Dispatcher:
+    """発火したリマインドをクレームして送信し、結果をまとめて書き戻す"""
+
+    def __init__(self, repository, deliver, concurrency: int = 10, on_missing=None, on_advanced=None, clock=time.time,
+                 owns=None, owner=None, claim_timeout: float = 300, retention: float = 86400,
+                 deliver_digest=None, digest_size: int = 20, snoozable=None, on_undelivered=None,
+                 retry_delay: float = 30, max_retry_delay: float = 300, max_attempts: int = 5, lookahead: float = None):
+        self.repository = repository
+        self.deliver = deliver
+        self.concurrency = concurrency
+        self.on_missing = on_missing
+        self.on_advanced = on_advanced
+        self.clock = clock
+        self.owns = owns
+        self.owner = owner or default_owner()
+        self.claim_timeout = claim_timeout
+        self.retention = retention
+        self.deliver_digest = deliver_digest
+        self.digest_size = digest_size
+        self.snoozable = snoozable
+        self.on_undelivered = on_undelivered
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.lookahead = lookahead
+        self._failures = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def dispatch(self, reminder_ids):
+        if not reminder_ids:
+            return
+        rows = await self.repository.get_many(reminder_ids)
+        found = {row['id'] for row in rows}
+        missing = [reminder_id for reminder_id in reminder_ids if reminder_id not in found]
+        if missing:
+            logging.warning(f"リマインドID {missing} が見つかりませんでした。")
+            DISPATCHED.inc("missing", amount=len(missing))
+            if self.on_missing:
+                self.on_missing(missing)
+            for reminder_id in missing:
+                self._failures.pop(reminder_id, None)
+        inactive = [row['id'] for row in rows if row['next_fire_at'] is None or row['paused_at'] is not None]
+        if inactive:
+            logging.info(f"一時停止中または配信済みのリマインドID {inactive} の配信を見送りました。")
+            DISPATCHED.inc("inactive", amount=len(inactive))
+            for reminder_id in inactive:
+                self._failures.pop(reminder_id, None)
+            rows = [row for row in rows if row['id'] not in inactive]
+        if self.lookahead is not None:
+            horizon = self.clock() + self.lookahead
+            early = [row['id'] for row in rows if row['next_fire_at'] > horizon]
+            if early:
+                logging.info(f"予定時刻がまだ先のリマインドID {early} の配信を見送りました。")
+                DISPATCHED.inc("not_due", amount=len(early))
+                rows = [row for row in rows if row['id'] not in early]
+        if self.owns is not None:
+            skipped = [row['id'] for row in rows if not self.owns(row)]
+            if skipped:
+                logging.info(f"担当外のシャードに属するリマインドID {skipped} の配信を見送りました。")
+                DISPATCHED.inc("not_owned", amount=len(skipped))
+                rows = [row for row in rows if self.owns(row)]
+        if not rows:
+            return
+
+        claim_token = uuid.uuid4().hex
+        keys = {row['id']: delivery_key(row) for row in rows}
+        now = self.clock()
+        claimed = set(await self.repository.claim_deliveries(
+            [(row['id'], row['next_fire_at'], keys[row['id']]) for row in rows],
+            self.owner, claim_token, now, now - self.claim_timeout))
+        if len(claimed) < len(rows):
+            logging.info(f"リマインドID {[row['id'] for row in rows if row['id'] not in claimed]} は他の配信処理がクレーム済みのため見送りました。")
+            DISPATCHED.inc("claimed_elsewhere", amount=len(rows) - len(claimed))
+            rows = [row for row in rows if row['id'] in claimed]
+
+        async def deliver_group(group):
+            async with self._semaphore:
+                try:
+                    if len(group) == 1:
+                        return await self.deliver(group[0], keys[group[0]['id']])
+                    return await self.deliver_digest(group, "|".join(sorted(keys[row['id']] for row in group)))
+                except Exception as e:
+                    logging.error(f"リマインド送信中に予期せぬエラー: ID {[row['id'] for row in group]}, {e}")
+                    return False
+
+        groups = self.group(rows)
+        results = await asyncio.gather(*(deliver_group(group) for group in groups))
+        delivered = {row['id']: done for group, done in zip(groups, results) for row in group}
+        alone = {group[0]['id'] for group in groups if len(group) == 1}
+        now = self.clock()
+        finished = []
+        history = []
+        undelivered = []
+        retry = []
+        gave_up = []
+        retain = []
+        for row in rows:
+            result = delivered[row['id']]
+            if not result:
+                failures = self.failures(row['id'], keys[row['id']]) + 1
+                if failures < self.max_attempts:
+                    self._failures[row['id']] = (keys[row['id']], failures)
+                    undelivered.append(keys[row['id']])
+                    retry.append((row['id'], int(now + self.backoff(failures))))
+                    continue
+                gave_up.append(row['id'])
+                result = "undelivered"
+            self._failures.pop(row['id'], None)
+            lag = max(0.0, now - row['next_fire_at'])
+            FIRE_LAG_SECONDS.observe(lag)
+            following = self.next_occurrence(row, int(now)) if row['is_recurring'] else None
+            finished.append((row['id'], keys[row['id']], following))
+            if (self.snoozable is not None and row['id'] in alone and result in (True, "sent")
+                    and self.snoozable(row)):
+                retain.append(row['id'])
+            history.append((row['id'], row['guild_id'], row['user_id'], row['next_fire_at'], int(lag * 1000),
+                            result if isinstance(result, str) else "sent"))
+        if undelivered:
+            DISPATCHED.inc("undelivered", amount=len(undelivered))
+            await self.repository.release_deliveries(undelivered, claim_token)
+            if self.on_undelivered:
+                self.on_undelivered(retry)
+        if gave_up:
+            DISPATCHED.inc("gave_up", amount=len(gave_up))
+            logging.warning(f"リマインドID {gave_up} は {self.max_attempts} 回送信できなかったため、この回の配信を諦めました。")
+        if not finished:
+            return
+        deleted, advanced = await self.repository.complete(
+            claim_token, finished, now, now - self.retention if self.retention else None, history, retain)
+        done = set(deleted) | {reminder_id for reminder_id, _ in advanced}
+        DISPATCHED.inc("delivered", amount=len(done - set(gave_up)))
+        if len(deleted) + len(advanced) < len(finished):
+            DISPATCHED.inc("stale_claim", amount=len(finished) - len(deleted) - len(advanced))
+            logging.warning(f"クレームが失効していたか配信中にリマインドが変更されたため、{len(finished) - len(deleted) - len(advanced)} 件の完了処理を見送りました。")
+        if deleted:
+            logging.info(f"単発のリマインドID {deleted} の配信を終えました (スヌーズ用に残したもの: {retain})。")
+        if advanced and self.on_advanced:
+            for reminder_id, following in advanced:
+                self.on_advanced(reminder_id, following)
+
+    def failures(self, reminder_id: int, key: str) -> int:
+        """この発火でこれまでに送信できなかった回数を返す"""
+        failed_key, failures = self._failures.get(reminder_id, (None, 0))
+        return failures if failed_key == key else 0
+
+    def backoff(self, failures: int) -> float:
+        """failures 回目の失敗のあと再試行するまでの秒数を返す"""
+        return min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+
+    def group(self, rows):
+        """まとめ送信が有効なら宛先ごとに最大 digest_size 件ずつまとめ、無効なら1件ずつに分ける"""
+        if self.deliver_digest is None:
+            return [[row] for row in rows]
+        by_target = {}
+        for row in sorted(rows, key=lambda row: (row['next_fire_at'], row['id'])):
+            by_target.setdefault((row['guild_id'], row['target_type'], row['target_id']), []).append(row)
+        return [
+            rows_for_target[start:start + self.digest_size]
+            for rows_for_target in by_target.values()
+            for start in range(0, len(rows_for_target), self.digest_size)
+        ]
+
+    def next_occurrence(self, row, now: int):
+        """繰り返しリマインドの次回発火時刻を返す。ルールが終了・不正な場合はNoneを返す"""
+        return self.occurrence_after(row, max(row['next_fire_at'], now), row['fire_count'] + 1)
+
+    def resume_occurrence(self, row, now: int):
+        """一時停止中の繰り返しリマインドについて、now より後の最初の発火時刻を返す"""
+        return self.occurrence_after(row, now, row['fire_count'])
+
+    def occurrence_after(self, row, after: int, fire_count: int):
+        """after より後の発火時刻を返す。ルールが終了・不正な場合はNoneを返す"""
+        try:
+            return next_fire_at(row['recurrence_rule'], row['trigger_time'], after, fire_count)
+        except (TypeError, ValueError) as e:
+            logging.error(f"繰り返しルールの解析に失敗しました: ID {row['id']}, ルール {row['recurrence_rule']}, {e}")
+            return None
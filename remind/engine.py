@@ -0,0 +1,217 @@
+import asyncio
+import heapq
+import logging
+import time
+
+
+class ReminderEngine:
+    """直近の時間窓のリマインドを発火させるスケジューラ"""
+
+    def __init__(self, repository, fire, window_seconds: int = 600, refill_interval: int = 60,
+                 clock=time.time, sleep=asyncio.sleep, scope=None, max_batch: int = 500,
+                 lookahead: int = 0, prefetch=None, prefetch_seconds: int = 0, sweep_seconds: int = 0):
+        if refill_interval > window_seconds:
+            raise ValueError("refill_interval must not exceed window_seconds")
+        if lookahead + refill_interval > window_seconds:
+            raise ValueError("lookahead + refill_interval must not exceed window_seconds")
+        self.repository = repository
+        self.fire = fire
+        self.window_seconds = window_seconds
+        self.refill_interval = refill_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.scope = scope
+        self.max_batch = max_batch
+        self.lookahead = lookahead
+        self.prefetch = prefetch
+        self.prefetch_seconds = prefetch_seconds
+        self.sweep_seconds = sweep_seconds
+        self._heap = []
+        self._prefetch_heap = []
+        self._entries = {}
+        self._loaded_until = None
+        self._next_refill = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._fire_tasks = set()
+        self._firing_ids = set()
+        self._prefetch_tasks = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def firing(self) -> int:
+        return len(self._fire_tasks)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._heap.clear()
+        self._prefetch_heap.clear()
+        self._entries.clear()
+        self._loaded_until = 0
+        await self.refill()
+        self._task = asyncio.create_task(self._run(), name="reminder-engine")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._fire_tasks) + list(self._prefetch_tasks):
+            task.cancel()
+
+    def schedule(self, reminder_id: int, fire_at: int):
+        """リマインドを登録する。読み込み済みの時間窓より先なら次回の補充に任せる"""
+        self._entries.pop(reminder_id, None)
+        if self._loaded_until is None or fire_at > self._loaded_until:
+            return
+        self._push(reminder_id, fire_at)
+        if self._heap[0][1] == reminder_id or (self._prefetch_heap and self._prefetch_heap[0][1] == reminder_id):
+            self._wakeup.set()
+
+    def schedule_many(self, pairs):
+        """リマインドをまとめて登録する"""
+        if self._loaded_until is None:
+            return
+        for reminder_id, fire_at in pairs:
+            self._entries.pop(reminder_id, None)
+            if fire_at <= self._loaded_until:
+                self._push(reminder_id, fire_at)
+        self._wakeup.set()
+
+    @property
+    def loaded_until(self):
+        return self._loaded_until
+
+    def scheduled_at(self, reminder_id: int):
+        """登録済みの発火時刻を返す。登録されていなければ None"""
+        return self._entries.get(reminder_id)
+
+    def cancel(self, reminder_id: int):
+        self._entries.pop(reminder_id, None)
+
+    def _push(self, reminder_id: int, fire_at: int):
+        self._entries[reminder_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, reminder_id))
+        if self.prefetch is not None:
+            heapq.heappush(self._prefetch_heap, (fire_at, reminder_id))
+
+    async def refill(self):
+        """時間窓までのリマインドをDBから読み込む"""
+        now = int(self.clock())
+        horizon = now + self.window_seconds
+        after = min(self._loaded_until, now - self.sweep_seconds) if self.sweep_seconds else self._loaded_until
+        if horizon > after:
+            rows = await self._list_due(after, horizon)
+            for row in rows:
+                if row['id'] not in self._entries and row['id'] not in self._firing_ids:
+                    self._push(row['id'], row['next_fire_at'])
+            self._loaded_until = max(self._loaded_until, horizon)
+        self._next_refill = now + self.refill_interval
+
+    async def load_shards(self, shard_ids):
+        """新たに担当したシャードのリマインドを読み込む"""
+        if self._loaded_until is None or not shard_ids:
+            return
+        shard_count = self.scope()[0]
+        for shard_id in shard_ids:
+            for row in await self.repository.list_due_between(0, self._loaded_until, shards=(shard_count, {shard_id})):
+                if row['id'] not in self._entries and row['id'] not in self._firing_ids:
+                    self._push(row['id'], row['next_fire_at'])
+        self._wakeup.set()
+
+    def _list_due(self, after: int, until: int):
+        if self.scope is None:
+            return self.repository.list_due_between(after, until)
+        return self.repository.list_due_between(after, until, shards=self.scope())
+
+    def pop_due(self, now: float):
+        """発火時刻を過ぎたIDを返す"""
+        while self._heap and self._entries.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap or self._heap[0][0] > now:
+            return []
+        horizon = now + self.lookahead
+        due = []
+        while self._heap and self._heap[0][0] <= horizon and len(due) < self.max_batch:
+            fire_at, reminder_id = heapq.heappop(self._heap)
+            if self._entries.get(reminder_id) != fire_at:
+                continue
+            del self._entries[reminder_id]
+            due.append(reminder_id)
+        return due
+
+    def pop_prefetch(self, now: float):
+        """まもなく発火する、未先読みのIDを返す"""
+        horizon = now + self.prefetch_seconds
+        ahead = []
+        while self._prefetch_heap and self._prefetch_heap[0][0] <= horizon and len(ahead) < self.max_batch:
+            fire_at, reminder_id = heapq.heappop(self._prefetch_heap)
+            if self._entries.get(reminder_id) == fire_at and fire_at > now:
+                ahead.append(reminder_id)
+        return ahead
+
+    async def _run(self):
+        while True:
+            try:
+                now = self.clock()
+                if now >= self._next_refill:
+                    await self.refill()
+                due = self.pop_due(now)
+                if due:
+                    self._firing_ids.update(due)
+                    task = asyncio.create_task(self._fire(due))
+                    self._fire_tasks.add(task)
+                    task.add_done_callback(self._fire_tasks.discard)
+                ahead = self.pop_prefetch(now) if self.prefetch is not None else []
+                if ahead:
+                    task = asyncio.create_task(self._prefetch(ahead))
+                    self._prefetch_tasks.add(task)
+                    task.add_done_callback(self._prefetch_tasks.discard)
+                next_at = self._next_refill
+                if len(due) >= self.max_batch or len(ahead) >= self.max_batch:
+                    next_at = now
+                else:
+                    if self._heap:
+                        next_at = min(next_at, self._heap[0][0])
+                    if self._prefetch_heap:
+                        next_at = min(next_at, self._prefetch_heap[0][0] - self.prefetch_seconds)
+                await self._wait(max(0, next_at - self.clock()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"スケジューラエンジンでエラーが発生しました: {e}")
+                await self._wait(1)
+
+    async def _fire(self, reminder_ids):
+        try:
+            await self.fire(reminder_ids)
+        except Exception as e:
+            logging.error(f"リマインド {reminder_ids} の発火処理でエラーが発生しました: {e}")
+        finally:
+            self._firing_ids.difference_update(reminder_ids)
+
+    async def _prefetch(self, reminder_ids):
+        try:
+            await self.prefetch(reminder_ids)
+        except Exception as e:
+            logging.warning(f"リマインド {reminder_ids} の先読みでエラーが発生しました: {e}")
+
+    async def _wait(self, delay: float):
+        self._wakeup.clear()
+        sleeper = asyncio.ensure_future(self.sleep(delay))
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({sleeper, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sleeper.cancel()
+            waiter.cancel()
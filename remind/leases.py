@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+
+def shard_of(guild_id, shard_count: int) -> int:
+    """Discordと同じ規則でサーバーIDからシャード番号を求める"""
+    return (int(guild_id) >> 22) % shard_count
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def plan_leases(leases, owner: str, preferred, shard_count: int, now: float, ttl: float):
+    """現在のリースから更新・取得・譲渡を決める"""
+    expires_at = now + ttl
+    owned, claimed, updates = set(), {}, {}
+    for shard_id in range(shard_count):
+        lease = leases.get(shard_id)
+        if lease is not None and lease[0] == owner and lease[1] > now:
+            if shard_id not in preferred and lease[2] not in (None, owner):
+                updates[shard_id] = (owner, now, lease[2])
+                continue
+            updates[shard_id] = (owner, expires_at, lease[2])
+            owned.add(shard_id)
+        elif lease is None or lease[1] <= now:
+            if (lease is not None and lease[2] not in (None, owner) and shard_id not in preferred
+                    and lease[1] > now - ttl):
+                continue
+            updates[shard_id] = (owner, expires_at, None)
+            owned.add(shard_id)
+            claimed[shard_id] = lease[1] - ttl if lease is not None else now
+        elif shard_id in preferred and lease[2] != owner:
+            updates[shard_id] = (lease[0], lease[1], owner)
+    return owned, claimed, updates
+
+
+def sync_leases(conn, owner: str, preferred, shard_count: int, now: float, ttl: float):
+    """リースの更新・取得・譲渡を1トランザクションで行い、(保持中の集合, 新規取得 {shard: 担当開始時刻}) を返す"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        leases = {row[0]: tuple(row[1:]) for row in conn.execute("SELECT shard_id, owner, expires_at, wanted_by FROM shard_leases")}
+        owned, claimed, updates = plan_leases(leases, owner, preferred, shard_count, now, ttl)
+        conn.executemany(
+            "INSERT INTO shard_leases (shard_id, owner, expires_at, wanted_by) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(shard_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at, wanted_by = excluded.wanted_by",
+            [(shard_id, *lease) for shard_id, lease in updates.items()],
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return owned, claimed
+
+
+def release_leases(conn, owner: str, now: float):
+    with conn:
+        conn.execute("UPDATE shard_leases SET expires_at = ? WHERE owner = ? AND expires_at > ?", (now, owner, now))
+
+
+class LeaseManager:
+    """shard_leases テーブルの期限付きリースで、このプロセスが配信を担当するシャードを決める"""
+
+    def __init__(self, repository, shard_count: int, preferred=(), owner: str = None, ttl: float = 15.0,
+                 renew_interval: float = 5.0, on_change=None, clock=time.time, sleep=asyncio.sleep):
+        if renew_interval >= ttl:
+            raise ValueError("renew_interval must be shorter than ttl")
+        self.repository = repository
+        self.shard_count = shard_count
+        self.preferred = frozenset(preferred)
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.on_change = on_change
+        self.clock = clock
+        self.sleep = sleep
+        self.owned = frozenset()
+        self._valid_until = 0
+        self._task = None
+
+    def owns_guild(self, guild_id) -> bool:
+        """リースが有効期限内で、サーバーのシャードを保持している場合のみTrueを返す"""
+        return self.clock() < self._valid_until and shard_of(guild_id, self.shard_count) in self.owned
+
+    def scope(self):
+        """リポジトリの検索条件に渡す (シャード数, 保持中のシャード) を返す"""
+        return self.shard_count, self.owned
+
+    async def tick(self):
+        now = self.clock()
+        owned, claimed = await self.repository.sync_leases(self.owner, self.preferred, self.shard_count, now, self.ttl)
+        lost = self.owned - owned
+        self.owned = frozenset(owned)
+        self._valid_until = now + self.ttl
+        if claimed or lost:
+            logging.info(f"シャードのリースを更新しました。取得: {sorted(claimed)}, 喪失: {sorted(lost)}, 保持中: {sorted(self.owned)}")
+            if self.on_change is not None:
+                await self.on_change(claimed, lost)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        await self.tick()
+        self._task = asyncio.create_task(self._run(), name="shard-leases")
+
+    async def stop(self):
+        """更新を止め、保持中のリースを即座に失効させて他プロセスへ引き継ぐ"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.owned:
+            self.owned = frozenset()
+            self._valid_until = 0
+            await self.repository.release_leases(self.owner, self.clock())
+
+    async def _run(self):
+        while True:
+            await self.sleep(self.renew_interval)
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"シャードのリース更新でエラーが発生しました: {e}")
@@ -0,0 +1,395 @@
+import bisect
+import heapq
+import math
+
+from remind.leases import plan_leases, shard_of
+from remind.storage import check_editable, timed
+
+
+def _insert_key(index: dict, name, key):
+    bisect.insort(index.setdefault(name, []), key)
+
+
+def _remove_sorted(keys: list, key):
+    position = bisect.bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+
+
+def _remove_key(index: dict, name, key):
+    keys = index.get(name)
+    if keys is None:
+        return
+    _remove_sorted(keys, key)
+    if not keys:
+        del index[name]
+
+
+def _target_key(row):
+    return row['guild_id'], row['target_type'], row['target_id']
+
+
+class MemoryReminderStore:
+    """ReminderStore のメモリ上の実装"""
+
+    def __init__(self):
+        self._rows = {}
+        self._next_id = 1
+        self._by_fire = []
+        self._by_owner = {}
+        self._by_guild = {}
+        self._by_target = {}
+        self._user_counts = {}
+        self._guild_counts = {}
+        self._deliveries = {}
+        self._history = {}
+        self._history_by_reminder = {}
+        self._next_history_id = 1
+        self._leases = {}
+        self._done = set()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _insert(self, values):
+        (user_id, guild_id, channel_id, target_type, target_id, message, trigger_time, next_fire_at,
+         is_recurring, recurrence_rule, created_at, fire_count) = values
+        reminder_id = self._next_id
+        self._next_id += 1
+        row = {
+            "id": reminder_id, "user_id": str(user_id), "guild_id": str(guild_id), "channel_id": str(channel_id),
+            "target_type": target_type, "target_id": str(target_id), "message": message,
+            "trigger_time": trigger_time, "is_recurring": int(bool(is_recurring)), "recurrence_rule": recurrence_rule,
+            "created_at": None if created_at is None else str(created_at), "next_fire_at": next_fire_at,
+            "fire_count": fire_count, "paused_at": None,
+        }
+        self._rows[reminder_id] = row
+        _insert_key(self._by_guild, row['guild_id'], reminder_id)
+        self._by_target.setdefault(_target_key(row), set()).add(reminder_id)
+        if next_fire_at is None:
+            self._done.add(reminder_id)
+        else:
+            self._activate(row)
+        return reminder_id
+
+    def _activate(self, row):
+        key = (row['next_fire_at'], row['id'])
+        if row['paused_at'] is None:
+            bisect.insort(self._by_fire, key)
+        _insert_key(self._by_owner, (row['user_id'], row['guild_id']), key)
+        self._count(row, 1)
+
+    def _deactivate(self, row):
+        key = (row['next_fire_at'], row['id'])
+        _remove_sorted(self._by_fire, key)
+        _remove_key(self._by_owner, (row['user_id'], row['guild_id']), key)
+        self._count(row, -1)
+
+    def _count(self, row, delta: int):
+        owner = (row['guild_id'], row['user_id'])
+        self._user_counts[owner] = self._user_counts.get(owner, 0) + delta
+        if self._user_counts[owner] <= 0:
+            del self._user_counts[owner]
+        self._guild_counts[row['guild_id']] = self._guild_counts.get(row['guild_id'], 0) + delta
+        if self._guild_counts[row['guild_id']] <= 0:
+            del self._guild_counts[row['guild_id']]
+
+    def _remove(self, reminder_id) -> bool:
+        row = self._rows.pop(reminder_id, None)
+        if row is None:
+            return False
+        if row['next_fire_at'] is None:
+            self._done.discard(reminder_id)
+        else:
+            self._deactivate(row)
+        _remove_key(self._by_guild, row['guild_id'], reminder_id)
+        targets = self._by_target[_target_key(row)]
+        targets.discard(reminder_id)
+        if not targets:
+            del self._by_target[_target_key(row)]
+        return True
+
+    def _reschedule(self, row, next_fire_at):
+        self._update(row, {"next_fire_at": next_fire_at})
+
+    def _update(self, row, changes):
+        if row['next_fire_at'] is None:
+            self._done.discard(row['id'])
+        else:
+            self._deactivate(row)
+        row.update(changes)
+        if row['next_fire_at'] is None:
+            self._done.add(row['id'])
+        else:
+            self._activate(row)
+
+    def _owned(self, reminder_id, user_id, guild_id):
+        row = self._rows.get(reminder_id)
+        if row is None or row['user_id'] != str(user_id) or row['guild_id'] != str(guild_id):
+            return None
+        return row
+
+    def _may_snooze(self, row, user_id) -> bool:
+        return row is not None and not row['is_recurring'] and (
+            row['user_id'] == str(user_id) or (row['target_type'] == 'user' and row['target_id'] == str(user_id)))
+
+    def _usage(self, user_id, guild_id):
+        return self._user_counts.get((str(guild_id), str(user_id)), 0), self._guild_counts.get(str(guild_id), 0)
+
+    @timed
+    async def add(self, user_id: str, guild_id: str, channel_id: str, target_type: str, target_id: str,
+                  message: str, trigger_time: int, is_recurring: bool, recurrence_rule, created_at, check=None) -> int:
+        if check is not None:
+            check(*self._usage(user_id, guild_id))
+        return self._insert((user_id, guild_id, channel_id, target_type, target_id, message,
+                             trigger_time, trigger_time, is_recurring, recurrence_rule, created_at, 0))
+
+    @timed
+    async def add_many(self, rows):
+        return [self._insert(values) for values in rows]
+
+    @timed
+    async def get(self, reminder_id: int):
+        row = self._rows.get(reminder_id)
+        return dict(row) if row is not None else None
+
+    @timed
+    async def get_many(self, reminder_ids):
+        return [dict(self._rows[reminder_id]) for reminder_id in sorted(set(reminder_ids)) if reminder_id in self._rows]
+
+    @timed
+    async def list_due_between(self, after: int, until: int, shards=None):
+        """発火時刻の索引を二分探索し、next_fire_at が (after, until] に入るリマインドを返す"""
+        start = bisect.bisect_right(self._by_fire, (after, math.inf))
+        end = bisect.bisect_right(self._by_fire, (until, math.inf))
+        keys = self._by_fire[start:end]
+        if shards is not None:
+            shard_count, shard_ids = shards
+            keys = [key for key in keys if shard_of(self._rows[key[1]]['guild_id'], shard_count) in shard_ids]
+        return [{"id": reminder_id, "next_fire_at": fire_at} for fire_at, reminder_id in keys]
+
+    @timed
+    async def list_active_page_for_user(self, user_id: str, guild_id: str, now: int, after=None, limit: int = 10):
+        keys = self._by_owner.get((str(user_id), str(guild_id)), [])
+        start = bisect.bisect_right(keys, tuple(after) if after else (-1, -1))
+        rows = []
+        for position in range(start, len(keys)):
+            if len(rows) >= limit:
+                break
+            fire_at, reminder_id = keys[position]
+            row = self._rows[reminder_id]
+            if fire_at > now or row['is_recurring']:
+                rows.append(dict(row))
+        return rows
+
+    @timed
+    async def list_page_for_guild(self, guild_id: str, after_id: int = 0, limit: int = 500):
+        ids = self._by_guild.get(str(guild_id), [])
+        rows = []
+        for position in range(bisect.bisect_right(ids, after_id), len(ids)):
+            if len(rows) >= limit:
+                break
+            row = self._rows[ids[position]]
+            if row['next_fire_at'] is not None:
+                rows.append(dict(row))
+        return rows
+
+    @timed
+    async def list_targets(self):
+        return [{"guild_id": guild_id, "target_type": target_type, "target_id": target_id, "reminders": len(ids)}
+                for (guild_id, target_type, target_id), ids in sorted(self._by_target.items())]
+
+    @timed
+    async def usage(self, user_id: str, guild_id: str):
+        return self._usage(user_id, guild_id)
+
+    @timed
+    async def claim_deliveries(self, firings, owner: str, claim_token: str, now: float, stale_before: float):
+        live = {lease[0] for lease in self._leases.values() if lease[1] > now}
+        claimed = []
+        for reminder_id, fire_at, key in firings:
+            delivery = self._deliveries.get(key)
+            if delivery is None:
+                delivery = self._deliveries[key] = {"reminder_id": reminder_id, "fire_at": fire_at, "attempts": 0}
+            elif not (delivery['state'] == 'pending' or (delivery['state'] == 'claimed' and (
+                    delivery['claimed_at'] <= stale_before
+                    or (delivery['claimed_by'] != owner and delivery['claimed_by'] not in live)))):
+                continue
+            delivery.update(state='claimed', claimed_by=owner, claim_token=claim_token, claimed_at=now,
+                            attempts=delivery['attempts'] + 1)
+            claimed.append(delivery['reminder_id'])
+        return claimed
+
+    @timed
+    async def release_deliveries(self, keys, claim_token: str):
+        for key in keys:
+            delivery = self._deliveries.get(key)
+            if delivery is not None and delivery['claim_token'] == claim_token:
+                delivery.update(state='pending', claim_token=None)
+
+    @timed
+    async def complete(self, claim_token: str, finished, now: float, prune_before: float = None, history=None, retain=()):
+        deleted, advanced = [], []
+        history = {entry[0]: entry for entry in history or ()}
+        for reminder_id, key, next_fire in finished:
+            delivery = self._deliveries.get(key)
+            if delivery is None or delivery['claim_token'] != claim_token:
+                continue
+            delivery.update(state='sent', sent_at=now)
+            if reminder_id in history:
+                self._record_history(history[reminder_id], now)
+            row = self._rows.get(reminder_id)
+            if row is None or row['next_fire_at'] != delivery['fire_at']:
+                continue
+            if next_fire is None:
+                if reminder_id in retain:
+                    self._reschedule(row, None)
+                else:
+                    self._remove(reminder_id)
+                deleted.append(reminder_id)
+            else:
+                self._reschedule(row, next_fire)
+                row['fire_count'] += 1
+                advanced.append((reminder_id, next_fire))
+        if prune_before is not None:
+            for key in [key for key, delivery in self._deliveries.items()
+                        if delivery['state'] == 'sent' and delivery['sent_at'] < prune_before]:
+                del self._deliveries[key]
+        return deleted, advanced
+
+    def _record_history(self, entry, now):
+        reminder_id, guild_id, user_id, fire_at, lag_ms, outcome = entry
+        history_id = self._next_history_id
+        self._next_history_id += 1
+        self._history[history_id] = {
+            "id": history_id, "reminder_id": reminder_id, "guild_id": str(guild_id), "user_id": str(user_id),
+            "fire_at": fire_at, "recorded_at": int(now), "lag_ms": lag_ms, "outcome": outcome,
+        }
+        self._history_by_reminder.setdefault(reminder_id, []).append(history_id)
+
+    @timed
+    async def snooze(self, reminder_id: int, user_id: str, fire_at: int):
+        row = self._rows.get(reminder_id)
+        if not self._may_snooze(row, user_id):
+            return None
+        self._reschedule(row, fire_at)
+        row['trigger_time'] = fire_at
+        return row['guild_id']
+
+    @timed
+    async def dismiss(self, reminder_id: int, user_id: str) -> bool:
+        if not self._may_snooze(self._rows.get(reminder_id), user_id):
+            return False
+        return self._remove(reminder_id)
+
+    @timed
+    async def prune_done(self, before: int, batch_size: int = 500) -> int:
+        expired = [reminder_id for reminder_id in self._done if self._rows[reminder_id]['trigger_time'] < before][:batch_size]
+        for reminder_id in expired:
+            self._remove(reminder_id)
+        return len(expired)
+
+    @timed
+    async def delete(self, reminder_id: int) -> bool:
+        return self._remove(reminder_id)
+
+    @timed
+    async def delete_owned(self, reminder_id: int, user_id: str, guild_id: str) -> bool:
+        if self._owned(reminder_id, user_id, guild_id) is None:
+            return False
+        return self._remove(reminder_id)
+
+    @timed
+    async def delete_matching(self, user_id: str, guild_id: str, target=None, contains: str = None, recurring: bool = None):
+        matched = []
+        for _, reminder_id in self._by_owner.get((str(user_id), str(guild_id)), []):
+            row = self._rows[reminder_id]
+            if target is not None and (row['target_type'], row['target_id']) != (target[0], str(target[1])):
+                continue
+            if contains and contains not in row['message']:
+                continue
+            if recurring is not None and bool(row['is_recurring']) != recurring:
+                continue
+            matched.append(reminder_id)
+        for reminder_id in matched:
+            self._remove(reminder_id)
+        return matched
+
+    @timed
+    async def update_owned(self, reminder_id: int, user_id: str, guild_id: str, **changes):
+        check_editable(changes)
+        row = self._owned(reminder_id, user_id, guild_id)
+        if row is None or row['next_fire_at'] is None:
+            return None
+        if 'is_recurring' in changes:
+            changes = changes | {"is_recurring": int(bool(changes['is_recurring']))}
+        self._update(row, changes)
+        return dict(row)
+
+    @timed
+    async def delete_many(self, reminder_ids) -> int:
+        return sum(self._remove(reminder_id) for reminder_id in set(reminder_ids))
+
+    @timed
+    async def purge_guilds(self, guild_ids):
+        deleted = []
+        for guild_id in guild_ids:
+            for reminder_id in list(self._by_guild.get(str(guild_id), ())):
+                self._remove(reminder_id)
+                deleted.append(reminder_id)
+        return deleted
+
+    @timed
+    async def purge_targets(self, targets):
+        deleted = []
+        for guild_id, target_type, target_id in targets:
+            for reminder_id in sorted(self._by_target.get((str(guild_id), target_type, str(target_id)), ())):
+                self._remove(reminder_id)
+                deleted.append(reminder_id)
+        return deleted
+
+    @timed
+    async def history_for_user(self, reminder_id: int, user_id: str, guild_id: str, limit: int = 10):
+        rows = []
+        for history_id in reversed(self._history_by_reminder.get(reminder_id, [])):
+            row = self._history[history_id]
+            if row['user_id'] == str(user_id) and row['guild_id'] == str(guild_id):
+                rows.append(dict(row))
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    @timed
+    async def prune_history(self, before: int, batch_size: int = 500) -> int:
+        expired = heapq.nsmallest(
+            batch_size, (history_id for history_id, row in self._history.items() if row['recorded_at'] < before),
+            key=lambda history_id: (self._history[history_id]['recorded_at'], history_id))
+        for history_id in expired:
+            row = self._history.pop(history_id)
+            ids = self._history_by_reminder[row['reminder_id']]
+            ids.remove(history_id)
+            if not ids:
+                del self._history_by_reminder[row['reminder_id']]
+        return len(expired)
+
+    @timed
+    async def incremental_vacuum(self, pages: int):
+        return 0, 0
+
+    @timed
+    async def sync_leases(self, owner: str, preferred, shard_count: int, now: float, ttl: float):
+        owned, claimed, updates = plan_leases(self._leases, owner, preferred, shard_count, now, ttl)
+        self._leases.update(updates)
+        return owned, claimed
+
+    @timed
+    async def release_leases(self, owner: str, now: float):
+        for shard_id, (lease_owner, expires_at, wanted_by) in list(self._leases.items()):
+            if lease_owner == owner and expires_at > now:
+                self._leases[shard_id] = (lease_owner, now, wanted_by)
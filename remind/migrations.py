@@ -0,0 +1,270 @@
+import logging
+import time
+
+from remind.recurrence import next_fire_at
+from remind.timeutil import legacy_to_epoch
+
+
+def _create_reminders(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            target_type TEXT NOT NULL,
+            target_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            trigger_time DATETIME NOT NULL,
+            is_recurring BOOLEAN NOT NULL DEFAULT 0,
+            recurrence_rule TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _epoch_trigger_time(conn):
+    conn.create_function("legacy_to_epoch", 1, legacy_to_epoch, deterministic=True)
+    conn.execute('''
+        CREATE TABLE reminders_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            target_type TEXT NOT NULL,
+            target_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            trigger_time INTEGER NOT NULL,
+            is_recurring BOOLEAN NOT NULL DEFAULT 0,
+            recurrence_rule TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO reminders_new (id, user_id, guild_id, channel_id, target_type, target_id, message, trigger_time, is_recurring, recurrence_rule, created_at)
+        SELECT id, user_id, guild_id, channel_id, target_type, target_id, message,
+               CASE WHEN typeof(trigger_time) = 'integer' THEN trigger_time ELSE legacy_to_epoch(trigger_time) END,
+               is_recurring, recurrence_rule, created_at
+        FROM reminders
+    ''')
+    conn.execute("DROP TABLE reminders")
+    conn.execute("ALTER TABLE reminders_new RENAME TO reminders")
+
+
+def _initial_next_fire_at(is_recurring, rule, trigger_time, now):
+    if not is_recurring or trigger_time > now:
+        return trigger_time
+    try:
+        return next_fire_at(rule, trigger_time, now)
+    except (TypeError, ValueError):
+        return trigger_time
+
+
+def _next_fire_at_column(conn):
+    conn.create_function("initial_next_fire_at", 4, _initial_next_fire_at)
+    conn.execute("ALTER TABLE reminders ADD COLUMN next_fire_at INTEGER")
+    conn.execute("ALTER TABLE reminders ADD COLUMN fire_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        "UPDATE reminders SET next_fire_at = initial_next_fire_at(is_recurring, recurrence_rule, trigger_time, ?)",
+        (int(time.time()),),
+    )
+    conn.execute("DELETE FROM reminders WHERE next_fire_at IS NULL")
+    conn.execute("CREATE INDEX idx_reminders_owner ON reminders(user_id, guild_id, next_fire_at)")
+
+
+def _shard_leases(conn):
+    conn.execute('''
+        CREATE TABLE shard_leases (
+            shard_id INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            wanted_by TEXT
+        )
+    ''')
+
+
+def _deliveries(conn):
+    conn.execute('''
+        CREATE TABLE deliveries (
+            idempotency_key TEXT PRIMARY KEY,
+            reminder_id INTEGER NOT NULL,
+            fire_at INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            claimed_by TEXT,
+            claim_token TEXT,
+            claimed_at REAL,
+            sent_at REAL,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_deliveries_sent ON deliveries(sent_at) WHERE state = 'sent'")
+
+
+def _target_index(conn):
+    conn.execute("CREATE INDEX idx_reminders_target ON reminders(guild_id, target_type, target_id)")
+
+
+def _delivery_history(conn):
+    conn.execute('''
+        CREATE TABLE delivery_history (
+            id INTEGER PRIMARY KEY,
+            reminder_id INTEGER NOT NULL,
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            fire_at INTEGER NOT NULL,
+            recorded_at INTEGER NOT NULL,
+            lag_ms INTEGER NOT NULL,
+            outcome TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_history_reminder ON delivery_history(reminder_id)")
+
+
+def _reminder_counts(conn):
+    conn.execute('''
+        CREATE TABLE reminder_counts (
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            active INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT INTO reminder_counts (guild_id, user_id, active)
+        SELECT guild_id, user_id, COUNT(*) FROM reminders GROUP BY guild_id, user_id
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_count_insert AFTER INSERT ON reminders BEGIN
+            INSERT INTO reminder_counts (guild_id, user_id, active) VALUES (NEW.guild_id, NEW.user_id, 1)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET active = active + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_count_delete AFTER DELETE ON reminders BEGIN
+            UPDATE reminder_counts SET active = active - 1 WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id;
+            DELETE FROM reminder_counts WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id AND active <= 0;
+        END
+    ''')
+
+
+def _done_reminders(conn):
+    conn.execute("DROP TRIGGER reminders_count_insert")
+    conn.execute("DROP TRIGGER reminders_count_delete")
+    conn.execute('''
+        CREATE TRIGGER reminders_count_insert AFTER INSERT ON reminders WHEN NEW.next_fire_at IS NOT NULL BEGIN
+            INSERT INTO reminder_counts (guild_id, user_id, active) VALUES (NEW.guild_id, NEW.user_id, 1)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET active = active + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_count_delete AFTER DELETE ON reminders WHEN OLD.next_fire_at IS NOT NULL BEGIN
+            UPDATE reminder_counts SET active = active - 1 WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id;
+            DELETE FROM reminder_counts WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id AND active <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_count_done AFTER UPDATE OF next_fire_at ON reminders
+        WHEN OLD.next_fire_at IS NOT NULL AND NEW.next_fire_at IS NULL BEGIN
+            UPDATE reminder_counts SET active = active - 1 WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id;
+            DELETE FROM reminder_counts WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id AND active <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_count_reopen AFTER UPDATE OF next_fire_at ON reminders
+        WHEN OLD.next_fire_at IS NULL AND NEW.next_fire_at IS NOT NULL BEGIN
+            INSERT INTO reminder_counts (guild_id, user_id, active) VALUES (NEW.guild_id, NEW.user_id, 1)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET active = active + 1;
+        END
+    ''')
+    conn.execute("CREATE INDEX idx_reminders_done ON reminders(trigger_time) WHERE next_fire_at IS NULL")
+
+
+def _paused_at_column(conn):
+    conn.execute("ALTER TABLE reminders ADD COLUMN paused_at INTEGER")
+    conn.execute("CREATE INDEX idx_reminders_next_fire ON reminders(next_fire_at) WHERE paused_at IS NULL")
+
+
+def _history_recorded_index(conn):
+    conn.execute("CREATE INDEX idx_history_recorded ON delivery_history(recorded_at)")
+
+
+def _guild_counts(conn):
+    conn.execute('''
+        CREATE TABLE reminder_guild_counts (
+            guild_id TEXT PRIMARY KEY,
+            active INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT INTO reminder_guild_counts (guild_id, active)
+        SELECT guild_id, SUM(active) FROM reminder_counts GROUP BY guild_id
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_guild_count_insert AFTER INSERT ON reminders WHEN NEW.next_fire_at IS NOT NULL BEGIN
+            INSERT INTO reminder_guild_counts (guild_id, active) VALUES (NEW.guild_id, 1)
+            ON CONFLICT(guild_id) DO UPDATE SET active = active + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_guild_count_delete AFTER DELETE ON reminders WHEN OLD.next_fire_at IS NOT NULL BEGIN
+            UPDATE reminder_guild_counts SET active = active - 1 WHERE guild_id = OLD.guild_id;
+            DELETE FROM reminder_guild_counts WHERE guild_id = OLD.guild_id AND active <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_guild_count_done AFTER UPDATE OF next_fire_at ON reminders
+        WHEN OLD.next_fire_at IS NOT NULL AND NEW.next_fire_at IS NULL BEGIN
+            UPDATE reminder_guild_counts SET active = active - 1 WHERE guild_id = OLD.guild_id;
+            DELETE FROM reminder_guild_counts WHERE guild_id = OLD.guild_id AND active <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER reminders_guild_count_reopen AFTER UPDATE OF next_fire_at ON reminders
+        WHEN OLD.next_fire_at IS NULL AND NEW.next_fire_at IS NOT NULL BEGIN
+            INSERT INTO reminder_guild_counts (guild_id, active) VALUES (NEW.guild_id, 1)
+            ON CONFLICT(guild_id) DO UPDATE SET active = active + 1;
+        END
+    ''')
+
+
+MIGRATIONS = [
+    _create_reminders,
+    _epoch_trigger_time,
+    _next_fire_at_column,
+    _shard_leases,
+    _deliveries,
+    _target_index,
+    _delivery_history,
+    _reminder_counts,
+    _done_reminders,
+    _paused_at_column,
+    _history_recorded_index,
+    _guild_counts,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """PRAGMA user_version を基準に未適用のマイグレーションを順に適用する"""
+    version = get_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"データベースのスキーマバージョン {version} はこのボットの対応範囲 ({SCHEMA_VERSION}) より新しいです。")
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_version(conn) >= number:
+                conn.execute("COMMIT")
+                continue
+            MIGRATIONS[number - 1](conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logging.info(f"データベースをスキーマバージョン {number} に移行しました。")
+    return get_version(conn)
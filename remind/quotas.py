@@ -0,0 +1,103 @@
+import math
+import time
+
+from remind.recurrence import next_fire_at
+from remind.send_queue import RateLimitBucket
+
+
+class QuotaExceeded(ValueError):
+    """リマインド作成の上限に達したことを表す例外。kind は上限の種類、str() は利用者向けの説明"""
+
+    def __init__(self, kind: str, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+def shortest_interval(rule: str, dtstart: int, samples: int = 24):
+    """繰り返しルールの最短の発火間隔 (秒) を返す"""
+    previous = next_fire_at(rule, dtstart, dtstart - 1)
+    shortest = None
+    for fire_count in range(1, samples):
+        if previous is None:
+            break
+        following = next_fire_at(rule, dtstart, previous, fire_count)
+        if following is None:
+            break
+        gap = following - previous
+        shortest = gap if shortest is None else min(shortest, gap)
+        previous = following
+    return shortest
+
+
+class Quotas:
+    """ユーザー・サーバーごとの有効なリマインド数、繰り返しの最短間隔、ユーザーごとの作成頻度の上限。0の項目は無制限"""
+
+    def __init__(self, max_per_user: int = 0, max_per_guild: int = 0, min_interval: int = 0,
+                 creation_rate: int = 0, creation_per: float = 60.0, interval_samples: int = 24, clock=time.monotonic,
+                 prune_threshold: int = 1024):
+        self.max_per_user = max_per_user
+        self.max_per_guild = max_per_guild
+        self.min_interval = min_interval
+        self.creation_rate = creation_rate
+        self.creation_per = creation_per
+        self.interval_samples = interval_samples
+        self.clock = clock
+        self.prune_threshold = prune_threshold
+        self._buckets = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "Quotas":
+        """設定の QUOTA_* から上限を作る"""
+        return cls(max_per_user=settings.quota_max_per_user, max_per_guild=settings.quota_max_per_guild,
+                   min_interval=settings.quota_min_interval_seconds, creation_rate=settings.quota_creation_rate,
+                   creation_per=settings.quota_creation_per, interval_samples=settings.quota_interval_samples,
+                   prune_threshold=settings.quota_bucket_prune_threshold)
+
+    def admit(self, user_id):
+        """作成頻度の枠を1つ消費する。枠がなければ QuotaExceeded を送出する"""
+        if not self.creation_rate:
+            return
+        now = self.clock()
+        if len(self._buckets) > self.prune_threshold:
+            self._prune_buckets(now)
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = RateLimitBucket(self.creation_rate, self.creation_per)
+        delay = bucket.delay(now)
+        if delay > 0:
+            raise QuotaExceeded("rate", f"リマインドの作成が多すぎます。{math.ceil(delay)} 秒後に再度お試しください。", delay)
+        bucket.take(now)
+
+    def refund(self, user_id):
+        """admit で消費した作成頻度の枠を1つ戻す"""
+        bucket = self._buckets.get(user_id)
+        if bucket is not None:
+            bucket.refund()
+
+    def _prune_buckets(self, now):
+        for user_id in [user_id for user_id, bucket in self._buckets.items() if bucket.reset_at <= now]:
+            del self._buckets[user_id]
+
+    def check_rule(self, rule: str, dtstart: int):
+        """繰り返しの間隔が min_interval 秒より短ければ QuotaExceeded を送出する"""
+        if not self.min_interval or not rule:
+            return
+        gap = shortest_interval(rule, dtstart, self.interval_samples)
+        if gap is not None and gap < self.min_interval:
+            raise QuotaExceeded("interval", f"繰り返しの間隔が短すぎます ({gap} 秒)。{self.min_interval} 秒以上の間隔にしてください。")
+
+    def check_usage(self, user_active: int, guild_active: int, adding: int = 1):
+        """作成後の有効なリマインド数が上限を超える場合は QuotaExceeded を送出する"""
+        if self.max_per_user and user_active + adding > self.max_per_user:
+            raise QuotaExceeded("user", f"1人が設定できるリマインドは {self.max_per_user} 件までです (現在 {user_active} 件)。不要なリマインドを削除してください。")
+        if self.max_per_guild and guild_active + adding > self.max_per_guild:
+            raise QuotaExceeded("guild", f"このサーバーで設定できるリマインドは {self.max_per_guild} 件までです (現在 {guild_active} 件)。")
+
+    def remaining_for_user(self, user_active: int):
+        """ユーザーがあと何件追加できるかを返す。無制限ならNoneを返す"""
+        return max(0, self.max_per_user - user_active) if self.max_per_user else None
+
+    def remaining_for_guild(self, guild_active: int):
+        """サーバーにあと何件追加できるかを返す。無制限ならNoneを返す"""
+        return max(0, self.max_per_guild - guild_active) if self.max_per_guild else None
@@ -0,0 +1,181 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from remind.timeutil import TIMEZONE, from_epoch, to_epoch
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+MAX_PERIODS = 10000
+
+
+@dataclass(frozen=True)
+class Recurrence:
+    """RRULE風の文字列を解析済みの形で保持する繰り返しルール"""
+
+    freq: str
+    interval: int = 1
+    byday: tuple = ()
+    bymonthday: tuple = ()
+    bymonth: tuple = ()
+    byhour: tuple = ()
+    byminute: tuple = ()
+    until: int = None
+    count: int = None
+
+    def times(self, dtstart: datetime):
+        hours = self.byhour or (dtstart.hour,)
+        minutes = self.byminute or (dtstart.minute,)
+        return sorted(time(hour, minute) for hour in hours for minute in minutes)
+
+    def _days_in_period(self, period_start: date, dtstart: datetime):
+        if self.freq == "DAILY":
+            days = [period_start]
+        elif self.freq == "WEEKLY":
+            weekdays = sorted({weekday for _, weekday in self.byday}) or [dtstart.weekday()]
+            days = [period_start + timedelta(days=weekday) for weekday in weekdays]
+        elif self.freq == "MONTHLY":
+            days = self._month_days(period_start.year, period_start.month, dtstart)
+        else:
+            days = []
+            for month in self.bymonth or (dtstart.month,):
+                days.extend(self._month_days(period_start.year, month, dtstart))
+            return sorted(days)
+        if self.freq == "DAILY" and self.byday:
+            days = [day for day in days if day.weekday() in {weekday for _, weekday in self.byday}]
+        if self.bymonth and self.freq != "YEARLY":
+            days = [day for day in days if day.month in self.bymonth]
+        return days
+
+    def _month_days(self, year: int, month: int, dtstart: datetime):
+        last = calendar.monthrange(year, month)[1]
+        days = set()
+        if self.byday:
+            for ordinal, weekday in self.byday:
+                matches = [day for day in range(1, last + 1) if date(year, month, day).weekday() == weekday]
+                if ordinal == 0:
+                    days.update(matches)
+                elif -len(matches) <= ordinal <= len(matches):
+                    days.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+        else:
+            for day in self.bymonthday or (dtstart.day,):
+                resolved = day if day > 0 else last + day + 1
+                if 1 <= resolved <= last:
+                    days.add(resolved)
+        return [date(year, month, day) for day in sorted(days)]
+
+    def _period_start(self, dtstart: datetime, index: int) -> date:
+        start = dtstart.date()
+        if self.freq == "DAILY":
+            return start + timedelta(days=index * self.interval)
+        if self.freq == "WEEKLY":
+            return start - timedelta(days=start.weekday()) + timedelta(weeks=index * self.interval)
+        if self.freq == "MONTHLY":
+            months = start.month - 1 + index * self.interval
+            return date(start.year + months // 12, months % 12 + 1, 1)
+        return date(start.year + index * self.interval, 1, 1)
+
+    def _first_period_index(self, dtstart: datetime, after: datetime) -> int:
+        start, target = dtstart.date(), after.date()
+        if target <= start:
+            return 0
+        if self.freq == "DAILY":
+            elapsed = (target - start).days
+        elif self.freq == "WEEKLY":
+            elapsed = (target - start).days // 7
+        elif self.freq == "MONTHLY":
+            elapsed = (target.year - start.year) * 12 + target.month - start.month
+        else:
+            elapsed = target.year - start.year
+        return max(0, elapsed // self.interval - 1)
+
+    def next_after(self, dtstart: datetime, after: datetime):
+        """dtstart を起点とするルールで、after より後の最初の発生日時を返す。終了していればNoneを返す"""
+        dtstart = dtstart.astimezone(TIMEZONE)
+        times = self.times(dtstart)
+        index = self._first_period_index(dtstart, after)
+        for index in range(index, index + MAX_PERIODS):
+            period_start = self._period_start(dtstart, index)
+            if self.until is not None and to_epoch(TIMEZONE.localize(datetime.combine(period_start, time()))) > self.until:
+                return None
+            for day in self._days_in_period(period_start, dtstart):
+                for at in times:
+                    candidate = TIMEZONE.localize(datetime.combine(day, at))
+                    if candidate < dtstart or candidate <= after:
+                        continue
+                    if self.until is not None and to_epoch(candidate) > self.until:
+                        return None
+                    return candidate
+        return None
+
+
+def _int_list(value: str):
+    return tuple(int(part) for part in value.split(",") if part)
+
+
+def _byday(value: str):
+    days = []
+    for part in value.split(","):
+        part = part.strip().upper()
+        weekday = WEEKDAYS.get(part[-2:])
+        if weekday is None:
+            raise ValueError(f"不明な曜日: {part}")
+        ordinal = int(part[:-2]) if part[:-2] not in ("", "+") else 0
+        days.append((ordinal, weekday))
+    return tuple(days)
+
+
+def _until(value: str) -> int:
+    value = value.upper().rstrip("Z")
+    fmt = "%Y%m%dT%H%M%S" if "T" in value else "%Y%m%d"
+    parsed = datetime.strptime(value, fmt)
+    if fmt == "%Y%m%d":
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return to_epoch(TIMEZONE.localize(parsed))
+
+
+@lru_cache(maxsize=4096)
+def compile_rule(rule: str) -> Recurrence:
+    """繰り返しルール文字列を解析する。不正なルールの場合は ValueError を送出する"""
+    params = {}
+    for part in rule.split(";"):
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"不正なルール要素: {part}")
+        params[key.strip().upper()] = value.strip()
+
+    freq = params.get("FREQ", "").upper()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"未対応のFREQ: {freq}")
+    recurrence = Recurrence(
+        freq=freq,
+        interval=int(params.get("INTERVAL", "1")),
+        byday=_byday(params["BYDAY"]) if "BYDAY" in params else (),
+        bymonthday=_int_list(params.get("BYMONTHDAY", "")),
+        bymonth=_int_list(params.get("BYMONTH", "")),
+        byhour=_int_list(params.get("BYHOUR", "")),
+        byminute=_int_list(params.get("BYMINUTE", "")),
+        until=_until(params["UNTIL"]) if "UNTIL" in params else None,
+        count=int(params["COUNT"]) if "COUNT" in params else None,
+    )
+    if recurrence.interval < 1:
+        raise ValueError("INTERVAL は1以上である必要があります")
+    if any(not 0 <= hour <= 23 for hour in recurrence.byhour) or any(not 0 <= minute <= 59 for minute in recurrence.byminute):
+        raise ValueError("BYHOUR / BYMINUTE の値が範囲外です")
+    if any(not 1 <= month <= 12 for month in recurrence.bymonth):
+        raise ValueError("BYMONTH の値が範囲外です")
+    if any(day == 0 or not -31 <= day <= 31 for day in recurrence.bymonthday):
+        raise ValueError("BYMONTHDAY の値が範囲外です")
+    return recurrence
+
+
+def next_fire_at(rule: str, dtstart: int, after: int, fire_count: int = 0):
+    """発火済み回数を考慮して、after より後の次回発火時刻 (UNIX秒) を返す。終了していればNoneを返す"""
+    recurrence = compile_rule(rule)
+    if recurrence.count is not None and fire_count >= recurrence.count:
+        return None
+    following = recurrence.next_after(from_epoch(dtstart), from_epoch(after))
+    return to_epoch(following) if following else None
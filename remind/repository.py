@@ -0,0 +1,468 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from remind.leases import release_leases, sync_leases
+from remind.migrations import migrate
+from remind.storage import EDITABLE_COLUMNS, check_editable, timed
+
+DUE_BETWEEN_SQL = """
+    SELECT id, next_fire_at FROM reminders
+    WHERE next_fire_at > ? AND next_fire_at <= ? AND paused_at IS NULL
+    ORDER BY next_fire_at
+"""
+
+DUE_BETWEEN_FOR_SHARDS_SQL = """
+    SELECT id, next_fire_at FROM reminders
+    WHERE next_fire_at > ? AND next_fire_at <= ? AND paused_at IS NULL
+      AND (CAST(guild_id AS INTEGER) >> 22) % ? IN (SELECT value FROM json_each(?))
+    ORDER BY next_fire_at
+"""
+
+ACTIVE_PAGE_FOR_USER_SQL = """
+    SELECT id, target_type, target_id, message, next_fire_at, is_recurring, recurrence_rule, paused_at
+    FROM reminders
+    WHERE user_id = ? AND guild_id = ? AND (next_fire_at > ? OR is_recurring = 1)
+      AND (next_fire_at, id) > (?, ?)
+    ORDER BY next_fire_at, id
+    LIMIT ?
+"""
+
+CLAIM_DELIVERY_SQL = """
+    INSERT INTO deliveries (idempotency_key, reminder_id, fire_at, state, claimed_by, claim_token, claimed_at, attempts)
+    VALUES (?, ?, ?, 'claimed', ?, ?, ?, 1)
+    ON CONFLICT(idempotency_key) DO UPDATE SET
+        state = 'claimed', claimed_by = excluded.claimed_by, claim_token = excluded.claim_token,
+        claimed_at = excluded.claimed_at, attempts = deliveries.attempts + 1
+    WHERE deliveries.state = 'pending'
+       OR (deliveries.state = 'claimed' AND (
+           deliveries.claimed_at <= ?
+           OR (deliveries.claimed_by != excluded.claimed_by
+               AND deliveries.claimed_by NOT IN (SELECT owner FROM shard_leases WHERE owner IS NOT NULL AND expires_at > ?))))
+    RETURNING reminder_id
+"""
+
+INSERT_REMINDER_SQL = """
+    INSERT INTO reminders (user_id, guild_id, channel_id, target_type, target_id, message, trigger_time, next_fire_at, is_recurring, recurrence_rule, created_at, fire_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+GUILD_PAGE_SQL = """
+    SELECT * FROM reminders
+    WHERE guild_id = ? AND id > ? AND next_fire_at IS NOT NULL
+    ORDER BY id
+    LIMIT ?
+"""
+
+TARGETS_SQL = """
+    SELECT guild_id, target_type, target_id, COUNT(*) AS reminders
+    FROM reminders
+    GROUP BY guild_id, target_type, target_id
+"""
+
+PURGE_GUILD_SQL = "DELETE FROM reminders WHERE guild_id = ? RETURNING id"
+
+PURGE_TARGET_SQL = "DELETE FROM reminders WHERE guild_id = ? AND target_type = ? AND target_id = ? RETURNING id"
+
+INSERT_HISTORY_SQL = """
+    INSERT INTO delivery_history (reminder_id, guild_id, user_id, fire_at, recorded_at, lag_ms, outcome)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+PRUNE_HISTORY_SQL = """
+    DELETE FROM delivery_history
+    WHERE id IN (SELECT id FROM delivery_history WHERE recorded_at < ? ORDER BY recorded_at LIMIT ?)
+"""
+
+HISTORY_FOR_USER_SQL = """
+    SELECT fire_at, recorded_at, lag_ms, outcome FROM delivery_history
+    WHERE reminder_id = ? AND user_id = ? AND guild_id = ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+
+SNOOZE_SQL = """
+    UPDATE reminders SET next_fire_at = ?, trigger_time = ?
+    WHERE id = ? AND is_recurring = 0 AND (user_id = ? OR (target_type = 'user' AND target_id = ?))
+    RETURNING guild_id
+"""
+
+DISMISS_SQL = """
+    DELETE FROM reminders
+    WHERE id = ? AND is_recurring = 0 AND (user_id = ? OR (target_type = 'user' AND target_id = ?))
+"""
+
+PRUNE_DONE_SQL = """
+    DELETE FROM reminders
+    WHERE id IN (SELECT id FROM reminders WHERE next_fire_at IS NULL AND trigger_time < ? LIMIT ?)
+"""
+
+USER_USAGE_SQL = "SELECT active FROM reminder_counts WHERE guild_id = ? AND user_id = ?"
+
+GUILD_USAGE_SQL = "SELECT active FROM reminder_guild_counts WHERE guild_id = ?"
+
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def _chunks(values, size=IN_CLAUSE_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class ReminderRepository:
+    """remindersテーブルへのアクセスを1本の接続と専用スレッドに集約するリポジトリ"""
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000, statement_cache_size: int = 128,
+                 vacuum_on_open: bool = False):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache_size = statement_cache_size
+        self.vacuum_on_open = vacuum_on_open
+        self._executor = None
+        self._conn = None
+
+    async def open(self):
+        """専用スレッドを起動し、WALモードで接続を開く"""
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reminder-db")
+        try:
+            await self._run(self._connect)
+        except Exception:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            raise
+
+    async def close(self):
+        if self._executor is None:
+            return
+        await self._run(self._disconnect)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            raise RuntimeError("ReminderRepository is not open")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=self.statement_cache_size)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        migrate(conn)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if self.vacuum_on_open:
+                logging.info("データベースを incremental_vacuum に対応させるため VACUUM を実行します。")
+                conn.execute("VACUUM")
+            else:
+                logging.info("データベースが incremental_vacuum に対応していないため、空きページは切り詰められません。DB_VACUUM_ON_OPEN=true で起動すると一度だけ VACUUM で切り替えます。")
+        self._conn = conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _fetchone(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, sql, params=()):
+        with self._conn:
+            cursor = self._conn.execute(sql, params)
+        return cursor
+
+    @timed
+    async def get(self, reminder_id: int):
+        return await self._run(self._fetchone, "SELECT * FROM reminders WHERE id = ?", (reminder_id,))
+
+    def _get_many(self, reminder_ids):
+        rows = []
+        for chunk in _chunks(reminder_ids):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self._conn.execute(f"SELECT * FROM reminders WHERE id IN ({placeholders})", chunk))
+        return rows
+
+    @timed
+    async def get_many(self, reminder_ids):
+        """複数のリマインドをIN句でまとめて取得する"""
+        return await self._run(self._get_many, reminder_ids)
+
+    def _delete_many(self, reminder_ids):
+        deleted = 0
+        with self._conn:
+            for chunk in _chunks(reminder_ids):
+                placeholders = ",".join("?" * len(chunk))
+                deleted += self._conn.execute(f"DELETE FROM reminders WHERE id IN ({placeholders})", chunk).rowcount
+        return deleted
+
+    @timed
+    async def delete_many(self, reminder_ids) -> int:
+        """複数のリマインドを1トランザクションで削除する"""
+        return await self._run(self._delete_many, reminder_ids)
+
+    def _claim_deliveries(self, firings, owner, claim_token, now, stale_before):
+        claimed = []
+        with self._conn:
+            for reminder_id, fire_at, key in firings:
+                row = self._conn.execute(
+                    CLAIM_DELIVERY_SQL, (key, reminder_id, fire_at, owner, claim_token, now, stale_before, now)).fetchone()
+                if row is not None:
+                    claimed.append(row[0])
+        return claimed
+
+    @timed
+    async def claim_deliveries(self, firings, owner: str, claim_token: str, now: float, stale_before: float):
+        """発火をまとめてクレームし、クレームできたIDを返す"""
+        return await self._run(self._claim_deliveries, list(firings), owner, claim_token, now, stale_before)
+
+    def _release_deliveries(self, keys, claim_token):
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE deliveries SET state = 'pending', claim_token = NULL WHERE idempotency_key = ? AND claim_token = ?",
+                [(key, claim_token) for key in keys],
+            )
+
+    @timed
+    async def release_deliveries(self, keys, claim_token: str):
+        """送信できなかった発火のクレームを解除し、次回以降に再試行できるようにする"""
+        await self._run(self._release_deliveries, list(keys), claim_token)
+
+    def _complete(self, claim_token, finished, now, prune_before, history, retain):
+        deleted, advanced = [], []
+        history = {entry[0]: entry for entry in history or ()}
+        with self._conn:
+            for reminder_id, key, next_fire in finished:
+                marked = self._conn.execute(
+                    "UPDATE deliveries SET state = 'sent', sent_at = ? WHERE idempotency_key = ? AND claim_token = ? RETURNING fire_at",
+                    (now, key, claim_token),
+                ).fetchone()
+                if marked is None:
+                    continue
+                if reminder_id in history:
+                    reminder_id, guild_id, user_id, fire_at, lag_ms, outcome = history[reminder_id]
+                    self._conn.execute(INSERT_HISTORY_SQL, (reminder_id, guild_id, user_id, fire_at, int(now), lag_ms, outcome))
+                claimed_fire_at = marked[0]
+                if next_fire is None:
+                    if reminder_id in retain:
+                        sql = "UPDATE reminders SET next_fire_at = NULL WHERE id = ? AND next_fire_at = ?"
+                    else:
+                        sql = "DELETE FROM reminders WHERE id = ? AND next_fire_at = ?"
+                    if self._conn.execute(sql, (reminder_id, claimed_fire_at)).rowcount:
+                        deleted.append(reminder_id)
+                elif self._conn.execute(
+                        "UPDATE reminders SET next_fire_at = ?, fire_count = fire_count + 1 WHERE id = ? AND next_fire_at = ?",
+                        (next_fire, reminder_id, claimed_fire_at)).rowcount:
+                    advanced.append((reminder_id, next_fire))
+            if prune_before is not None:
+                self._conn.execute("DELETE FROM deliveries WHERE state = 'sent' AND sent_at < ?", (prune_before,))
+        return deleted, advanced
+
+    @timed
+    async def complete(self, claim_token: str, finished, now: float, prune_before: float = None, history=None, retain=()):
+        """クレーム済みの発火を送信済みにし、履歴の追記と削除・次回時刻の書き戻しを行う"""
+        return await self._run(self._complete, claim_token, list(finished), now, prune_before, history, set(retain))
+
+    def _snooze(self, params):
+        with self._conn:
+            row = self._conn.execute(SNOOZE_SQL, params).fetchone()
+        return row[0] if row else None
+
+    @timed
+    async def snooze(self, reminder_id: int, user_id: str, fire_at: int):
+        """単発リマインドを fire_at に再設定し、サーバーIDを返す"""
+        return await self._run(self._snooze, (fire_at, fire_at, reminder_id, user_id, user_id))
+
+    @timed
+    async def dismiss(self, reminder_id: int, user_id: str) -> bool:
+        """作成者または宛先のユーザーの単発リマインドを削除し、削除できたかを返す"""
+        cursor = await self._run(self._write, DISMISS_SQL, (reminder_id, user_id, user_id))
+        return cursor.rowcount > 0
+
+    @timed
+    async def prune_done(self, before: int, batch_size: int = 500) -> int:
+        """配信済みで残している単発のうち、最後の予定時刻が before より前のものを最大 batch_size 件削除する"""
+        cursor = await self._run(self._write, PRUNE_DONE_SQL, (before, batch_size))
+        return cursor.rowcount
+
+    @timed
+    async def prune_history(self, before: int, batch_size: int = 500) -> int:
+        """recorded_at が before より古い配信履歴を古い順に最大 batch_size 件削除し、削除件数を返す"""
+        cursor = await self._run(self._write, PRUNE_HISTORY_SQL, (before, batch_size))
+        return cursor.rowcount
+
+    def _incremental_vacuum(self, pages):
+        before = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if before and pages > 0:
+            self._conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after, after
+
+    @timed
+    async def incremental_vacuum(self, pages: int):
+        """空きページを最大 pages ページだけファイルから切り詰め、(切り詰めたページ数, 残りの空きページ数) を返す"""
+        return await self._run(self._incremental_vacuum, pages)
+
+    @timed
+    async def history_for_user(self, reminder_id: int, user_id: str, guild_id: str, limit: int = 10):
+        """所有者のリマインドの配信履歴を新しい順に取得する"""
+        return await self._run(self._fetchall, HISTORY_FOR_USER_SQL, (reminder_id, user_id, guild_id, limit))
+
+    @timed
+    async def list_due_between(self, after: int, until: int, shards=None):
+        """next_fire_at が (after, until] に入るリマインドを取得する"""
+        if shards is None:
+            return await self._run(self._fetchall, DUE_BETWEEN_SQL, (after, until))
+        shard_count, shard_ids = shards
+        return await self._run(self._fetchall, DUE_BETWEEN_FOR_SHARDS_SQL,
+                               (after, until, shard_count, json.dumps(sorted(shard_ids))))
+
+    @timed
+    async def sync_leases(self, owner: str, preferred, shard_count: int, now: float, ttl: float):
+        return await self._run(lambda: sync_leases(self._conn, owner, preferred, shard_count, now, ttl))
+
+    @timed
+    async def release_leases(self, owner: str, now: float):
+        await self._run(lambda: release_leases(self._conn, owner, now))
+
+    @timed
+    async def list_active_page_for_user(self, user_id: str, guild_id: str, now: int, after=None, limit: int = 10):
+        """(next_fire_at, id) のキーセットで、after より後の有効なリマインドを最大 limit 件取得する"""
+        after_time, after_id = after if after else (-1, -1)
+        return await self._run(self._fetchall, ACTIVE_PAGE_FOR_USER_SQL,
+                               (user_id, guild_id, now, after_time, after_id, limit))
+
+    @timed
+    async def add(self, user_id: str, guild_id: str, channel_id: str, target_type: str, target_id: str,
+                  message: str, trigger_time: int, is_recurring: bool, recurrence_rule, created_at, check=None) -> int:
+        """リマインドを追加し、IDを返す。check が例外を送出したら追加しない"""
+        values = (user_id, guild_id, channel_id, target_type, target_id, message,
+                  trigger_time, trigger_time, is_recurring, recurrence_rule, created_at, 0)
+        if check is None:
+            cursor = await self._run(self._write, INSERT_REMINDER_SQL, values)
+            return cursor.lastrowid
+        return await self._run(self._add_checked, values, check)
+
+    def _add_checked(self, values, check):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            check(*self._usage(values[0], values[1]))
+            cursor = self._conn.execute(INSERT_REMINDER_SQL, values)
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        return cursor.lastrowid
+
+    def _usage(self, user_id, guild_id):
+        user_active = self._conn.execute(USER_USAGE_SQL, (guild_id, user_id)).fetchone()
+        guild_active = self._conn.execute(GUILD_USAGE_SQL, (guild_id,)).fetchone()
+        return (user_active[0] if user_active else 0), (guild_active[0] if guild_active else 0)
+
+    @timed
+    async def usage(self, user_id: str, guild_id: str):
+        """reminder_counts から (ユーザーの有効件数, サーバーの有効件数) を取得する"""
+        return await self._run(self._usage, user_id, guild_id)
+
+    def _add_many(self, rows):
+        with self._conn:
+            self._conn.executemany(INSERT_REMINDER_SQL, rows)
+            last_id = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reminders'").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    @timed
+    async def add_many(self, rows):
+        """行をまとめて追加し、採番されたIDを返す"""
+        rows = list(rows)
+        if not rows:
+            return []
+        return await self._run(self._add_many, rows)
+
+    @timed
+    async def list_page_for_guild(self, guild_id: str, after_id: int = 0, limit: int = 500):
+        """サーバーのリマインドを id のキーセットで最大 limit 件取得する"""
+        return await self._run(self._fetchall, GUILD_PAGE_SQL, (guild_id, after_id, limit))
+
+    @timed
+    async def list_targets(self):
+        """宛先ごとのリマインド件数を取得する"""
+        return await self._run(self._fetchall, TARGETS_SQL)
+
+    def _purge(self, sql, params):
+        deleted = []
+        with self._conn:
+            for values in params:
+                deleted.extend(row[0] for row in self._conn.execute(sql, values).fetchall())
+        return deleted
+
+    @timed
+    async def purge_guilds(self, guild_ids):
+        """サーバーのリマインドを1トランザクションで削除し、削除したIDを返す"""
+        return await self._run(self._purge, PURGE_GUILD_SQL, [(str(guild_id),) for guild_id in guild_ids])
+
+    @timed
+    async def purge_targets(self, targets):
+        """指定した宛先のリマインドを削除し、削除したIDを返す"""
+        return await self._run(self._purge, PURGE_TARGET_SQL,
+                               [(str(guild_id), target_type, str(target_id)) for guild_id, target_type, target_id in targets])
+
+    def _delete_matching(self, sql, params):
+        with self._conn:
+            return [row[0] for row in self._conn.execute(sql, params).fetchall()]
+
+    @timed
+    async def delete_matching(self, user_id: str, guild_id: str, target=None, contains: str = None, recurring: bool = None):
+        """所有者のリマインドのうち条件に一致するものを削除し、削除したIDを返す"""
+        clauses, params = ["user_id = ?", "guild_id = ?", "next_fire_at IS NOT NULL"], [user_id, guild_id]
+        if target is not None:
+            clauses.append("target_type = ? AND target_id = ?")
+            params += [target[0], str(target[1])]
+        if contains:
+            clauses.append("instr(message, ?) > 0")
+            params.append(contains)
+        if recurring is not None:
+            clauses.append("is_recurring = ?")
+            params.append(int(recurring))
+        sql = f"DELETE FROM reminders WHERE {' AND '.join(clauses)} RETURNING id"
+        return await self._run(self._delete_matching, sql, params)
+
+    def _update_owned(self, sql, params):
+        with self._conn:
+            return self._conn.execute(sql, params).fetchone()
+
+    @timed
+    async def update_owned(self, reminder_id: int, user_id: str, guild_id: str, **changes):
+        """所有者のリマインドを書き換え、更新後の行を返す"""
+        check_editable(changes)
+        columns = [column for column in EDITABLE_COLUMNS if column in changes]
+        sql = (f"UPDATE reminders SET {', '.join(f'{column} = ?' for column in columns)} "
+               "WHERE id = ? AND user_id = ? AND guild_id = ? AND next_fire_at IS NOT NULL RETURNING *")
+        return await self._run(self._update_owned, sql, [changes[column] for column in columns] + [reminder_id, user_id, guild_id])
+
+    @timed
+    async def delete(self, reminder_id: int) -> bool:
+        cursor = await self._run(self._write, "DELETE FROM reminders WHERE id = ?", (reminder_id,))
+        return cursor.rowcount > 0
+
+    @timed
+    async def delete_owned(self, reminder_id: int, user_id: str, guild_id: str) -> bool:
+        """所有者が一致する場合のみ削除し、削除できたかを返す"""
+        cursor = await self._run(
+            self._write,
+            "DELETE FROM reminders WHERE id = ? AND user_id = ? AND guild_id = ?",
+            (reminder_id, user_id, guild_id),
+        )
+        return cursor.rowcount > 0
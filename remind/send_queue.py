@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from remind.metrics import REGISTRY
+
+DISCORD_REST_SECONDS = REGISTRY.histogram("remind_discord_rest_seconds", "Discord REST 呼び出しの所要時間", ("endpoint",))
+SEND_ATTEMPTS = REGISTRY.counter("remind_send_attempts_total", "送信キューからの送信試行の回数 (結果別)", ("result",))
+SEND_LATENCY_SECONDS = REGISTRY.histogram("remind_send_latency_seconds", "送信キューへの投入から送信完了までの時間")
+
+
+class RateLimitBucket:
+    """一定秒数ごとにリセットされる送信枠"""
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.remaining = rate
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+
+    def delay(self, now: float) -> float:
+        wait = max(0.0, self.blocked_until - now)
+        if now < self.reset_at and self.remaining <= 0:
+            wait = max(wait, self.reset_at - now)
+        return wait
+
+    def take(self, now: float):
+        if now >= self.reset_at:
+            self.remaining = self.rate
+            self.reset_at = now + self.per
+        self.remaining -= 1
+
+    def refund(self):
+        self.remaining = min(self.rate, self.remaining + 1)
+
+    def penalize(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+        self.remaining = 0
+        self.reset_at = self.blocked_until
+
+
+def retry_after_of(error):
+    """429による失敗なら待機秒数を返す"""
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        return float(retry_after)
+    if getattr(error, 'status', None) == 429:
+        return 1.0
+    return None
+
+
+def is_global_limit(error) -> bool:
+    """429が全体のレート制限によるものかを返す"""
+    if getattr(error, 'is_global', False):
+        return True
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    return headers.get('X-RateLimit-Global', '').lower() == 'true' or headers.get('X-RateLimit-Scope') == 'global'
+
+
+class _Item:
+    __slots__ = ("send", "future", "enqueued_at", "attempts")
+
+    def __init__(self, send, future, enqueued_at):
+        self.send = send
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.attempts = 0
+
+
+class SendQueue:
+    """宛先ごとと全体のレート制限バケットに従って送信を平準化するキュー"""
+
+    def __init__(self, route_rate: int = 5, route_per: float = 5.0, global_rate: int = 50, global_per: float = 1.0,
+                 max_attempts: int = 3, latency_samples: int = 1000, clock=time.monotonic, sleep=asyncio.sleep):
+        self.route_rate = route_rate
+        self.route_per = route_per
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = RateLimitBucket(global_rate, global_per)
+        self._buckets = {}
+        self._routes = {}
+        self._order = deque()
+        self._depth = 0
+        self._in_flight = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.latencies = deque(maxlen=latency_samples)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="send-queue")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._in_flight):
+            task.cancel()
+
+    async def send(self, route, send):
+        """送信処理 (引数なしのコルーチン関数) をキューに積み、送信結果を待つ"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(route, _Item(send, future, self.clock()))
+        return await future
+
+    def _enqueue(self, route, item, front=False):
+        items = self._routes.get(route)
+        if items is None:
+            items = self._routes[route] = deque()
+            self._order.append(route)
+        if front:
+            items.appendleft(item)
+        else:
+            items.append(item)
+        self._depth += 1
+        self._wakeup.set()
+
+    def _bucket(self, route):
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = RateLimitBucket(self.route_rate, self.route_per)
+        return bucket
+
+    def _next_ready(self, now):
+        """全体バケットが空いていれば、送信可能な宛先をラウンドロビンで1つ選ぶ"""
+        global_delay = self.global_bucket.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+        shortest = None
+        for _ in range(len(self._order)):
+            route = self._order[0]
+            self._order.rotate(-1)
+            delay = self._bucket(route).delay(now)
+            if delay <= 0:
+                return route, 0.0
+            shortest = delay if shortest is None else min(shortest, delay)
+        return None, shortest
+
+    async def _run(self):
+        while True:
+            if not self._depth:
+                self._prune_buckets(self.clock())
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now = self.clock()
+            route, delay = self._next_ready(now)
+            if route is None:
+                self._wakeup.clear()
+                await self._wait(delay)
+                continue
+            items = self._routes[route]
+            item = items.popleft()
+            if not items:
+                del self._routes[route]
+                self._order.remove(route)
+            self._depth -= 1
+            self.global_bucket.take(now)
+            self._bucket(route).take(now)
+            task = asyncio.create_task(self._attempt(route, item))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def _prune_buckets(self, now):
+        expired = [route for route, bucket in self._buckets.items()
+                   if route not in self._routes and bucket.reset_at <= now and bucket.blocked_until <= now]
+        for route in expired:
+            del self._buckets[route]
+
+    async def _wait(self, delay):
+        sleeper = asyncio.ensure_future(self.sleep(delay))
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({sleeper, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sleeper.cancel()
+            waiter.cancel()
+
+    async def _attempt(self, route, item):
+        if item.future.done():
+            return
+        item.attempts += 1
+        try:
+            with DISCORD_REST_SECONDS.time("send_message"):
+                result = await item.send()
+        except Exception as e:
+            retry_after = retry_after_of(e)
+            if retry_after is not None and item.attempts < self.max_attempts:
+                self.retried += 1
+                SEND_ATTEMPTS.inc("rate_limited")
+                until = self.clock() + retry_after
+                self._bucket(route).penalize(until)
+                if is_global_limit(e):
+                    self.global_bucket.penalize(until)
+                    logging.warning(f"全体のレート制限を受けました: {retry_after:.2f}秒間すべての宛先への送信を止めます。")
+                else:
+                    logging.warning(f"送信がレート制限されました: 宛先 {route}, {retry_after:.2f}秒後に再送します。")
+                self._enqueue(route, item, front=True)
+                return
+            self.failed += 1
+            SEND_ATTEMPTS.inc("failed")
+            self._record(item)
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        self.sent += 1
+        SEND_ATTEMPTS.inc("sent")
+        self._record(item)
+        if not item.future.done():
+            item.future.set_result(result)
+
+    def _record(self, item):
+        latency = self.clock() - item.enqueued_at
+        self.latencies.append(latency)
+        SEND_LATENCY_SECONDS.observe(latency)
+
+    def stats(self) -> dict:
+        """キュー長と直近の送信遅延 (キュー投入から送信完了まで) の統計を返す"""
+        samples = sorted(self.latencies)
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "depth": self._depth,
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": samples[-1] if samples else 0.0,
+        }
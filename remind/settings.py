@@ -0,0 +1,97 @@
+import os
+from dataclasses import dataclass, fields, replace
+
+
+def _parse(kind, value: str):
+    if kind is bool:
+        return value.lower() in ('1', 'true', 'yes')
+    if kind is tuple:
+        return tuple(int(item) for item in value.split(',') if item.strip())
+    return kind(value)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """ボットの設定。各フィールドは同名 (大文字) の環境変数で上書きできる"""
+
+    discord_bot_token: str = None
+    discord_test_guild_id: str = None
+    command_sync_state_path: str = 'data/command_sync.json'
+    command_sync_force: bool = False
+    storage_backend: str = 'sqlite'
+    db_path: str = 'data/reminders.db'
+    db_busy_timeout_ms: int = 5000
+    db_vacuum_on_open: bool = False
+    shard_count: int = 0
+    shard_ids: tuple = ()
+    lease_ttl_seconds: float = 15
+    lease_renew_interval: float = 5
+    scheduler_window_seconds: int = 600
+    scheduler_refill_interval: int = 60
+    scheduler_sweep_seconds: int = 300
+    dispatch_concurrency: int = 10
+    dispatch_max_batch: int = 500
+    prefetch_seconds: int = 30
+    prefetch_concurrency: int = 10
+    delivery_claim_timeout: float = 300
+    delivery_retention_seconds: float = 86400
+    delivery_retry_seconds: float = 30
+    delivery_retry_max_seconds: float = 300
+    delivery_max_attempts: int = 5
+    late_notice_seconds: int = 60
+    snooze_enabled: bool = True
+    snooze_short_seconds: int = 600
+    snooze_long_seconds: int = 3600
+    snooze_retention_seconds: int = 86400
+    digest_enabled: bool = False
+    digest_window_seconds: int = 60
+    digest_max_items: int = 20
+    digest_line_length: int = 180
+    metrics_host: str = '127.0.0.1'
+    metrics_port: int = 0
+    quota_max_per_user: int = 200
+    quota_max_per_guild: int = 10000
+    quota_min_interval_seconds: int = 300
+    quota_interval_samples: int = 24
+    quota_creation_rate: int = 10
+    quota_creation_per: float = 60
+    quota_bucket_prune_threshold: int = 1024
+    history_retention_seconds: int = 30 * 86400
+    history_prune_interval: int = 3600
+    history_prune_batch: int = 500
+    history_prune_pause: float = 0.05
+    history_list_limit: int = 10
+    vacuum_pages: int = 256
+    reconcile_interval_seconds: int = 3600
+    bulk_batch_size: int = 500
+    bulk_max_bytes: int = 10 * 1024 * 1024
+    bulk_spool_bytes: int = 1024 * 1024
+    bulk_chunk_bytes: int = 65536
+    bulk_error_lines: int = 10
+    send_route_rate: int = 5
+    send_route_per: float = 5
+    send_global_rate: int = 50
+    send_global_per: float = 1
+    send_max_attempts: int = 3
+    target_cache_size: int = 1024
+    target_cache_ttl: float = 600
+    list_page_size: int = 10
+    list_message_preview: int = 100
+    list_fetch_concurrency: int = 5
+    list_view_timeout: float = 300
+    delete_id_preview: int = 20
+
+    @classmethod
+    def from_env(cls, environ=None, **overrides) -> "Settings":
+        """環境変数から設定を読み込む。未設定の項目は既定値のままにする"""
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            value = environ.get(field.name.upper())
+            if value is None or (value == '' and field.type is not str):
+                continue
+            try:
+                values[field.name] = _parse(field.type, value)
+            except ValueError as e:
+                raise ValueError(f"環境変数 {field.name.upper()} の値が無効です: {value!r}") from e
+        return replace(cls(**values), **overrides)
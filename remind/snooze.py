@@ -0,0 +1,98 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+import discord
+
+from remind.metrics import REGISTRY
+from remind.timeutil import from_epoch
+
+SNOOZE_ACTIONS = REGISTRY.counter("remind_snooze_actions_total", "配信したリマインドのボタン操作の回数 (操作・結果別)", ("action", "result"))
+
+DAY_SECONDS = 86400
+ACTIONS = ("short", "long", "tomorrow", "done")
+CUSTOM_ID_TEMPLATE = r"remind:(?P<action>short|long|tomorrow|done):(?P<reminder_id>[0-9]+)"
+
+
+def custom_id(action: str, reminder_id: int) -> str:
+    return f"remind:{action}:{reminder_id}"
+
+
+def format_delay(seconds: int) -> str:
+    """ボタンのラベル用に秒数を「+10分」のような短い表記にする"""
+    for unit, name in ((DAY_SECONDS, "日"), (3600, "時間"), (60, "分")):
+        if seconds >= unit and seconds % unit == 0:
+            return f"+{seconds // unit}{name}"
+    return f"+{seconds}秒"
+
+
+def snooze_delay(settings, action: str) -> int:
+    return {"short": settings.snooze_short_seconds, "long": settings.snooze_long_seconds, "tomorrow": DAY_SECONDS}[action]
+
+
+def action_labels(settings) -> dict:
+    return {"short": format_delay(settings.snooze_short_seconds), "long": format_delay(settings.snooze_long_seconds),
+            "tomorrow": "明日", "done": "完了"}
+
+
+class ReminderActionButton(discord.ui.DynamicItem[discord.ui.Button], template=CUSTOM_ID_TEMPLATE):
+    """配信したリマインドに付ける操作ボタン"""
+
+    def __init__(self, action: str, reminder_id: int, label: str = None):
+        style = discord.ButtonStyle.success if action == "done" else discord.ButtonStyle.secondary
+        super().__init__(discord.ui.Button(label=label or action, style=style, custom_id=custom_id(action, reminder_id)))
+        self.action = action
+        self.reminder_id = reminder_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match, /):
+        return cls(match["action"], int(match["reminder_id"]), item.label)
+
+    async def callback(self, interaction: discord.Interaction):
+        await handle_action(interaction.client, interaction, self.action, self.reminder_id)
+
+
+def action_view(settings, reminder_id: int) -> discord.ui.View:
+    """スヌーズ・完了ボタンのビューを作る。停止済みにしておき、送信時にメッセージごとのビューとして保持させない"""
+    view = discord.ui.View(timeout=None)
+    for action, label in action_labels(settings).items():
+        view.add_item(ReminderActionButton(action, reminder_id, label))
+    view.stop()
+    return view
+
+
+async def handle_action(bot, interaction: discord.Interaction, action: str, reminder_id: int):
+    """ボタンの操作を1回の更新 (スヌーズ) または削除 (完了) で反映し、元のメッセージからボタンを外す"""
+    user_id = str(interaction.user.id)
+    fire_at = None
+    try:
+        if action == "done":
+            applied = await bot.repository.dismiss(reminder_id, user_id)
+        else:
+            fire_at = int(datetime.now().timestamp()) + snooze_delay(bot.settings, action)
+            guild_id = await bot.repository.snooze(reminder_id, user_id, fire_at)
+            applied = guild_id is not None
+    except sqlite3.Error as e:
+        logging.error(f"リマインドのボタン操作中にDBエラー (ID: {reminder_id}, 操作: {action}): {e}")
+        SNOOZE_ACTIONS.inc(action, "error")
+        await interaction.response.send_message("操作中にエラーが発生しました。", ephemeral=True)
+        return
+
+    if not applied:
+        SNOOZE_ACTIONS.inc(action, "rejected")
+        await interaction.response.send_message(
+            f"ID `{reminder_id}` のリマインドは見つからないか、操作できるのは作成者と宛先のユーザーだけです。", ephemeral=True)
+        return
+
+    SNOOZE_ACTIONS.inc(action, "ok")
+    if fire_at is None:
+        bot.engine.cancel(reminder_id)
+        note = "(完了)"
+        logging.info(f"ユーザー {user_id} がリマインドID {reminder_id} を完了にしました。")
+    else:
+        if bot.delivery.owns({'guild_id': guild_id}):
+            bot.engine.schedule(reminder_id, fire_at)
+        note = f"({from_epoch(fire_at).strftime('%m/%d %H:%M')} に再通知します)"
+        logging.info(f"ユーザー {user_id} がリマインドID {reminder_id} を {from_epoch(fire_at)} に再設定しました。")
+    content = interaction.message.content if interaction.message else ""
+    await interaction.response.edit_message(content=f"{content}\n{note}".strip(), view=None)
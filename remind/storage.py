@@ -0,0 +1,109 @@
+import functools
+import time
+from typing import Protocol
+
+from remind.metrics import REGISTRY
+
+DB_CALL_SECONDS = REGISTRY.histogram("remind_db_call_seconds", "リポジトリ呼び出しの所要時間 (DBスレッドの待ち時間を含む)", ("operation",))
+DB_CALL_ERRORS = REGISTRY.counter("remind_db_call_errors_total", "例外で終わったリポジトリ呼び出しの回数", ("operation",))
+
+BACKENDS = ("sqlite", "memory")
+EDITABLE_COLUMNS = ("message", "trigger_time", "next_fire_at", "is_recurring", "recurrence_rule", "fire_count", "paused_at")
+
+
+def timed(method):
+    operation = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        except Exception:
+            DB_CALL_ERRORS.inc(operation)
+            raise
+        finally:
+            DB_CALL_SECONDS.observe(time.perf_counter() - started, operation)
+    return wrapper
+
+
+def check_editable(changes: dict):
+    unknown = set(changes) - set(EDITABLE_COLUMNS)
+    if unknown or not changes:
+        raise ValueError(f"editable columns are {', '.join(EDITABLE_COLUMNS)}: {sorted(unknown)}")
+
+
+class ReminderStore(Protocol):
+    """リマインドの保存先が実装するインターフェース。行は列名で参照できるマッピングで返す"""
+
+    async def open(self): ...
+
+    async def close(self): ...
+
+    async def add(self, user_id: str, guild_id: str, channel_id: str, target_type: str, target_id: str,
+                  message: str, trigger_time: int, is_recurring: bool, recurrence_rule, created_at, check=None) -> int: ...
+
+    async def add_many(self, rows) -> list: ...
+
+    async def get(self, reminder_id: int): ...
+
+    async def get_many(self, reminder_ids) -> list: ...
+
+    async def list_due_between(self, after: int, until: int, shards=None) -> list: ...
+
+    async def list_active_page_for_user(self, user_id: str, guild_id: str, now: int, after=None, limit: int = 10) -> list: ...
+
+    async def list_page_for_guild(self, guild_id: str, after_id: int = 0, limit: int = 500) -> list: ...
+
+    async def list_targets(self) -> list: ...
+
+    async def usage(self, user_id: str, guild_id: str) -> tuple: ...
+
+    async def claim_deliveries(self, firings, owner: str, claim_token: str, now: float, stale_before: float) -> list: ...
+
+    async def release_deliveries(self, keys, claim_token: str): ...
+
+    async def complete(self, claim_token: str, finished, now: float, prune_before: float = None, history=None,
+                       retain=()) -> tuple: ...
+
+    async def snooze(self, reminder_id: int, user_id: str, fire_at: int): ...
+
+    async def dismiss(self, reminder_id: int, user_id: str) -> bool: ...
+
+    async def prune_done(self, before: int, batch_size: int = 500) -> int: ...
+
+    async def delete_matching(self, user_id: str, guild_id: str, target=None, contains: str = None,
+                              recurring: bool = None) -> list: ...
+
+    async def update_owned(self, reminder_id: int, user_id: str, guild_id: str, **changes): ...
+
+    async def delete(self, reminder_id: int) -> bool: ...
+
+    async def delete_owned(self, reminder_id: int, user_id: str, guild_id: str) -> bool: ...
+
+    async def delete_many(self, reminder_ids) -> int: ...
+
+    async def purge_guilds(self, guild_ids) -> list: ...
+
+    async def purge_targets(self, targets) -> list: ...
+
+    async def history_for_user(self, reminder_id: int, user_id: str, guild_id: str, limit: int = 10) -> list: ...
+
+    async def prune_history(self, before: int, batch_size: int = 500) -> int: ...
+
+    async def incremental_vacuum(self, pages: int) -> tuple: ...
+
+    async def sync_leases(self, owner: str, preferred, shard_count: int, now: float, ttl: float) -> tuple: ...
+
+    async def release_leases(self, owner: str, now: float): ...
+
+
+def create_store(backend: str, db_path: str = None, busy_timeout_ms: int = 5000, vacuum_on_open: bool = False) -> ReminderStore:
+    """保存先の種類 (sqlite / memory) からリポジトリを作る"""
+    if backend == "sqlite":
+        from remind.repository import ReminderRepository
+        return ReminderRepository(db_path, busy_timeout_ms=busy_timeout_ms, vacuum_on_open=vacuum_on_open)
+    if backend == "memory":
+        from remind.memory_store import MemoryReminderStore
+        return MemoryReminderStore()
+    raise ValueError(f"unknown storage backend: {backend} (expected one of {', '.join(BACKENDS)})")
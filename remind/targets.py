@@ -0,0 +1,129 @@
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import discord
+
+from remind.metrics import REGISTRY
+
+DISCORD_REST_SECONDS = REGISTRY.histogram("remind_discord_rest_seconds", "Discord REST 呼び出しの所要時間", ("endpoint",))
+TARGET_LOOKUPS = REGISTRY.counter("remind_target_lookups_total", "宛先解決の回数 (キャッシュのヒット/ミス別)", ("result",))
+
+
+class TTLCache:
+    """有効期限付きのLRUキャッシュ"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, self.clock() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+
+class TargetResolver:
+    """送信先のユーザーとDMチャンネルを解決する"""
+
+    def __init__(self, bot, maxsize: int = 1024, ttl: float = 600.0, clock=time.monotonic):
+        self.bot = bot
+        self.users = TTLCache(maxsize, ttl, clock)
+        self.dm_channels = TTLCache(maxsize, ttl, clock)
+        self.hits = 0
+        self.misses = 0
+        self.rest_calls = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "rest_calls": self.rest_calls,
+                "cached_users": len(self.users), "cached_dm_channels": len(self.dm_channels)}
+
+    @contextmanager
+    def _rest(self, endpoint: str):
+        self.rest_calls += 1
+        with DISCORD_REST_SECONDS.time(endpoint):
+            yield
+
+    def _hit(self):
+        self.hits += 1
+        TARGET_LOOKUPS.inc("hit")
+
+    def _miss(self):
+        self.misses += 1
+        TARGET_LOOKUPS.inc("miss")
+
+    def invalidate_user(self, user_id: int):
+        self.users.pop(user_id)
+        self.dm_channels.pop(user_id)
+
+    async def resolve_user(self, guild, user_id: int):
+        """ユーザーを解決する。なければNoneを返す"""
+        user = guild.get_member(user_id) if guild else None
+        if user is None:
+            user = self.bot.get_user(user_id)
+        if user is None:
+            user = self.users.get(user_id)
+        if user is not None:
+            self._hit()
+            return user
+        self._miss()
+        if guild is not None:
+            try:
+                with self._rest("fetch_member"):
+                    user = await guild.fetch_member(user_id)
+            except discord.NotFound:
+                logging.warning(f"ユーザー {user_id} がサーバー {guild.id} に見つかりません。")
+        if user is None:
+            try:
+                with self._rest("fetch_user"):
+                    user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                return None
+        self.users.set(user_id, user)
+        return user
+
+    async def dm_channel(self, user):
+        """ユーザーとのDMチャンネルを取得する"""
+        channel = user.dm_channel or self.dm_channels.get(user.id)
+        if channel is not None:
+            self._hit()
+            return channel
+        self._miss()
+        with self._rest("create_dm"):
+            channel = await user.create_dm()
+        self.dm_channels.set(user.id, channel)
+        return channel
+
+    async def resolve_channel(self, guild, channel_id: int, guild_id: int = None):
+        """送信先のチャンネルを解決する"""
+        channel = guild.get_channel(channel_id) if guild else None
+        if channel is None:
+            channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            self._hit()
+            return channel
+        self._miss()
+        if guild is None and guild_id is not None:
+            return self.bot.get_partial_messageable(channel_id, guild_id=guild_id)
+        return None
@@ -0,0 +1,376 @@
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+from remind.timeutil import TIMEZONE, localize
+
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+WEEKDAY_NAMES = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tues": 1, "tue": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thurs": 3, "thur": 3, "thu": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+KEYWORDS = ("in", "at", "on", "and", "next", "every", "tomorrow", "today", "day")
+JA_WEEKDAYS = "月火水木金土日"
+JA_UNIT_SECONDS = {"秒": 1, "分": 60, "時": 3600, "日": 86400, "週": 604800}
+JA_WORDS = {
+    "明後日": "overmorrow", "明日": "tomorrow", "今日": "today", "毎日": "daily", "毎週": "every",
+    "再来週": "week_after_next", "来週": "next_week", "今週": "this_week", "後": "later",
+}
+DAY_OFFSETS = {"today": 0, "tomorrow": 1, "overmorrow": 2}
+WEEK_OFFSETS = {"this_week": 0, "next_week": 1, "week_after_next": 2}
+SEPARATORS = " ,、のに"
+CLOCK_KINDS = ("clock", "meridiem", "period")
+KIND_ALIASES = {"ja_duration": "duration", "ja_clock": "clock", "ja_weekday": "weekday", "ja_word": "word"}
+
+TOKEN_RE = re.compile(
+    r"[\s,、のに]*(?:"
+    r"(?P<date>(?P<year>\d{4})[/-](?P<month>\d{1,2})[/-](?P<day>\d{1,2}))"
+    r"|(?P<meridiem>(?P<m_hour>\d{1,2})(?::(?P<m_minute>\d{1,2}))?\s*(?P<ampm>am|pm)(?![a-z]))"
+    r"|(?P<clock>(?P<hour>\d{1,2}):(?P<minute>\d{1,2}))"
+    r"|(?P<duration>(?P<amount>\d+)\s*(?P<unit>seconds?|secs?|s|minutes?|mins?|m|hours?|hrs?|h|days?|d|weeks?|w)(?![a-z]))"
+    r"|(?P<weekday>" + "|".join(sorted(WEEKDAY_NAMES, key=len, reverse=True)) + r")(?![a-z])"
+    r"|(?P<word>" + "|".join(KEYWORDS) + r")(?![a-z])"
+    r"|(?P<ja_duration>(?P<ja_amount>\d+)\s*(?P<ja_unit>時間半?|分間?|秒間?|日間?|週間?))"
+    r"|(?P<ja_clock>(?P<ja_hour>\d{1,2})時(?:(?P<ja_minute>\d{1,2})分|(?P<ja_half>半))?)"
+    r"|(?P<period>午前|午後)"
+    r"|(?P<ja_weekday>[" + JA_WEEKDAYS + r"])曜日?"
+    r"|(?P<ja_word>" + "|".join(JA_WORDS) + r")"
+    r")"
+)
+COMMON_FORM_RE = re.compile(
+    r"(?:(?P<day>today|tomorrow) at "
+    r"|every (?:day|(?P<weekday>" + "|".join(sorted(WEEKDAY_NAMES, key=len, reverse=True)) + r")) at "
+    r"|(?P<year>\d{4})[/-](?P<month>\d{1,2})[/-](?P<date>\d{1,2}) )?"
+    r"(?P<hour>\d{1,2}):(?P<minute>\d{1,2})"
+    r"|in (?P<amount>\d+) ?(?P<unit>seconds?|secs?|s|minutes?|mins?|m|hours?|hrs?|h|days?|d|weeks?|w)"
+).fullmatch
+CLOCK_WORD_RE = re.compile(r"(\d{1,2}):(\d{1,2})").fullmatch
+MERIDIEMS = ("am", "pm")
+
+
+class TimeSpec(NamedTuple):
+    """現在時刻に依存しない、解析済みの時刻表現"""
+
+    kind: str
+    seconds: int = 0
+    at: datetime = None
+    clock: tuple = None
+    day_offset: int = 0
+    weekday: int = None
+    strictly_next: bool = False
+    week_offset: int = None
+
+    def resolve(self, now: datetime):
+        """現在時刻を基準に (trigger_time, is_recurring, recurrence_rule) を返す"""
+        if self.kind == "invalid":
+            return None, False, None
+        if self.kind == "relative":
+            return now + timedelta(seconds=self.seconds), False, None
+        if self.kind == "absolute":
+            return self.at, False, None
+
+        hour, minute = self.clock or (now.hour, now.minute)
+        trigger_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if self.weekday is None:
+            if self.day_offset:
+                trigger_time += timedelta(days=self.day_offset)
+            elif trigger_time < now:
+                trigger_time += timedelta(days=1)
+        elif self.week_offset is not None:
+            trigger_time += timedelta(days=self.weekday - now.weekday() + 7 * self.week_offset)
+        elif self.strictly_next:
+            trigger_time += timedelta(days=(self.weekday - now.weekday() - 1) % 7 + 1)
+        else:
+            days_ahead = (self.weekday - now.weekday()) % 7
+            if days_ahead == 0 and trigger_time < now:
+                days_ahead = 7
+            trigger_time += timedelta(days=days_ahead)
+
+        if self.kind == "daily":
+            return trigger_time, True, f"FREQ=DAILY;BYHOUR={hour};BYMINUTE={minute}"
+        if self.kind == "weekly":
+            return trigger_time, True, f"FREQ=WEEKLY;BYDAY={WEEKDAY_CODES[self.weekday]};BYHOUR={hour};BYMINUTE={minute}"
+        return trigger_time, False, None
+
+
+def tokenize(text: str):
+    """時刻表現をトークン列に分解する。解釈できない文字があればNoneを返す"""
+    text = text.rstrip(SEPARATORS)
+    tokens = []
+    match_at = TOKEN_RE.match
+    find = text.find
+    lexeme = LEXICON.get
+    position = 0
+    end = len(text)
+    while position < end:
+        if text[position] == " ":
+            position += 1
+        space = find(" ", position)
+        if space < 0:
+            space = end
+        word = text[position:space]
+        token = lexeme(word)
+        if token is not None:
+            tokens.append(token)
+            position = space
+            continue
+        clock = CLOCK_WORD_RE(word)
+        if clock is not None and not text.startswith(MERIDIEMS, space + 1):
+            tokens.append(("clock", (int(clock[1]), int(clock[2]))))
+            position = space
+            continue
+        match = match_at(text, position)
+        if match is None:
+            return None
+        position = match.end()
+        kind = match.lastgroup
+        tokens.append((KIND_ALIASES.get(kind, kind), TOKEN_VALUES[kind](match)))
+    return tokens
+
+
+def _meridiem(match):
+    hour, minute = int(match["m_hour"]), int(match["m_minute"] or 0)
+    if not 1 <= hour <= 12:
+        return None
+    return hour % 12 + (12 if match["ampm"] == "pm" else 0), minute
+
+
+def _ja_duration(match):
+    unit = match["ja_unit"]
+    seconds = int(match["ja_amount"]) * JA_UNIT_SECONDS[unit[0]]
+    return seconds + 1800 if unit[-1] == "半" else seconds
+
+
+TOKEN_VALUES = {
+    "date": lambda match: (int(match["year"]), int(match["month"]), int(match["day"])),
+    "meridiem": _meridiem,
+    "clock": lambda match: (int(match["hour"]), int(match["minute"])),
+    "duration": lambda match: int(match["amount"]) * UNIT_SECONDS[match["unit"][0]],
+    "weekday": lambda match: WEEKDAY_NAMES[match["weekday"]],
+    "word": lambda match: match["word"],
+    "ja_duration": _ja_duration,
+    "ja_clock": lambda match: (int(match["ja_hour"]), 30 if match["ja_half"] else int(match["ja_minute"] or 0)),
+    "period": lambda match: "am" if match["period"] == "午前" else "pm",
+    "ja_weekday": lambda match: JA_WEEKDAYS.index(match["ja_weekday"]),
+    "ja_word": lambda match: JA_WORDS[match["ja_word"]],
+}
+
+
+def _lexicon():
+    lexicon = {}
+    for word in (*WEEKDAY_NAMES, *KEYWORDS, *JA_WORDS):
+        match = TOKEN_RE.match(word)
+        if match is not None and match.end() == len(word):
+            kind = match.lastgroup
+            lexicon[word] = (KIND_ALIASES.get(kind, kind), TOKEN_VALUES[kind](match))
+    return lexicon
+
+
+LEXICON = _lexicon()
+END = (None, None)
+
+
+class _Grammar:
+    """トークン列を TimeSpec に還元する再帰下降パーサ"""
+
+    def __init__(self, tokens):
+        self.end = len(tokens)
+        tokens.append(END)
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position]
+
+    def accept(self, kind, value=None):
+        token_kind, token_value = self.tokens[self.position]
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return token_value if value is None else True
+        return None
+
+    def offset(self, offsets):
+        token_kind, token_value = self.peek()
+        if token_kind == "word" and token_value in offsets:
+            self.position += 1
+            return offsets[token_value]
+        return None
+
+    def clock(self):
+        start = self.position
+        kind, value = self.tokens[start]
+        if kind == "clock":
+            if not (0 <= value[0] <= 23 and 0 <= value[1] <= 59):
+                return None
+            self.position += 1
+            return value
+        self.accept("word", "at")
+        period = self.accept("period")
+        value = self.accept("clock")
+        if value is None and period is None:
+            value = self.accept("meridiem")
+        if value is not None and period is not None:
+            value = (value[0] % 12 + (12 if period == "pm" else 0), value[1]) if value[0] <= 12 else None
+        if value is None or not (0 <= value[0] <= 23 and 0 <= value[1] <= 59):
+            self.position = start
+            return None
+        return value
+
+    def expression(self):
+        kind, value = self.tokens[self.position]
+        if kind == "duration":
+            total = self.durations()
+            return TimeSpec("relative", seconds=total) if total is not None and self.accept("word", "later") else None
+        if kind == "word" and value in ("in", "every", "daily"):
+            self.position += 1
+            if value == "in":
+                total = self.durations()
+                return TimeSpec("relative", seconds=total) if total is not None else None
+            return self.recurring() if value == "every" else self.daily()
+        return self.single()
+
+    def durations(self):
+        total = self.accept("duration")
+        if total is None:
+            return None
+        while True:
+            joined = self.accept("word", "and")
+            seconds = self.accept("duration")
+            if seconds is None:
+                return None if joined else total
+            total += seconds
+
+    def daily(self):
+        clock = self.clock()
+        return TimeSpec("daily", clock=clock) if clock else None
+
+    def recurring(self):
+        if self.accept("word", "day"):
+            return self.daily()
+        weekday = self.accept("weekday")
+        if weekday is None:
+            return None
+        clock = self.clock()
+        return TimeSpec("weekly", clock=clock, weekday=weekday) if clock else None
+
+    def single(self):
+        kind, value = self.tokens[self.position]
+        if kind in CLOCK_KINDS or value == "at":
+            return self.clock_of_day()
+        date = self.accept("date")
+        if date is not None:
+            clock = self.clock()
+            if clock is None:
+                return None
+            try:
+                return TimeSpec("absolute", at=localize(datetime(*date, *clock)))
+            except ValueError:
+                return None
+        day_offset = self.offset(DAY_OFFSETS)
+        if day_offset is not None:
+            clock = self.clock()
+            return TimeSpec("clock", clock=clock, day_offset=day_offset) if clock else None
+        self.accept("word", "on")
+        strictly_next = bool(self.accept("word", "next"))
+        week_offset = None if strictly_next else self.offset(WEEK_OFFSETS)
+        weekday = self.accept("weekday")
+        if weekday is not None:
+            return TimeSpec("weekday", clock=self.clock(), weekday=weekday, strictly_next=strictly_next, week_offset=week_offset)
+        if strictly_next or week_offset is not None:
+            return None
+        return self.clock_of_day()
+
+    def clock_of_day(self):
+        clock = self.clock()
+        if clock is None:
+            return None
+        return TimeSpec("clock", clock=clock, day_offset=self.offset(DAY_OFFSETS) or 0)
+
+    def parse(self):
+        spec = self.expression()
+        if spec is None or self.position != self.end:
+            return INVALID
+        return spec
+
+
+INVALID = TimeSpec("invalid")
+
+
+def common_form(normalized: str):
+    """よく使う形式を1回の照合で TimeSpec に変換する。該当しなければNoneを返し、文法による解析に任せる"""
+    match = COMMON_FORM_RE(normalized)
+    if match is None:
+        return None
+    amount = match["amount"]
+    if amount is not None:
+        return TimeSpec("relative", seconds=int(amount) * UNIT_SECONDS[match["unit"][0]])
+    clock = int(match["hour"]), int(match["minute"])
+    if clock[0] > 23 or clock[1] > 59:
+        return None
+    if match["year"] is not None:
+        try:
+            return TimeSpec("absolute", at=localize(datetime(int(match["year"]), int(match["month"]), int(match["date"]), *clock)))
+        except ValueError:
+            return None
+    if match["day"] is not None:
+        return TimeSpec("clock", clock=clock, day_offset=DAY_OFFSETS[match["day"]])
+    if match["weekday"] is not None:
+        return TimeSpec("weekly", clock=clock, weekday=WEEKDAY_NAMES[match["weekday"]])
+    if normalized.startswith("every"):
+        return TimeSpec("daily", clock=clock)
+    return TimeSpec("clock", clock=clock)
+
+
+def normalize(time_str: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", time_str).lower().split())
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(normalized: str):
+    """正規化済みの時刻表現を TimeSpec に変換する。解釈できないASCIIの表現は dateutil に委ねるためNoneを返す"""
+    spec = common_form(normalized)
+    if spec is not None:
+        return spec
+    tokens = tokenize(normalized)
+    spec = _Grammar(tokens).parse() if tokens else INVALID
+    if spec is INVALID and normalized.isascii():
+        return None
+    return spec
+
+
+def parse_with_dateutil(time_str: str, now: datetime):
+    from dateutil.parser import parse as dateutil_parse
+
+    try:
+        parsed_dt_naive = dateutil_parse(time_str, default=now.replace(second=0, microsecond=0, tzinfo=None))
+    except (ValueError, OverflowError) as e:
+        logging.debug(f"dateutil.parserでの時刻パース失敗: {time_str}, error: {e}")
+        return None, False, None
+    if parsed_dt_naive.tzinfo is None:
+        trigger_time = TIMEZONE.localize(parsed_dt_naive)
+    else:
+        trigger_time = parsed_dt_naive.astimezone(TIMEZONE)
+    if trigger_time < now and parsed_dt_naive.date() == now.date():
+        trigger_time += timedelta(days=1)
+    return trigger_time, False, None
+
+
+def parse_time_string(time_str: str, now: datetime):
+    """
+    ユーザーが入力した様々な形式の時刻文字列をdatetimeオブジェクトに変換する。
+    繰り返しルールも解析し、次回実行時刻とルールを返す。
+    戻り値: (trigger_time: datetime, is_recurring: bool, recurrence_rule_str: str or None)
+    """
+    spec = compile_expression(normalize(time_str))
+    if spec is not None:
+        return spec.resolve(now)
+    return parse_with_dateutil(time_str, now)
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+TIMEZONE = pytz.timezone("Asia/Tokyo")
+LEGACY_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+STANDARD_TIME = TIMEZONE.localize(datetime(2000, 1, 1)).tzinfo
+STANDARD_SINCE = max(getattr(TIMEZONE, "_utc_transition_times", [datetime.max - timedelta(days=1)])) + timedelta(days=1)
+
+
+def to_epoch(dt: datetime) -> int:
+    """aware datetime をUNIX秒に変換する"""
+    return int(dt.timestamp())
+
+
+def from_epoch(epoch: int) -> datetime:
+    """UNIX秒をJSTのaware datetimeに変換する"""
+    return datetime.fromtimestamp(epoch, TIMEZONE)
+
+
+def localize(naive: datetime) -> datetime:
+    """JSTの壁時計の時刻をaware datetimeにする"""
+    if naive >= STANDARD_SINCE:
+        return naive.replace(tzinfo=STANDARD_TIME)
+    return TIMEZONE.localize(naive)
+
+
+def legacy_to_epoch(value: str) -> int:
+    """旧形式のJST naive文字列 ('YYYY-MM-DD HH:MM:SS') をUNIX秒に変換する"""
+    naive = datetime.strptime(value[:19], LEGACY_DATETIME_FORMAT)
+    return to_epoch(TIMEZONE.localize(naive))
@@ -0,0 +1,24 @@
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.settings import Settings
+
+
+@pytest_asyncio.fixture
+async def make_app():
+    from remind.app import create_app
+
+    apps = []
+
+    async def factory(**overrides):
+        overrides.setdefault("scheduler_window_seconds", 10 ** 9)
+        app = create_app(Settings(storage_backend="memory", **overrides))
+        await app.engine.start()
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        await app.engine.stop()
@@ -0,0 +1,244 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.bulk import export_stream, format_for, import_stream, parse_args, parse_target, read_ics, run, user_quota
+from remind.quotas import Quotas
+from remind.repository import ReminderRepository
+from remind.timeutil import TIMEZONE, from_epoch, to_epoch
+
+NOW = TIMEZONE.localize(datetime(2030, 1, 1, 12, 0))
+
+
+@pytest_asyncio.fixture
+async def repository(tmp_path):
+    repo = ReminderRepository(str(tmp_path / "data" / "reminders.db"))
+    await repo.open()
+    yield repo
+    await repo.close()
+
+
+async def import_text(repository, text, fmt, **kwargs):
+    return await import_stream(repository, io.StringIO(text), fmt, "1", "10", "100", now=NOW, **kwargs)
+
+
+def members_of(*user_ids):
+    checked = []
+
+    async def is_member(user_id):
+        checked.append(user_id)
+        return user_id in user_ids
+    is_member.checked = checked
+    return is_member
+
+
+async def export_text(repository, fmt, page_size=500):
+    stream = io.StringIO()
+    count = await export_stream(repository, "10", fmt, stream, page_size)
+    return count, stream.getvalue()
+
+
+def test_format_for_uses_extension_and_aliases():
+    assert format_for("reminders.CSV") == "csv"
+    assert format_for("x.ndjson") == "jsonl"
+    assert format_for("anything", "ical") == "ics"
+    with pytest.raises(ValueError):
+        format_for("reminders.xlsx")
+
+
+def test_parse_target():
+    assert parse_target("@me", "1") == ("user", "1")
+    assert parse_target("<#55>", "1") == ("channel", "55")
+    assert parse_target("<@!7>", "1") == ("user", "7")
+    assert parse_target("channel:9", "1") == ("channel", "9")
+    assert parse_target("#general", "1") is None
+
+
+@pytest.mark.asyncio
+async def test_csv_import_batches_rows_and_reports_errors(repository):
+    text = (
+        "target,time,message,recurrence_rule\n"
+        "@me,2030/01/02 09:00,first,\n"
+        "channel:55,2030/01/02 10:00,second,\n"
+        "@me,2029/12/31 09:00,past,\n"
+        "nobody,2030/01/02 09:00,bad target,\n"
+        "@me,2030/01/03 09:00,,\n"
+        "@me,2029/12/01 09:00,daily,FREQ=DAILY;BYHOUR=9;BYMINUTE=0\n"
+    )
+    result = await import_text(repository, text, "csv", batch_size=2)
+    assert result.imported == 3
+    assert [line for line, _ in result.errors] == [4, 5, 6]
+    rows = await repository.list_page_for_guild("10")
+    assert [row['message'] for row in rows] == ["first", "second", "daily"]
+    assert rows[1]['target_type'] == "channel" and rows[1]['target_id'] == "55"
+    daily = rows[2]
+    assert from_epoch(daily['next_fire_at']).strftime("%Y/%m/%d %H:%M") == "2030/01/02 09:00"
+    assert daily['trigger_time'] < daily['next_fire_at']
+
+
+@pytest.mark.asyncio
+async def test_jsonl_import_collects_rows_inside_the_window(repository):
+    lines = [
+        json.dumps({"time": "2030/01/01 12:05", "message": "soon"}),
+        "{broken",
+        json.dumps({"time": "2030/01/05 12:00", "message": "later", "user_id": "2"}),
+    ]
+    result = await import_text(repository, "\n".join(lines) + "\n", "jsonl", schedule_until=to_epoch(NOW) + 600,
+                               is_member=members_of("2"))
+    assert result.imported == 2
+    assert result.errors[0][0] == 2
+    rows = await repository.list_page_for_guild("10")
+    assert result.scheduled == [(rows[0]['id'], rows[0]['next_fire_at'])]
+    assert rows[1]['user_id'] == "2"
+
+
+@pytest.mark.asyncio
+async def test_add_many_returns_contiguous_ids(repository):
+    first = await repository.add("1", "10", "100", "user", "1", "x", 1, False, None, "2024-01-01 00:00:00")
+    row = ("1", "10", "100", "user", "1", "y", 2, 2, False, None, "2024-01-01 00:00:00", 0)
+    ids = await repository.add_many([row] * 3)
+    assert ids == [first + 1, first + 2, first + 3]
+    assert [r['message'] for r in await repository.get_many(ids)] == ["y"] * 3
+
+
+@pytest.mark.asyncio
+async def test_csv_export_pages_through_the_guild(repository):
+    await import_text(repository, "".join(
+        json.dumps({"time": f"2030/01/0{day} 09:00", "message": f"m{day}"}) + "\n" for day in range(2, 7)), "jsonl")
+    await repository.add("1", "99", "100", "user", "1", "other guild", to_epoch(NOW) + 60, False, None, "2024-01-01 00:00:00")
+    count, text = await export_text(repository, "csv", page_size=2)
+    assert count == 5
+    records = list(csv.DictReader(io.StringIO(text)))
+    assert [record['message'] for record in records] == ["m2", "m3", "m4", "m5", "m6"]
+    assert records[0]['target'] == "user:1" and records[0]['time'] == "2030/01/02 09:00"
+
+
+@pytest.mark.asyncio
+async def test_ics_round_trip_keeps_rules_and_folds_long_lines(repository, tmp_path):
+    message = ("長いメッセージ, セミコロン; " * 8).strip()
+    await import_text(repository, "\n".join([
+        json.dumps({"time": "2030/01/02 09:00", "message": message, "target": "channel:55"}),
+        json.dumps({"time": "2029/12/01 09:00", "message": "weekly", "recurrence_rule": "FREQ=WEEKLY;BYDAY=MO"}),
+    ]) + "\n", "jsonl")
+    count, text = await export_text(repository, "ics")
+    assert count == 2
+    assert all(len(line.encode()) <= 75 for line in text.split("\r\n"))
+    assert "RRULE:FREQ=WEEKLY;BYDAY=MO" in text
+
+    records = [record for _, record in read_ics(io.StringIO(text))]
+    assert records[0]['message'] == message and records[0]['target'] == "channel:55"
+    assert records[1]['recurrence_rule'] == "FREQ=WEEKLY;BYDAY=MO"
+
+    copy = ReminderRepository(str(tmp_path / "copy.db"))
+    await copy.open()
+    try:
+        result = await import_stream(copy, io.StringIO(text), "ics", "1", "10", "100", now=NOW)
+        assert result.imported == 2 and not result.errors
+        original = await repository.list_page_for_guild("10")
+        imported = await copy.list_page_for_guild("10")
+        keys = ("message", "target_type", "target_id", "trigger_time", "next_fire_at", "recurrence_rule")
+        assert [[row[key] for key in keys] for row in imported] == [[row[key] for key in keys] for row in original]
+    finally:
+        await copy.close()
+
+
+def test_read_ics_handles_utc_and_foreign_zones():
+    text = (
+        "BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nDTSTART:20300102T000000Z\r\nSUMMARY:utc\r\nEND:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nDTSTART;TZID=America/New_York:20300102T090000\r\nSUMMARY:ny\r\nEND:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nDTSTART:garbage\r\nSUMMARY:bad\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n"
+    )
+    records = [record for _, record in read_ics(io.StringIO(text))]
+    assert from_epoch(records[0]['dtstart']).strftime("%m/%d %H:%M") == "01/02 09:00"
+    assert from_epoch(records[1]['dtstart']).strftime("%m/%d %H:%M") == "01/02 23:00"
+    assert "_error" in records[2]
+
+
+@pytest.mark.asyncio
+async def test_import_respects_row_limit_and_rule_check(repository):
+    def check_rule(rule, dtstart):
+        if "BYMINUTE=0,1" in rule:
+            raise ValueError("too frequent")
+
+    text = "".join(json.dumps(record) + "\n" for record in [
+        {"time": "2030/01/02 09:00", "message": "a"},
+        {"time": "2030/01/02 09:00", "message": "b", "recurrence_rule": "FREQ=DAILY;BYHOUR=9;BYMINUTE=0,1"},
+        {"time": "2030/01/02 09:00", "message": "c"},
+        {"time": "2030/01/02 09:00", "message": "d"},
+    ])
+    result = await import_text(repository, text, "jsonl", max_rows=2, check_rule=check_rule)
+    assert result.imported == 2
+    assert result.errors == [(2, "too frequent"), (4, "登録できる件数の上限 (2 件) に達しました")]
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_users_outside_the_guild(repository):
+    text = "".join(json.dumps(record) + "\n" for record in [
+        {"time": "2030/01/02 09:00", "message": "mine"},
+        {"time": "2030/01/02 09:00", "message": "member", "user_id": "2"},
+        {"time": "2030/01/02 09:00", "message": "stranger", "user_id": "3"},
+        {"time": "2030/01/02 09:00", "message": "dm stranger", "target": "user:3"},
+        {"time": "2030/01/02 09:00", "message": "dm member", "target": "<@2>"},
+    ])
+    assert (await import_text(repository, text, "jsonl")).imported == 1
+    is_member = members_of("2")
+    result = await import_text(repository, text, "jsonl", is_member=is_member)
+    assert result.imported == 3
+    assert [line for line, _ in result.errors] == [3, 4]
+    assert "3" in result.errors[0][1]
+    assert sorted(is_member.checked) == ["2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_cli_import_enforces_guild_quota_and_membership(tmp_path, monkeypatch):
+    path = tmp_path / "reminders.jsonl"
+    path.write_text("".join(json.dumps(record) + "\n" for record in [
+        {"time": "2099/01/02 09:00", "message": "a"},
+        {"time": "2099/01/02 09:00", "message": "b", "user_id": "2"},
+        {"time": "2099/01/02 09:00", "message": "c"},
+        {"time": "2099/01/02 09:00", "message": "d"},
+    ]), encoding="utf-8")
+    monkeypatch.setenv("QUOTA_MAX_PER_GUILD", "2")
+    db = str(tmp_path / "reminders.db")
+    argv = ["--db", db, "import", str(path), "--guild-id", "10", "--user-id", "1"]
+    assert await run(parse_args(argv)) == 1
+    repository = ReminderRepository(db)
+    await repository.open()
+    try:
+        assert [row['message'] for row in await repository.list_page_for_guild("10")] == ["a", "c"]
+    finally:
+        await repository.close()
+    monkeypatch.setenv("QUOTA_MAX_PER_GUILD", "4")
+    assert await run(parse_args(argv + ["--allow-foreign-users"])) == 1
+    repository = ReminderRepository(db)
+    await repository.open()
+    try:
+        assert [row['message'] for row in await repository.list_page_for_guild("10")] == ["a", "c", "a", "b"]
+    finally:
+        await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_import_applies_the_per_user_limit_to_each_owner(repository):
+    await import_text(repository, json.dumps({"time": "2030/01/02 09:00", "message": "existing"}) + "\n", "jsonl")
+    quotas = Quotas(max_per_user=2)
+    text = "".join(json.dumps(record) + "\n" for record in [
+        {"time": "2030/01/02 09:00", "message": "a"},
+        {"time": "2030/01/02 09:00", "message": "b", "user_id": "2"},
+        {"time": "2030/01/02 09:00", "message": "c"},
+        {"time": "2030/01/02 09:00", "message": "d", "user_id": "2"},
+        {"time": "2030/01/02 09:00", "message": "e", "user_id": "2"},
+    ])
+    result = await import_text(repository, text, "jsonl", is_member=members_of("2"),
+                               remaining_for_user=user_quota(repository, quotas, "10"))
+    assert result.imported == 3
+    assert [line for line, _ in result.errors] == [3, 5]
+    assert await repository.usage("1", "10") == (2, 4)
+    assert await repository.usage("2", "10") == (2, 4)
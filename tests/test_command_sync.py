@@ -0,0 +1,66 @@
+import json
+
+import discord
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.command_sync import command_fingerprint, sync_if_changed
+
+
+def build_tree(description="リマインダー"):
+    tree = discord.app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+    group = discord.app_commands.Group(name="remind", description=description)
+
+    @group.command(name="set", description="設定")
+    async def set_reminder(interaction: discord.Interaction, time: str):
+        pass
+
+    tree.add_command(group)
+    tree.synced = []
+
+    async def sync(*, guild=None):
+        tree.synced.append(guild)
+        return []
+
+    tree.sync = sync
+    return tree
+
+
+def test_fingerprint_tracks_the_command_schema():
+    assert command_fingerprint(build_tree()) == command_fingerprint(build_tree())
+    assert command_fingerprint(build_tree()) != command_fingerprint(build_tree("変更後"))
+
+
+@pytest.mark.asyncio
+async def test_sync_only_when_the_schema_changes(tmp_path):
+    path = str(tmp_path / "data" / "command_sync.json")
+    assert await sync_if_changed(build_tree(), path) is True
+    tree = build_tree()
+    assert await sync_if_changed(tree, path) is False
+    assert tree.synced == []
+    assert await sync_if_changed(tree, path, force=True) is True
+    assert await sync_if_changed(build_tree("変更後"), path) is True
+
+
+@pytest.mark.asyncio
+async def test_guild_and_global_scopes_are_recorded_separately(tmp_path):
+    path = str(tmp_path / "command_sync.json")
+    guild = discord.Object(id=42)
+    tree = build_tree()
+    tree.copy_global_to(guild=guild)
+    assert await sync_if_changed(tree, path) is True
+    assert await sync_if_changed(tree, path, guild=guild) is True
+    assert tree.synced == [None, guild]
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"None:global", "None:42"}
+
+
+@pytest.mark.asyncio
+async def test_unreadable_state_forces_a_sync(tmp_path):
+    path = tmp_path / "command_sync.json"
+    path.write_text("{not json", encoding="utf-8")
+    tree = build_tree()
+    assert await sync_if_changed(tree, str(path)) is True
+    assert await sync_if_changed(tree, str(path)) is False
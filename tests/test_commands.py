@@ -0,0 +1,137 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_discord import FakeInteraction, FakeUser
+from remind.timeutil import from_epoch, localize, to_epoch
+
+RULE = "FREQ=DAILY;BYHOUR=9;BYMINUTE=0"
+
+
+def interact(user_id=1):
+    guild = SimpleNamespace(id=10, text_channels=[], get_channel=lambda channel_id: None)
+    return FakeInteraction(FakeUser(None, user_id), guild, None)
+
+
+async def add(app, message="msg", recurring=False, target=("user", "1"), user_id="1", fire_at=None):
+    fire_at = fire_at or int(time.time()) + 3600
+    reminder_id = await app.repository.add(user_id, "10", "100", target[0], target[1], message, fire_at, recurring,
+                                           RULE if recurring else None, None)
+    app.engine.schedule(reminder_id, fire_at)
+    return reminder_id
+
+
+@pytest.mark.asyncio
+async def test_delete_needs_exactly_one_of_id_or_filters(make_app):
+    group = (await make_app()).remind_commands
+    neither = interact()
+    await group.delete_reminder.callback(group, neither)
+    both = interact()
+    await group.delete_reminder.callback(group, both, 1, contains="x")
+    assert all("どちらか一方" in interaction.response.messages[0] for interaction in (neither, both))
+
+
+@pytest.mark.asyncio
+async def test_filtered_delete_removes_only_matching_rows_and_unschedules_them(make_app):
+    app = await make_app(delete_id_preview=1)
+    group = app.remind_commands
+    kept = await add(app, "standup")
+    daily = [await add(app, "daily standup", recurring=True) for _ in range(2)]
+    theirs = await add(app, "daily standup", recurring=True, user_id="2")
+
+    bad_target = interact()
+    await group.delete_reminder.callback(group, bad_target, target="#missing")
+    assert "無効です" in bad_target.response.messages[0]
+
+    interaction = interact()
+    await group.delete_reminder.callback(group, interaction, target="@me", contains="daily", recurring_only=True)
+    assert interaction.response.messages[0] == f"2 件のリマインドを削除しました (ID: `{daily[0]}` ほか 1 件)。"
+    assert [row["id"] for row in await app.repository.get_many([kept, *daily, theirs])] == [kept, theirs]
+    assert [app.engine.scheduled_at(reminder_id) is not None for reminder_id in (kept, *daily, theirs)] == [True, False, False, True]
+
+    again = interact()
+    await group.delete_reminder.callback(group, again, contains="daily")
+    assert "一致するリマインドはありません" in again.response.messages[0]
+
+
+@pytest.mark.asyncio
+async def test_edit_keeps_the_id_and_reschedules(make_app):
+    app = await make_app()
+    group = app.remind_commands
+    reminder_id = await add(app)
+
+    stranger = interact(2)
+    await group.edit_reminder.callback(group, stranger, reminder_id, message="x")
+    assert "見つからないか" in stranger.response.messages[0]
+
+    interaction = interact()
+    await group.edit_reminder.callback(group, interaction, reminder_id, time="every day at 9:00", message="new")
+    row = await app.repository.get(reminder_id)
+    assert (row["message"], row["is_recurring"], row["fire_count"]) == ("new", 1, 0)
+    assert row["trigger_time"] == row["next_fire_at"] > time.time()
+    assert app.engine.scheduled_at(reminder_id) == row["next_fire_at"]
+
+    invalid = interact()
+    await group.edit_reminder.callback(group, invalid, reminder_id, time="someday")
+    assert "形式が無効" in invalid.response.messages[0]
+    assert (await app.repository.get(reminder_id))["message"] == "new"
+
+
+@pytest.mark.asyncio
+async def test_pause_and_resume_a_recurring_reminder(make_app):
+    app = await make_app()
+    group = app.remind_commands
+    one_shot = await add(app)
+    tomorrow = from_epoch(int(time.time())).date() + timedelta(days=1)
+    pending = to_epoch(localize(datetime(tomorrow.year, tomorrow.month, tomorrow.day, 9, 0)))
+    reminder_id = await add(app, recurring=True, fire_at=pending)
+
+    rejected = interact()
+    await group.pause_reminder.callback(group, rejected, one_shot)
+    assert "繰り返しのリマインドだけ" in rejected.response.messages[0]
+
+    await group.pause_reminder.callback(group, interact(), reminder_id)
+    assert (await app.repository.get(reminder_id))["paused_at"] is not None
+    assert app.engine.scheduled_at(reminder_id) is None
+    assert [row["id"] for row in await app.repository.list_due_between(0, 2 ** 40)] == [one_shot]
+
+    twice = interact()
+    await group.pause_reminder.callback(group, twice, reminder_id)
+    assert "既に一時停止" in twice.response.messages[0]
+
+    interaction = interact()
+    await group.resume_reminder.callback(group, interaction, reminder_id)
+    row = await app.repository.get(reminder_id)
+    assert row["paused_at"] is None and row["next_fire_at"] == pending
+    assert app.engine.scheduled_at(reminder_id) == row["next_fire_at"]
+    assert "再開しました" in interaction.response.messages[0]
+
+    again = interact()
+    await group.resume_reminder.callback(group, again, reminder_id)
+    assert "一時停止していません" in again.response.messages[0]
+
+
+@pytest.mark.asyncio
+async def test_failed_inserts_refund_the_creation_token(make_app):
+    app = await make_app(quota_creation_rate=1)
+    group = app.remind_commands
+    add_reminder = app.repository.add
+
+    async def broken_add(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    app.repository.add = broken_add
+    failed = interact()
+    await group.set_reminder.callback(group, failed, "@me", "in 1h", "msg")
+    assert "DBエラー" in failed.response.messages[0]
+
+    app.repository.add = add_reminder
+    interaction = interact()
+    await group.set_reminder.callback(group, interaction, "@me", "in 1h", "msg")
+    assert "リマインドを設定しました" in interaction.response.messages[0]
+    limited = interact()
+    await group.set_reminder.callback(group, limited, "@me", "in 1h", "msg")
+    assert "作成が多すぎます" in limited.response.messages[0]
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from remind.send_queue import DISCORD_REST_SECONDS
+
+NOW = 1_700_000_000
+
+
+@pytest.mark.asyncio
+async def test_late_notice_follows_the_injected_clock(make_app):
+    from remind.delivery import ReminderDelivery
+
+    app = await make_app(late_notice_seconds=300)
+    delivery = ReminderDelivery(app, app.settings, app.target_resolver, app.send_queue, app.repository, clock=lambda: NOW)
+    assert delivery.reminder_text({'message': "msg", 'next_fire_at': NOW - 60}) == "リマインダー: msg"
+    assert "から遅れて配信されました" in delivery.reminder_text({'message': "msg", 'next_fire_at': NOW - 600})
+
+
+@pytest.mark.asyncio
+async def test_target_checks_time_their_rest_calls(make_app):
+    app = await make_app()
+
+    async def fetch_member(member_id):
+        return SimpleNamespace(id=member_id)
+
+    guild = SimpleNamespace(id=10, chunked=True, get_member=lambda member_id: None, fetch_member=fetch_member)
+    before = DISCORD_REST_SECONDS.count("fetch_member")
+    assert await app.target_exists(guild, 'user', 5)
+    assert DISCORD_REST_SECONDS.count("fetch_member") == before + 1
+
+
+def http_error(cls, status):
+    return cls(SimpleNamespace(status=status, reason="", headers={}), "")
+
+
+@pytest.mark.asyncio
+async def test_uncached_guilds_are_orphaned_only_after_rest_confirms_it(make_app):
+    import discord
+
+    app = await make_app()
+    for guild_id in ("10", "20", "30"):
+        await app.repository.add("1", guild_id, "100", "channel", "100", "msg", NOW, False, None, NOW)
+    errors = {10: http_error(discord.NotFound, 404), 20: http_error(discord.HTTPException, 503)}
+    fetched = []
+
+    async def fetch_guild(guild_id, *, with_counts=True):
+        fetched.append(guild_id)
+        if guild_id in errors:
+            raise errors[guild_id]
+        return SimpleNamespace(id=guild_id)
+
+    app.get_guild = lambda guild_id: None
+    app.fetch_guild = fetch_guild
+    guilds, targets = await app.find_orphans()
+    assert guilds == {10}
+    assert targets == []
+    assert sorted(fetched) == [10, 20, 30]
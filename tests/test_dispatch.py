@@ -0,0 +1,356 @@
+import asyncio
+import pytest
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.dispatch import Dispatcher, delivery_key, delivery_nonce
+from remind.repository import ReminderRepository
+
+
+class CountingRepository(ReminderRepository):
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.calls = []
+
+    async def get_many(self, reminder_ids):
+        self.calls.append("get_many")
+        return await super().get_many(reminder_ids)
+
+    async def claim_deliveries(self, *args):
+        self.calls.append("claim_deliveries")
+        return await super().claim_deliveries(*args)
+
+    async def complete(self, *args):
+        self.calls.append("complete")
+        return await super().complete(*args)
+
+
+@pytest_asyncio.fixture
+async def repository(tmp_path):
+    repo = CountingRepository(str(tmp_path / "reminders.db"))
+    await repo.open()
+    yield repo
+    await repo.close()
+
+
+NOW = 1_700_000_000
+
+
+async def add_reminders(repo, count, is_recurring=False):
+    rule = "FREQ=DAILY;BYHOUR=9;BYMINUTE=0" if is_recurring else None
+    return [
+        await repo.add("1", "10", "100", "channel", "100", f"msg {i}", NOW, is_recurring, rule, "2024-01-01 00:00:00")
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dispatch_uses_one_load_and_one_completion(repository):
+    one_shot_ids = await add_reminders(repository, 20)
+    recurring_ids = await add_reminders(repository, 3, is_recurring=True)
+    delivered = []
+
+    async def deliver(row, key):
+        delivered.append(row['id'])
+        return True
+
+    advanced = []
+    dispatcher = Dispatcher(repository, deliver, on_advanced=lambda reminder_id, fire_at: advanced.append(reminder_id),
+                            clock=lambda: NOW)
+    await dispatcher.dispatch(one_shot_ids + recurring_ids)
+    assert sorted(delivered) == sorted(one_shot_ids + recurring_ids)
+    assert repository.calls == ["get_many", "claim_deliveries", "complete"]
+    remaining = await repository.get_many(one_shot_ids + recurring_ids)
+    assert sorted(row['id'] for row in remaining) == recurring_ids
+    assert advanced == recurring_ids
+    assert all(row['next_fire_at'] > NOW and row['fire_count'] == 1 for row in remaining)
+
+
+@pytest.mark.asyncio
+async def test_dispatch_bounds_concurrency_and_keeps_undelivered(repository):
+    reminder_ids = await add_reminders(repository, 12)
+    in_flight = 0
+    peak = 0
+
+    async def deliver(row, key):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return row['id'] != reminder_ids[0]
+
+    await Dispatcher(repository, deliver, concurrency=3).dispatch(reminder_ids)
+    assert peak == 3
+    assert [row['id'] for row in await repository.get_many(reminder_ids)] == [reminder_ids[0]]
+
+
+@pytest.mark.asyncio
+async def test_recurring_rule_with_count_is_removed_when_exhausted(repository):
+    reminder_id = await repository.add("1", "10", "100", "channel", "100", "msg", NOW, True,
+                                       "FREQ=DAILY;COUNT=2", "2024-01-01 00:00:00")
+
+    async def deliver(row, key):
+        return True
+
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW)
+    await dispatcher.dispatch([reminder_id])
+    assert (await repository.get(reminder_id))['fire_count'] == 1
+    await dispatcher.dispatch([reminder_id])
+    assert await repository.get(reminder_id) is None
+
+
+@pytest.mark.asyncio
+async def test_rows_outside_owned_shards_are_left_untouched(repository):
+    owned_id = await repository.add("1", "10", "100", "channel", "100", "mine", NOW, False, None, "2024-01-01 00:00:00")
+    other_id = await repository.add("1", "20", "100", "channel", "100", "other", NOW, False, None, "2024-01-01 00:00:00")
+    delivered = []
+
+    async def deliver(row, key):
+        delivered.append(row['id'])
+        return True
+
+    dispatcher = Dispatcher(repository, deliver, owns=lambda row: row['guild_id'] == "10")
+    await dispatcher.dispatch([owned_id, other_id])
+    assert delivered == [owned_id]
+    assert await repository.get(owned_id) is None
+    assert await repository.get(other_id) is not None
+
+
+@pytest.mark.asyncio
+async def test_crash_after_send_is_redelivered_once_with_the_same_key(repository):
+    reminder_id = await repository.add("1", "10", "100", "channel", "100", "msg", NOW, True,
+                                       "FREQ=DAILY;BYHOUR=9;BYMINUTE=0", "2024-01-01 00:00:00")
+    row = await repository.get(reminder_id)
+    key = delivery_key(row)
+    assert await repository.claim_deliveries([(reminder_id, NOW, key)], "crashed", "old-token", NOW, NOW - 300) == [reminder_id]
+    keys = []
+
+    async def deliver(row, key):
+        keys.append(key)
+        return True
+
+    dispatcher = Dispatcher(repository, deliver, owner="restarted", clock=lambda: NOW + 5)
+    await dispatcher.dispatch([reminder_id])
+    assert keys == [key]
+    assert delivery_nonce(key) == key
+    assert (await repository.get(reminder_id))['fire_count'] == 1
+
+    assert await repository.complete("old-token", [(reminder_id, key, NOW + 86400)], NOW + 6) == ([], [])
+    assert (await repository.get(reminder_id))['fire_count'] == 1
+    assert await repository.claim_deliveries([(reminder_id, NOW, key)], "another", "token", NOW + 7, NOW - 293) == []
+
+
+@pytest.mark.asyncio
+async def test_claims_of_live_lease_holders_are_respected_until_stale(repository):
+    reminder_id = (await add_reminders(repository, 1))[0]
+    key = delivery_key(await repository.get(reminder_id))
+    await repository.sync_leases("holder", [0], 1, NOW, 15)
+    assert await repository.claim_deliveries([(reminder_id, NOW, key)], "holder", "a", NOW, NOW - 300) == [reminder_id]
+    assert await repository.claim_deliveries([(reminder_id, NOW, key)], "other", "b", NOW + 1, NOW - 299) == []
+    assert await repository.claim_deliveries([(reminder_id, NOW, key)], "other", "c", NOW + 301, NOW + 1) == [reminder_id]
+
+
+@pytest.mark.asyncio
+async def test_undelivered_claims_are_released_for_retry(repository):
+    reminder_id = (await add_reminders(repository, 1))[0]
+    attempts = []
+
+    async def deliver(row, key):
+        attempts.append(key)
+        return len(attempts) > 1
+
+    rearmed = []
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW, on_undelivered=rearmed.extend, retry_delay=30)
+    await dispatcher.dispatch([reminder_id])
+    assert await repository.get(reminder_id) is not None
+    assert rearmed == [(reminder_id, NOW + 30)]
+    await dispatcher.dispatch([reminder_id for reminder_id, _ in rearmed])
+    assert await repository.get(reminder_id) is None
+    assert len(attempts) == 2 and attempts[0] == attempts[1]
+    assert rearmed == [(reminder_id, NOW + 30)]
+
+
+@pytest.mark.asyncio
+async def test_undelivered_firings_back_off_and_give_up_after_max_attempts(repository):
+    one_shot_id, = await add_reminders(repository, 1)
+    recurring_id, = await add_reminders(repository, 1, is_recurring=True)
+
+    async def deliver(row, key):
+        return False
+
+    rearmed = []
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW, on_undelivered=rearmed.append,
+                            retry_delay=30, max_retry_delay=100, max_attempts=4)
+    for _ in range(3):
+        await dispatcher.dispatch([one_shot_id, recurring_id])
+    assert [dict(pairs)[recurring_id] - NOW for pairs in rearmed] == [30, 60, 100]
+    assert (await repository.get(recurring_id))['fire_count'] == 0
+
+    await dispatcher.dispatch([one_shot_id, recurring_id])
+    assert len(rearmed) == 3
+    assert await repository.get(one_shot_id) is None
+    row = await repository.get(recurring_id)
+    assert row['fire_count'] == 1 and row['next_fire_at'] > NOW
+    assert (await repository.history_for_user(recurring_id, "1", "10"))[0]['outcome'] == "undelivered"
+
+
+def test_long_keys_are_hashed_to_fit_the_nonce():
+    nonce = delivery_nonce("1234567890123:1700000000123")
+    assert len(nonce) == 25
+    assert nonce == delivery_nonce("1234567890123:1700000000123")
+
+
+@pytest.mark.asyncio
+async def test_digest_mode_sends_one_message_per_target(repository):
+    channel_ids = [await repository.add("1", "10", "100", "channel", "100", f"msg {i}", NOW + i, False, None, "2024-01-01 00:00:00")
+                   for i in range(5)]
+    user_ids = [await repository.add("1", "10", "100", "user", "7", f"dm {i}", NOW, False, None, "2024-01-01 00:00:00")
+                for i in range(2)]
+    solo_id = await repository.add("1", "10", "100", "channel", "200", "solo", NOW, False, None, "2024-01-01 00:00:00")
+    singles = []
+    digests = []
+
+    async def deliver(row, key):
+        singles.append(row['id'])
+        return True
+
+    async def deliver_digest(rows, key):
+        digests.append(([row['id'] for row in rows], key))
+        return True
+
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW, deliver_digest=deliver_digest, digest_size=3)
+    await dispatcher.dispatch(channel_ids + user_ids + [solo_id])
+    assert singles == [solo_id]
+    assert sorted(ids for ids, _ in digests) == sorted([channel_ids[:3], channel_ids[3:], user_ids])
+    assert len({key for _, key in digests}) == 3
+    assert await repository.get_many(channel_ids + user_ids + [solo_id]) == []
+
+
+@pytest.mark.asyncio
+async def test_dispatch_appends_history_with_outcome_and_lag(repository):
+    sent_id, forbidden_id, retried_id = await add_reminders(repository, 3)
+
+    async def deliver(row, key):
+        return {sent_id: True, forbidden_id: "forbidden", retried_id: False}[row['id']]
+
+    await Dispatcher(repository, deliver, clock=lambda: NOW + 2.5).dispatch([sent_id, forbidden_id, retried_id])
+    assert [tuple(row) for row in await repository.history_for_user(sent_id, "1", "10")] == [(NOW, NOW + 2, 2500, "sent")]
+    assert (await repository.history_for_user(forbidden_id, "1", "10"))[0]['outcome'] == "forbidden"
+    assert await repository.history_for_user(retried_id, "1", "10") == []
+    assert await repository.history_for_user(sent_id, "2", "10") == []
+
+
+@pytest.mark.asyncio
+async def test_only_one_shots_sent_alone_are_kept_for_snoozing(repository):
+    sent_id, forbidden_id = [await repository.add("1", "10", "100", "channel", channel_id, "msg", NOW, False, None, None)
+                             for channel_id in ("300", "400")]
+    recurring_id, = await add_reminders(repository, 1, is_recurring=True)
+    grouped = [await repository.add("1", "10", "100", "user", "7", f"dm {i}", NOW, False, None, None) for i in range(2)]
+
+    async def deliver(row, key):
+        return "forbidden" if row['id'] == forbidden_id else "sent"
+
+    async def deliver_digest(rows, key):
+        return "sent"
+
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW, deliver_digest=deliver_digest,
+                            snoozable=lambda row: not row['is_recurring'])
+    await dispatcher.dispatch([sent_id, forbidden_id, recurring_id, *grouped])
+    rows = {row['id']: row for row in await repository.get_many([sent_id, forbidden_id, recurring_id, *grouped])}
+    assert set(rows) == {sent_id, recurring_id}
+    assert rows[sent_id]['next_fire_at'] is None and rows[recurring_id]['next_fire_at'] > NOW
+    assert await repository.usage("1", "10") == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_paused_rows_fired_from_a_stale_schedule_are_skipped(repository):
+    paused_id, active_id = await add_reminders(repository, 2, is_recurring=True)
+    await repository.update_owned(paused_id, "1", "10", paused_at=NOW)
+    delivered = []
+
+    async def deliver(row, key):
+        delivered.append(row['id'])
+        return True
+
+    await Dispatcher(repository, deliver).dispatch([paused_id, active_id])
+    assert delivered == [active_id]
+    assert (await repository.get(paused_id))['fire_count'] == 0
+
+
+@pytest.mark.asyncio
+async def test_rows_advanced_since_they_were_loaded_are_not_sent_early(repository):
+    reminder_id, = await add_reminders(repository, 1, is_recurring=True)
+    delivered = []
+
+    async def deliver(row, key):
+        delivered.append(row['id'])
+        return True
+
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW, lookahead=0)
+    await dispatcher.dispatch([reminder_id])
+    await dispatcher.dispatch([reminder_id])
+    assert delivered == [reminder_id]
+    assert (await repository.get(reminder_id))['fire_count'] == 1
+
+
+@pytest.mark.asyncio
+async def test_long_overdue_firings_are_still_sent(repository):
+    stale_id = await repository.add("1", "10", "100", "channel", "100", "msg", NOW - 86400 * 7, False, None, None)
+    recurring_id = await repository.add("1", "10", "100", "channel", "100", "daily", NOW - 86400 * 7, True,
+                                        "FREQ=DAILY;BYHOUR=9;BYMINUTE=0", None)
+    delivered = []
+
+    async def deliver(row, key):
+        delivered.append(row['id'])
+        return "sent"
+
+    advanced = []
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW,
+                            on_advanced=lambda reminder_id, fire_at: advanced.append(reminder_id))
+    await dispatcher.dispatch([stale_id, recurring_id])
+    assert sorted(delivered) == [stale_id, recurring_id]
+    assert await repository.get(stale_id) is None
+    assert advanced == [recurring_id] and (await repository.get(recurring_id))['next_fire_at'] > NOW
+    assert (await repository.history_for_user(stale_id, "1", "10"))[0]['outcome'] == "sent"
+
+
+@pytest.mark.asyncio
+async def test_raised_sends_are_retried_instead_of_completed(repository):
+    reminder_id = await repository.add("1", "10", "100", "channel", "100", "msg", NOW, False, None, None)
+    attempts = []
+
+    async def deliver(row, key):
+        attempts.append(row['id'])
+        if len(attempts) == 1:
+            raise OSError("503 Service Unavailable")
+        return "sent"
+
+    retried = []
+    dispatcher = Dispatcher(repository, deliver, clock=lambda: NOW, on_undelivered=retried.extend)
+    await dispatcher.dispatch([reminder_id])
+    assert await repository.get(reminder_id) is not None
+    assert retried == [(reminder_id, NOW + 30)]
+    await dispatcher.dispatch([reminder_id])
+    assert attempts == [reminder_id, reminder_id]
+    assert await repository.get(reminder_id) is None
+
+
+def test_resume_keeps_the_pending_occurrence_and_remaining_count(repository):
+    from datetime import datetime
+
+    from remind.timeutil import localize, to_epoch
+
+    dispatcher = Dispatcher(repository, None)
+    start = to_epoch(localize(datetime(2024, 5, 1, 9, 0)))
+    pending = to_epoch(localize(datetime(2024, 5, 3, 9, 0)))
+    row = {'id': 1, 'recurrence_rule': "FREQ=DAILY;BYHOUR=9;BYMINUTE=0", 'trigger_time': start,
+           'next_fire_at': pending, 'fire_count': 2}
+    assert dispatcher.resume_occurrence(row, pending - 3600) == pending
+    assert dispatcher.resume_occurrence(row, pending + 3600) == pending + 86400
+
+    counted = dict(row, recurrence_rule="FREQ=DAILY;BYHOUR=9;BYMINUTE=0;COUNT=3")
+    assert dispatcher.resume_occurrence(counted, pending - 3600) == pending
+    assert dispatcher.resume_occurrence(dict(counted, fire_count=3), pending - 3600) is None
@@ -0,0 +1,213 @@
+import asyncio
+import time
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.engine import ReminderEngine
+
+START = 1_700_000_000
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRepository:
+    def __init__(self, trigger_times):
+        self.trigger_times = trigger_times
+        self.queries = []
+
+    async def list_due_between(self, after, until, shards=None):
+        self.queries.append((after, until) if shards is None else (after, until, shards))
+        return [
+            {'id': reminder_id, 'next_fire_at': trigger_time}
+            for reminder_id, trigger_time in sorted(self.trigger_times.items(), key=lambda item: item[1])
+            if after < trigger_time <= until
+        ]
+
+
+def make_engine(trigger_times, clock, fired):
+    async def fire(reminder_ids):
+        fired.extend(reminder_ids)
+    return ReminderEngine(FakeRepository(trigger_times), fire, window_seconds=600, refill_interval=60, clock=clock)
+
+
+@pytest.mark.asyncio
+async def test_start_loads_only_the_near_term_window():
+    clock = FakeClock(START)
+    trigger_times = {1: START + 30, 2: START + 599, 3: START + 601, 4: START + 86400 * 90, 5: START - 10}
+    engine = make_engine(trigger_times, clock, [])
+    engine._loaded_until = START
+    await engine.refill()
+    assert len(engine) == 2
+    assert engine.repository.queries == [(START, START + 600)]
+
+    clock.now = START + 60
+    await engine.refill()
+    assert len(engine) == 3
+    assert engine.repository.queries[-1] == (START + 600, START + 660)
+
+
+@pytest.mark.asyncio
+async def test_sweep_picks_up_rows_added_behind_the_loaded_boundary():
+    clock = FakeClock(START)
+    trigger_times = {1: START + 30}
+    engine = ReminderEngine(FakeRepository(trigger_times), None, window_seconds=600, refill_interval=60, clock=clock,
+                            sweep_seconds=300)
+    engine._loaded_until = 0
+    await engine.refill()
+    assert engine.pop_due(START + 30) == [1]
+
+    del trigger_times[1]
+    trigger_times.update({2: START + 20, 3: START + 120, 4: START - 400})
+    clock.now = START + 60
+    await engine.refill()
+    assert engine.repository.queries[-1] == (START - 240, START + 660)
+    assert engine.pop_due(START + 120) == [2, 3]
+    assert len(engine) == 0
+
+
+@pytest.mark.asyncio
+async def test_scope_limits_refill_and_claimed_shards_backfill_the_window():
+    clock = FakeClock(START)
+    engine = make_engine({1: START + 30}, clock, [])
+    owned = {0}
+    engine.scope = lambda: (4, frozenset(owned))
+    engine._loaded_until = START
+    await engine.refill()
+    assert engine.repository.queries == [(START, START + 600, (4, frozenset({0})))]
+
+    await engine.load_shards({2: START - 15})
+    assert engine.repository.queries[-1] == (0, START + 600, (4, {2}))
+    assert len(engine) == 1
+
+
+@pytest.mark.asyncio
+async def test_claimed_shards_skip_reminders_that_are_being_fired():
+    release = asyncio.Event()
+    fired = []
+
+    async def fire(reminder_ids):
+        fired.append(reminder_ids)
+        await release.wait()
+
+    now = int(time.time())
+    engine = ReminderEngine(FakeRepository({1: now - 5, 2: now - 3}), fire, window_seconds=600, refill_interval=60)
+    engine.scope = lambda: (4, frozenset({0}))
+    await engine.start()
+    for _ in range(50):
+        if engine.firing:
+            break
+        await asyncio.sleep(0.01)
+    await engine.load_shards({2: now})
+    assert len(engine) == 0
+    release.set()
+    await asyncio.sleep(0.05)
+    await engine.stop()
+    assert fired == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_pop_due_skips_cancelled_and_rescheduled_entries():
+    clock = FakeClock(START)
+    engine = make_engine({1: START + 10, 2: START + 20, 3: START + 30}, clock, [])
+    engine._loaded_until = START
+    await engine.refill()
+    engine.cancel(2)
+    engine.schedule(3, START + 5)
+    engine.schedule(4, START + 5000)
+    assert engine.pop_due(START + 100) == [3, 1]
+    assert len(engine) == 0
+
+
+@pytest.mark.asyncio
+async def test_start_catches_up_overdue_reminders_in_bounded_batches():
+    clock = FakeClock(START)
+    trigger_times = {reminder_id: START - 3600 + reminder_id for reminder_id in range(1, 8)}
+    engine = make_engine(trigger_times, clock, [])
+    engine.max_batch = 3
+    engine._loaded_until = 0
+    await engine.refill()
+    assert engine.repository.queries == [(0, START + 600)]
+    assert engine.pop_due(START) == [1, 2, 3]
+    assert engine.pop_due(START) == [4, 5, 6]
+    assert engine.pop_due(START) == [7]
+
+
+@pytest.mark.asyncio
+async def test_lookahead_groups_reminders_due_within_the_window():
+    clock = FakeClock(START)
+    engine = make_engine({1: START, 2: START + 30, 3: START + 59, 4: START + 61}, clock, [])
+    engine.lookahead = 60
+    engine._loaded_until = START
+    await engine.refill()
+    assert engine.pop_due(START - 1) == []
+    engine.cancel(1)
+    assert engine.pop_due(START) == []
+    assert engine.pop_due(START + 30) == [2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_running_engine_fires_due_reminders():
+    fired = []
+    engine = make_engine({}, time.time, fired)
+    await engine.start()
+    now = int(engine.clock())
+    engine.schedule(7, now)
+    engine.schedule(8, now + 3600)
+    for _ in range(50):
+        if fired:
+            break
+        await asyncio.sleep(0.01)
+    await engine.stop()
+    assert fired == [7]
+
+
+@pytest.mark.asyncio
+async def test_pop_prefetch_returns_each_upcoming_reminder_once():
+    clock = FakeClock(START)
+    trigger_times = {1: START + 10, 2: START + 25, 3: START + 40, 4: START - 5}
+
+    async def prefetch(reminder_ids):
+        pass
+
+    engine = ReminderEngine(FakeRepository(trigger_times), None, window_seconds=600, refill_interval=60, clock=clock,
+                            prefetch=prefetch, prefetch_seconds=30)
+    engine._loaded_until = START - 60
+    await engine.refill()
+    engine.cancel(2)
+    assert engine.pop_prefetch(START) == [1]
+    assert engine.pop_prefetch(START) == []
+    engine.schedule(5, START + 20)
+    assert engine.pop_prefetch(START + 10) == [5, 3]
+    assert engine.pop_due(START + 40) == [4, 1, 5, 3]
+
+
+@pytest.mark.asyncio
+async def test_running_engine_prefetches_before_firing():
+    events = []
+
+    async def fire(reminder_ids):
+        events.append(("fire", reminder_ids))
+
+    async def prefetch(reminder_ids):
+        events.append(("prefetch", reminder_ids))
+
+    engine = ReminderEngine(FakeRepository({}), fire, window_seconds=600, refill_interval=60,
+                            prefetch=prefetch, prefetch_seconds=30)
+    await engine.start()
+    now = engine.clock()
+    engine.schedule(7, now + 0.2)
+    engine.schedule(8, now + 3600)
+    for _ in range(100):
+        if any(kind == "fire" for kind, _ in events):
+            break
+        await asyncio.sleep(0.01)
+    await engine.stop()
+    assert events == [("prefetch", [7]), ("fire", [7])]
@@ -0,0 +1,157 @@
+import multiprocessing
+import sqlite3
+
+import pytest
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.leases import LeaseManager, shard_of, sync_leases
+from remind.migrations import migrate
+from remind.repository import ReminderRepository
+
+SHARD_COUNT = 4
+TTL = 15.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def guild_on_shard(shard_id: int) -> str:
+    return str(shard_id << 22)
+
+
+@pytest_asyncio.fixture
+async def db_path(tmp_path):
+    return str(tmp_path / "reminders.db")
+
+
+@pytest_asyncio.fixture
+async def repositories(db_path):
+    repos = [ReminderRepository(db_path), ReminderRepository(db_path)]
+    for repo in repos:
+        await repo.open()
+    yield repos
+    for repo in repos:
+        await repo.close()
+
+
+def manager(repo, clock, preferred, owner):
+    return LeaseManager(repo, SHARD_COUNT, preferred=preferred, owner=owner, ttl=TTL, renew_interval=5.0, clock=clock)
+
+
+def test_shard_of_matches_discord_formula():
+    assert shard_of(guild_on_shard(3), SHARD_COUNT) == 3
+    assert shard_of("175928847299117063", 2) == (175928847299117063 >> 22) % 2
+
+
+async def started(repositories, clock):
+    a = manager(repositories[0], clock, {0, 1}, "a")
+    b = manager(repositories[1], clock, {2, 3}, "b")
+    await a.tick()
+    await b.tick()
+    clock.now += 5
+    await a.tick()
+    await b.tick()
+    return a, b
+
+
+@pytest.mark.asyncio
+async def test_processes_split_preferred_shards(repositories):
+    a, b = await started(repositories, FakeClock())
+    assert a.owned == {0, 1}
+    assert b.owned == {2, 3}
+    assert a.owns_guild(guild_on_shard(1)) and not a.owns_guild(guild_on_shard(2))
+
+
+@pytest.mark.asyncio
+async def test_first_process_covers_all_shards_until_others_start(repositories):
+    clock = FakeClock()
+    a = manager(repositories[0], clock, {0, 1}, "a")
+    await a.tick()
+    assert a.owned == {0, 1, 2, 3}
+
+    b = manager(repositories[1], clock, {2, 3}, "b")
+    await b.tick()
+    assert b.owned == set()
+    clock.now += 5
+    await a.tick()
+    assert a.owned == {0, 1}
+    await b.tick()
+    assert b.owned == {2, 3}
+
+
+@pytest.mark.asyncio
+async def test_dead_process_shards_are_taken_over_after_ttl(repositories):
+    clock = FakeClock()
+    a, b = await started(repositories, clock)
+    last_renewal = clock.now
+    clock.now += TTL - 1
+    await b.tick()
+    assert b.owned == {2, 3}
+
+    changes = []
+
+    async def on_change(claimed, lost):
+        changes.append((claimed, lost))
+
+    b.on_change = on_change
+    clock.now += 2
+    await b.tick()
+    assert b.owned == {0, 1, 2, 3}
+    assert changes == [({0: last_renewal, 1: last_renewal}, set())]
+    assert not a.owns_guild(guild_on_shard(0))
+
+
+@pytest.mark.asyncio
+async def test_stop_releases_leases_immediately(repositories):
+    clock = FakeClock()
+    a, b = await started(repositories, clock)
+    await a.stop()
+    assert a.owned == set()
+    await b.tick()
+    assert b.owned == {0, 1, 2, 3}
+
+
+@pytest.mark.asyncio
+async def test_due_query_filters_by_shard(repositories):
+    repo = repositories[0]
+    ids = {}
+    for shard_id in range(SHARD_COUNT):
+        ids[shard_id] = await repo.add("1", guild_on_shard(shard_id), "100", "channel", "100", "msg",
+                                       1_700_000_100, False, None, "2024-01-01 00:00:00")
+    rows = await repo.list_due_between(1_700_000_000, 1_700_000_200, shards=(SHARD_COUNT, {1, 3}))
+    assert sorted(row["id"] for row in rows) == [ids[1], ids[3]]
+    assert await repo.list_due_between(1_700_000_000, 1_700_000_200, shards=(SHARD_COUNT, set())) == []
+
+
+def _claim_in_process(path, owner, queue):
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    owned, _ = sync_leases(conn, owner, frozenset(), SHARD_COUNT, 1_700_000_000.0, TTL)
+    queue.put((owner, sorted(owned)))
+    conn.close()
+
+
+def test_concurrent_processes_never_share_a_shard(tmp_path):
+    path = str(tmp_path / "reminders.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.close()
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=_claim_in_process, args=(path, f"p{i}", queue)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+    results = [queue.get(timeout=5) for _ in processes]
+    claimed = [shard_id for _, owned in results for shard_id in owned]
+    assert sorted(claimed) == list(range(SHARD_COUNT))
+
@@ -0,0 +1,29 @@
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.load_test import parse_args, run
+
+
+@pytest.mark.asyncio
+async def test_load_harness_delivers_every_seeded_reminder_once(tmp_path):
+    args = parse_args(["--reminders", "200", "--horizon", "5", "--overdue-ratio", "0.1", "--commands", "4",
+                       "--latency", "0", "--rate-limit-ratio", "0.05", "--retry-after", "0.01",
+                       "--timeout", "30", "--db", str(tmp_path / "load.db")])
+    result = await run(args)
+    assert result["completed"]
+    assert result["deliveries"] == result["expected_deliveries"] == 200 + 4 - 2
+    assert result["messages_sent"] >= 200
+    assert result["rest_calls"]["send_message"] == result["messages_sent"] + result["rate_limited"].get("send_message", 0)
+    assert set(result["fire_lag_seconds"]) == {"p50", "p95", "p99", "max"}
+    assert result["commands"]["latency_seconds"]["set"]["count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_load_harness_runs_against_the_memory_store(tmp_path):
+    args = parse_args(["--reminders", "100", "--horizon", "5", "--commands", "2", "--latency", "0",
+                       "--timeout", "30", "--storage", "memory", "--db", str(tmp_path / "unused.db")])
+    result = await run(args)
+    assert result["completed"] and result["deliveries"] == 100 + 2 - 1
+    assert not os.path.exists(tmp_path / "unused.db")
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.metrics import MetricsServer, Registry
+
+
+def test_render_uses_prometheus_text_format():
+    registry = Registry()
+    sends = registry.counter("sends_total", "sends", ("result",))
+    sends.inc("sent")
+    sends.inc("sent", amount=2)
+    sends.inc('bad "quote"')
+    lag = registry.histogram("lag_seconds", "lag", buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        lag.observe(value)
+    registry.gauge("pending", "pending", lambda: 7)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE sends_total counter" in lines
+    assert 'sends_total{result="sent"} 3.0' in lines
+    assert 'sends_total{result="bad \\"quote\\""} 1.0' in lines
+    assert 'lag_seconds_bucket{le="1.0"} 2.0' in lines
+    assert 'lag_seconds_bucket{le="5.0"} 3.0' in lines
+    assert 'lag_seconds_bucket{le="+Inf"} 4.0' in lines
+    assert "lag_seconds_sum 14.5" in lines
+    assert "lag_seconds_count 4.0" in lines
+    assert "pending 7.0" in lines
+
+
+def test_registry_returns_the_same_metric_and_rejects_kind_mismatch():
+    registry = Registry()
+    assert registry.counter("calls_total", "calls") is registry.counter("calls_total", "calls")
+    with pytest.raises(ValueError):
+        registry.histogram("calls_total", "calls")
+
+
+@pytest.mark.asyncio
+async def test_server_serves_metrics_over_http():
+    registry = Registry()
+    registry.counter("hits_total", "hits").inc()
+    server = MetricsServer(registry, "127.0.0.1", 0)
+    await server.start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        async def get(path):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+
+        response = await get("/metrics")
+        assert response.startswith("HTTP/1.1 200 OK")
+        assert "hits_total 1.0" in response
+        assert (await get("/")).startswith("HTTP/1.1 404")
+    finally:
+        await server.stop()
@@ -0,0 +1,104 @@
+import sqlite3
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.migrations import SCHEMA_VERSION, get_version, migrate
+from remind.repository import ACTIVE_PAGE_FOR_USER_SQL, DUE_BETWEEN_SQL, PRUNE_HISTORY_SQL, PURGE_TARGET_SQL, TARGETS_SQL
+from remind.timeutil import from_epoch, legacy_to_epoch
+
+
+def legacy_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            target_type TEXT NOT NULL,
+            target_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            trigger_time DATETIME NOT NULL,
+            is_recurring BOOLEAN NOT NULL DEFAULT 0,
+            recurrence_rule TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(
+        "INSERT INTO reminders (user_id, guild_id, channel_id, target_type, target_id, message, trigger_time) VALUES ('1', '10', '100', 'user', '1', 'msg', '2024-05-09 10:00:00')"
+    )
+    conn.commit()
+    return conn
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def test_migrate_fresh_database():
+    conn = sqlite3.connect(":memory:")
+    assert migrate(conn) == SCHEMA_VERSION
+    assert migrate(conn) == SCHEMA_VERSION
+
+
+def test_migrate_converts_legacy_trigger_time(tmp_path):
+    conn = legacy_database(str(tmp_path / "legacy.db"))
+    assert get_version(conn) == 0
+    migrate(conn)
+    trigger_time, next_fire, fire_count = conn.execute("SELECT trigger_time, next_fire_at, fire_count FROM reminders").fetchone()
+    assert trigger_time == next_fire == legacy_to_epoch("2024-05-09 10:00:00") == 1715216400
+    assert fire_count == 0
+
+
+def test_migrate_backfills_next_fire_at_for_recurring_rows(tmp_path):
+    conn = legacy_database(str(tmp_path / "legacy.db"))
+    conn.execute(
+        "INSERT INTO reminders (user_id, guild_id, channel_id, target_type, target_id, message, trigger_time, is_recurring, recurrence_rule) VALUES ('1', '10', '100', 'user', '1', 'daily', '2024-05-09 09:00:00', 1, 'FREQ=DAILY;BYHOUR=9;BYMINUTE=0')"
+    )
+    conn.commit()
+    migrate(conn)
+    next_fire, = conn.execute("SELECT next_fire_at FROM reminders WHERE is_recurring = 1").fetchone()
+    assert next_fire > time.time()
+    assert from_epoch(next_fire).strftime("%H:%M") == "09:00"
+
+
+def test_query_plans_use_indexes():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+
+    due = query_plan(conn, DUE_BETWEEN_SQL, (0, 600))
+    assert any("idx_reminders_next_fire" in step for step in due)
+    assert not any("TEMP B-TREE" in step for step in due)
+
+    active = query_plan(conn, ACTIVE_PAGE_FOR_USER_SQL, ("1", "10", 0, 0, 0, 11))
+    assert any("idx_reminders_owner" in step for step in active)
+    assert not any("TEMP B-TREE" in step for step in active)
+
+    owned = query_plan(conn, "DELETE FROM reminders WHERE id = ? AND user_id = ? AND guild_id = ?", (1, "1", "10"))
+    assert not any(step.startswith("SCAN") for step in owned)
+
+    purge = query_plan(conn, PURGE_TARGET_SQL, ("10", "channel", "100"))
+    assert any("idx_reminders_target" in step for step in purge)
+
+    targets = query_plan(conn, TARGETS_SQL, ())
+    assert any("COVERING INDEX idx_reminders_target" in step for step in targets)
+    assert not any("TEMP B-TREE" in step for step in targets)
+
+
+def test_each_index_is_created_once_in_its_final_shape(tmp_path):
+    conn = legacy_database(str(tmp_path / "legacy.db"))
+    migrate(conn)
+    indexes = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'reminders' AND sql IS NOT NULL"))
+    assert set(indexes) == {"idx_reminders_owner", "idx_reminders_next_fire", "idx_reminders_target", "idx_reminders_done"}
+    assert indexes["idx_reminders_owner"].endswith("(user_id, guild_id, next_fire_at)")
+    assert indexes["idx_reminders_next_fire"].endswith("WHERE paused_at IS NULL")
+
+
+def test_history_prune_uses_the_recorded_at_index():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    plan = query_plan(conn, PRUNE_HISTORY_SQL, (0, 500))
+    assert any("idx_history_recorded" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
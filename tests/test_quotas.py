@@ -0,0 +1,157 @@
+import sqlite3
+
+import pytest
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.migrations import migrate
+from remind.quotas import QuotaExceeded, Quotas, shortest_interval
+from remind.repository import ReminderRepository
+
+NOW = 1_700_000_000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest_asyncio.fixture
+async def repository(tmp_path):
+    repo = ReminderRepository(str(tmp_path / "reminders.db"))
+    await repo.open()
+    yield repo
+    await repo.close()
+
+
+async def add(repo, user_id="1", guild_id="10", check=None):
+    return await repo.add(user_id, guild_id, "100", "user", user_id, "msg", NOW, False, None, "2024-01-01 00:00:00",
+                          check=check)
+
+
+def test_shortest_interval_finds_the_tightest_gap():
+    assert shortest_interval("FREQ=DAILY;BYHOUR=9;BYMINUTE=0", NOW) == 86400
+    assert shortest_interval("FREQ=DAILY;BYHOUR=9;BYMINUTE=0,1,30", NOW) == 60
+    assert shortest_interval("FREQ=DAILY;COUNT=1", NOW) is None
+
+
+def test_check_rule_rejects_short_intervals():
+    quotas = Quotas(min_interval=300)
+    quotas.check_rule("FREQ=WEEKLY;BYDAY=MO", NOW)
+    with pytest.raises(QuotaExceeded) as excinfo:
+        quotas.check_rule("FREQ=DAILY;BYMINUTE=0,1", NOW)
+    assert excinfo.value.kind == "interval"
+
+
+def test_admit_limits_creations_per_user():
+    clock = FakeClock()
+    quotas = Quotas(creation_rate=2, creation_per=60, clock=clock)
+    quotas.admit("1")
+    quotas.admit("1")
+    quotas.admit("2")
+    with pytest.raises(QuotaExceeded) as excinfo:
+        quotas.admit("1")
+    assert excinfo.value.kind == "rate" and excinfo.value.retry_after == 60
+    clock.now += 60
+    quotas.admit("1")
+
+
+def test_refund_returns_the_rate_token_of_a_rejected_creation():
+    clock = FakeClock()
+    quotas = Quotas(creation_rate=1, creation_per=60, clock=clock)
+    quotas.admit("1")
+    quotas.refund("1")
+    quotas.admit("1")
+    with pytest.raises(QuotaExceeded):
+        quotas.admit("1")
+    quotas.refund("2")
+
+
+def test_zero_limits_are_unlimited():
+    quotas = Quotas()
+    for _ in range(100):
+        quotas.admit("1")
+    quotas.check_usage(10 ** 6, 10 ** 6)
+    quotas.check_rule("FREQ=DAILY;BYMINUTE=0,1", NOW)
+    assert quotas.remaining_for_guild(10 ** 6) is None
+    assert quotas.remaining_for_user(10 ** 6) is None
+
+
+@pytest.mark.asyncio
+async def test_usage_counters_follow_inserts_and_deletes(repository):
+    ids = [await add(repository) for _ in range(3)]
+    await add(repository, user_id="2")
+    await add(repository, guild_id="20")
+    assert await repository.usage("1", "10") == (3, 4)
+    await repository.delete_many(ids[:2])
+    await repository.purge_targets([("10", "user", "2")])
+    assert await repository.usage("1", "10") == (1, 1)
+    assert await repository.usage("2", "10") == (0, 1)
+    rows = await repository._run(lambda: repository._conn.execute("SELECT COUNT(*) FROM reminder_counts").fetchone()[0])
+    assert rows == 2
+
+
+@pytest.mark.asyncio
+async def test_guild_counter_follows_done_and_reopened_rows(repository):
+    first = await add(repository)
+    await add(repository, user_id="2")
+
+    def set_next(reminder_id, value):
+        repository._conn.execute("UPDATE reminders SET next_fire_at = ? WHERE id = ?", (value, reminder_id))
+        repository._conn.commit()
+
+    def guild_rows():
+        return repository._conn.execute("SELECT guild_id, active FROM reminder_guild_counts").fetchall()
+
+    await repository._run(set_next, first, None)
+    assert await repository.usage("1", "10") == (0, 1)
+    await repository._run(set_next, first, NOW + 60)
+    assert await repository.usage("1", "10") == (1, 2)
+    await repository.delete_many([first])
+    await repository.purge_targets([("10", "user", "2")])
+    assert await repository.usage("1", "10") == (0, 0)
+    assert await repository._run(guild_rows) == []
+
+
+@pytest.mark.asyncio
+async def test_rows_inserted_as_done_are_not_counted(repository):
+    done = ("1", "10", "100", "user", "1", "msg", NOW, None, False, None, "2024-01-01 00:00:00", 1)
+    [reminder_id] = await repository.add_many([done])
+    await add(repository)
+    assert await repository.usage("1", "10") == (1, 1)
+    await repository.delete_many([reminder_id])
+    assert await repository.usage("1", "10") == (1, 1)
+    rows = await repository._run(lambda: repository._conn.execute("SELECT COUNT(*), SUM(active) FROM reminder_counts").fetchone())
+    assert tuple(rows) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_add_with_check_rolls_back_when_over_quota(repository):
+    quotas = Quotas(max_per_user=2, max_per_guild=3)
+    await add(repository, check=quotas.check_usage)
+    await add(repository, check=quotas.check_usage)
+    with pytest.raises(QuotaExceeded) as excinfo:
+        await add(repository, check=quotas.check_usage)
+    assert excinfo.value.kind == "user"
+    await add(repository, user_id="2", check=quotas.check_usage)
+    with pytest.raises(QuotaExceeded) as excinfo:
+        await add(repository, user_id="3", check=quotas.check_usage)
+    assert excinfo.value.kind == "guild"
+    assert await repository.usage("3", "10") == (0, 3)
+
+
+def test_migration_backfills_counters(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.execute("CREATE TABLE reminders (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, guild_id TEXT, channel_id TEXT, target_type TEXT, target_id TEXT, message TEXT, trigger_time DATETIME, is_recurring BOOLEAN, recurrence_rule TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.executemany(
+        "INSERT INTO reminders (user_id, guild_id, channel_id, target_type, target_id, message, trigger_time, is_recurring) VALUES (?, '10', '100', 'user', ?, 'm', '2099-01-01 00:00:00', 0)",
+        [("1", "1"), ("1", "1"), ("2", "2")])
+    conn.commit()
+    migrate(conn)
+    assert conn.execute("SELECT user_id, active FROM reminder_counts ORDER BY user_id").fetchall() == [("1", 2), ("2", 1)]
+    assert conn.execute("SELECT guild_id, active FROM reminder_guild_counts").fetchall() == [("10", 3)]
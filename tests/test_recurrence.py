@@ -0,0 +1,58 @@
+import pytest
+from datetime import datetime
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.recurrence import compile_rule, next_fire_at
+from remind.timeutil import TIMEZONE, from_epoch, to_epoch
+
+
+def epoch(*args):
+    return to_epoch(TIMEZONE.localize(datetime(*args)))
+
+
+def following(rule, dtstart, after, fire_count=0):
+    result = next_fire_at(rule, dtstart, after, fire_count)
+    return from_epoch(result).replace(tzinfo=None) if result is not None else None
+
+
+def test_daily_rule_uses_byhour_and_byminute():
+    start = epoch(2024, 5, 9, 10, 0)
+    assert following("FREQ=DAILY;BYHOUR=9;BYMINUTE=30", start, start) == datetime(2024, 5, 10, 9, 30)
+
+
+def test_weekly_byday_and_interval():
+    start = epoch(2024, 5, 6, 8, 0)
+    assert following("FREQ=WEEKLY;BYDAY=MO,WE", start, start) == datetime(2024, 5, 8, 8, 0)
+    assert following("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO", start, start) == datetime(2024, 5, 20, 8, 0)
+
+
+def test_monthly_skips_short_months_and_supports_negative_ordinals():
+    start = epoch(2024, 1, 31, 9, 0)
+    assert following("FREQ=MONTHLY;BYMONTHDAY=31", start, start) == datetime(2024, 3, 31, 9, 0)
+    assert following("FREQ=MONTHLY;BYDAY=-1FR", start, start) == datetime(2024, 2, 23, 9, 0)
+
+
+def test_yearly_leap_day():
+    start = epoch(2024, 2, 29, 9, 0)
+    assert following("FREQ=YEARLY", start, start) == datetime(2028, 2, 29, 9, 0)
+
+
+def test_catches_up_from_far_in_the_past():
+    start = epoch(2000, 1, 1, 9, 0)
+    assert following("FREQ=DAILY", start, epoch(2024, 5, 9, 12, 0)) == datetime(2024, 5, 10, 9, 0)
+
+
+def test_until_and_count_end_the_series():
+    start = epoch(2024, 5, 9, 9, 0)
+    assert following("FREQ=DAILY;UNTIL=20240510", start, start) == datetime(2024, 5, 10, 9, 0)
+    assert following("FREQ=DAILY;UNTIL=20240510", start, epoch(2024, 5, 10, 9, 0)) is None
+    assert following("FREQ=DAILY;COUNT=3", start, start, fire_count=2) is not None
+    assert following("FREQ=DAILY;COUNT=3", start, start, fire_count=3) is None
+
+
+@pytest.mark.parametrize("rule", ["", "FREQ=HOURLY", "FREQ=DAILY;BYHOUR=24", "FREQ=WEEKLY;BYDAY=XX", "FREQ=DAILY;INTERVAL=0", "FREQ"])
+def test_invalid_rules_raise_value_error(rule):
+    with pytest.raises(ValueError):
+        compile_rule(rule)
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+
+import pytest
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.migrations import migrate
+from remind.repository import ReminderRepository
+
+NOW = 1_700_000_000
+PAST = NOW - 3600
+FUTURE = NOW + 3600
+
+
+@pytest_asyncio.fixture
+async def repository(tmp_path):
+    repo = ReminderRepository(str(tmp_path / "data" / "reminders.db"))
+    await repo.open()
+    yield repo
+    await repo.close()
+
+
+async def add_reminder(repo, user_id="1", guild_id="10", trigger_time=FUTURE, is_recurring=False, rule=None):
+    return await repo.add(user_id, guild_id, "100", "user", user_id, "msg", trigger_time, is_recurring, rule, "2024-01-01 00:00:00")
+
+
+@pytest.mark.asyncio
+async def test_open_enables_wal(repository):
+    mode = await repository._run(lambda: repository._conn.execute("PRAGMA journal_mode").fetchone()[0])
+    assert mode == "wal"
+
+
+@pytest.mark.asyncio
+async def test_queries_run_off_the_event_loop_thread(repository):
+    thread_name = await repository._run(lambda: threading.current_thread().name)
+    assert thread_name.startswith("reminder-db")
+    assert thread_name != threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_add_get_delete(repository):
+    reminder_id = await add_reminder(repository)
+    row = await repository.get(reminder_id)
+    assert row["message"] == "msg"
+    assert await repository.delete(reminder_id) is True
+    assert await repository.get(reminder_id) is None
+    assert await repository.delete(reminder_id) is False
+
+
+@pytest.mark.asyncio
+async def test_range_queries_and_user_listing(repository):
+    future_id = await add_reminder(repository)
+    await add_reminder(repository, trigger_time=PAST)
+    recurring_id = await add_reminder(repository, trigger_time=PAST, is_recurring=True, rule="FREQ=DAILY;BYHOUR=9;BYMINUTE=0")
+    other_id = await add_reminder(repository, user_id="2")
+
+    due = [row["id"] for row in await repository.list_due_between(NOW, FUTURE)]
+    assert due == [future_id, other_id]
+    assert [row["id"] for row in await repository.list_due_between(PAST - 1, PAST)] == [recurring_id - 1, recurring_id]
+
+    listed = [row["id"] for row in await repository.list_active_page_for_user("1", "10", NOW)]
+    assert listed == [recurring_id, future_id]
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages(repository):
+    ids = [await add_reminder(repository, trigger_time=FUTURE + i // 2) for i in range(7)]
+    pages = []
+    cursor = None
+    while True:
+        page = await repository.list_active_page_for_user("1", "10", NOW, after=cursor, limit=3)
+        if not page:
+            break
+        pages.append([row["id"] for row in page])
+        cursor = (page[-1]["next_fire_at"], page[-1]["id"])
+    assert pages == [ids[0:3], ids[3:6], ids[6:7]]
+
+
+@pytest.mark.asyncio
+async def test_delete_owned_checks_owner(repository):
+    reminder_id = await add_reminder(repository)
+    assert await repository.delete_owned(reminder_id, "2", "10") is False
+    assert await repository.delete_owned(reminder_id, "1", "10") is True
+
+
+@pytest.mark.asyncio
+async def test_purge_guilds_and_targets_return_deleted_ids(repository):
+    kept = await add_reminder(repository, user_id="1", guild_id="10")
+    gone_guild = [await add_reminder(repository, user_id="2", guild_id="20") for _ in range(2)]
+    gone_user = await add_reminder(repository, user_id="3", guild_id="10")
+    assert sorted(await repository.purge_guilds(["20", "30"])) == gone_guild
+    assert await repository.purge_targets([("10", "user", "3"), ("10", "channel", "1")]) == [gone_user]
+    assert [(row["guild_id"], row["target_id"], row["reminders"]) for row in await repository.list_targets()] == [("10", "1", 1)]
+    assert (await repository.get(kept))["id"] == kept
+
+
+@pytest.mark.asyncio
+async def test_new_databases_use_incremental_auto_vacuum(repository):
+    assert await repository._run(lambda: repository._conn.execute("PRAGMA auto_vacuum").fetchone()[0]) == 2
+
+
+@pytest.mark.asyncio
+async def test_existing_databases_are_converted_only_when_vacuum_on_open(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.close()
+    for vacuum_on_open, expected in ((False, 0), (True, 2)):
+        repo = ReminderRepository(path, vacuum_on_open=vacuum_on_open)
+        await repo.open()
+        try:
+            assert await repo._run(lambda: repo._conn.execute("PRAGMA auto_vacuum").fetchone()[0]) == expected
+        finally:
+            await repo.close()
+
+
+@pytest.mark.asyncio
+async def test_prune_history_in_batches_then_vacuum(repository):
+    def fill():
+        with repository._conn:
+            repository._conn.executemany(
+                "INSERT INTO delivery_history (reminder_id, guild_id, user_id, fire_at, recorded_at, lag_ms, outcome) VALUES (?, '10', '1', ?, ?, 0, 'sent')",
+                [(i, NOW, NOW - 100 if i < 2500 else NOW) for i in range(3000)])
+
+    await repository._run(fill)
+    batches = []
+    while True:
+        deleted = await repository.prune_history(NOW - 50, batch_size=1000)
+        batches.append(deleted)
+        if deleted < 1000:
+            break
+    assert batches == [1000, 1000, 500]
+    count = await repository._run(lambda: repository._conn.execute("SELECT COUNT(*) FROM delivery_history").fetchone()[0])
+    assert count == 500
+
+    vacuumed, remaining = await repository.incremental_vacuum(5)
+    assert vacuumed == 5 and remaining > 0
+    vacuumed, remaining = await repository.incremental_vacuum(10_000)
+    assert vacuumed > 0 and remaining == 0
@@ -0,0 +1,137 @@
+import asyncio
+import time
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from types import SimpleNamespace
+
+from remind.send_queue import SendQueue, RateLimitBucket, is_global_limit
+
+
+class FakeRateLimited(Exception):
+    def __init__(self, retry_after, headers=None):
+        super().__init__("429 Too Many Requests")
+        self.status = 429
+        self.retry_after = retry_after
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FakeSender:
+    """宛先ごとに per 秒あたり rate 件を超えると429を返す偽の送信先"""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.history = {}
+        self.delivered = []
+        self.rejected = 0
+
+    def sender(self, route, content):
+        async def send():
+            now = time.monotonic()
+            recent = [t for t in self.history.get(route, []) if now - t < self.per]
+            if len(recent) >= self.rate:
+                self.rejected += 1
+                raise FakeRateLimited(self.per - (now - recent[0]))
+            recent.append(now)
+            self.history[route] = recent
+            self.delivered.append((route, content))
+            return content
+        return send
+
+
+def test_rate_limit_bucket_delay():
+    bucket = RateLimitBucket(2, 1.0)
+    assert bucket.delay(0.0) == 0
+    bucket.take(0.0)
+    bucket.take(0.2)
+    assert bucket.delay(0.5) == pytest.approx(0.5)
+    assert bucket.delay(1.0) == 0
+    bucket.take(1.0)
+    bucket.penalize(3.0)
+    assert bucket.delay(1.5) == pytest.approx(1.5)
+
+
+def test_rate_limit_bucket_reopens_when_retry_after_elapses():
+    bucket = RateLimitBucket(5, 5.0)
+    bucket.take(0.0)
+    bucket.penalize(0.1)
+    assert bucket.delay(0.05) == pytest.approx(0.05)
+    assert bucket.delay(0.1) == 0
+    bucket.take(0.1)
+    assert bucket.remaining == 4
+
+
+@pytest.mark.asyncio
+async def test_queue_paces_sends_within_route_limits():
+    fake = FakeSender(rate=2, per=0.1)
+    queue = SendQueue(route_rate=2, route_per=0.1, global_rate=100, global_per=0.1)
+    queue.start()
+    results = await asyncio.gather(*(queue.send("busy", fake.sender("busy", i)) for i in range(6)))
+    await queue.stop()
+    assert results == list(range(6))
+    assert fake.rejected == 0
+    stats = queue.stats()
+    assert stats["sent"] == 6 and stats["depth"] == 0
+    assert stats["latency_max"] >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_queue_interleaves_routes_and_retries_rate_limits():
+    fake = FakeSender(rate=1, per=0.05)
+    queue = SendQueue(route_rate=5, route_per=0.05, global_rate=100, global_per=0.05, max_attempts=10)
+    queue.start()
+    sends = [queue.send(route, fake.sender(route, i)) for i in range(3) for route in ("a", "b")]
+    await asyncio.gather(*sends)
+    await queue.stop()
+    assert fake.rejected > 0
+    assert queue.stats()["retried"] == fake.rejected
+    assert [route for route, _ in fake.delivered[:2]] in (["a", "b"], ["b", "a"])
+    assert sorted(fake.delivered) == sorted((route, i) for i in range(3) for route in ("a", "b"))
+
+
+@pytest.mark.asyncio
+async def test_queue_propagates_other_errors():
+    queue = SendQueue()
+    queue.start()
+
+    async def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await queue.send("x", broken)
+    await queue.stop()
+    assert queue.stats()["failed"] == 1
+
+
+def test_global_limits_are_recognized_from_headers():
+    assert is_global_limit(FakeRateLimited(1, {"X-RateLimit-Global": "true"}))
+    assert is_global_limit(FakeRateLimited(1, {"X-RateLimit-Scope": "global"}))
+    assert not is_global_limit(FakeRateLimited(1, {"X-RateLimit-Scope": "user"}))
+    assert not is_global_limit(ValueError("boom"))
+
+
+@pytest.mark.asyncio
+async def test_global_rate_limit_pauses_every_route():
+    sent = []
+    limited = []
+
+    async def first():
+        if not limited:
+            limited.append(time.monotonic())
+            raise FakeRateLimited(0.1, {"X-RateLimit-Global": "true"})
+        sent.append(("a", time.monotonic()))
+
+    async def other():
+        sent.append(("b", time.monotonic()))
+
+    queue = SendQueue(route_rate=5, route_per=0.05, global_rate=100, global_per=0.05)
+    queue.start()
+    task = asyncio.ensure_future(queue.send("a", first))
+    await asyncio.sleep(0.02)
+    await queue.send("b", other)
+    await task
+    await queue.stop()
+    assert all(at - limited[0] >= 0.09 for _, at in sent)
@@ -0,0 +1,73 @@
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_discord import FakeInteraction, FakeUser
+from remind.settings import Settings
+
+NOW = 1_700_000_000
+
+
+def test_custom_ids_encode_action_and_id_and_labels_follow_settings():
+    from remind.snooze import ACTIONS, CUSTOM_ID_TEMPLATE, action_labels, custom_id, format_delay
+
+    for action in ACTIONS:
+        match = re.fullmatch(CUSTOM_ID_TEMPLATE, custom_id(action, 42))
+        assert (match["action"], match["reminder_id"]) == (action, "42")
+    assert re.fullmatch(CUSTOM_ID_TEMPLATE, "remind:later:42") is None
+    assert [format_delay(seconds) for seconds in (600, 3600, 86400, 90)] == ["+10分", "+1時間", "+1日", "+90秒"]
+    assert list(action_labels(Settings(snooze_short_seconds=300, snooze_long_seconds=7200)).values()) == ["+5分", "+2時間", "明日", "完了"]
+
+
+@pytest.mark.asyncio
+async def test_action_view_is_not_kept_per_message():
+    from remind.snooze import action_view
+
+    view = action_view(Settings(), 7)
+    assert view.is_finished() and view.timeout is None
+    assert [item.item.custom_id for item in view.children] == ["remind:short:7", "remind:long:7", "remind:tomorrow:7", "remind:done:7"]
+
+
+def click(app, user_id):
+    interaction = FakeInteraction(FakeUser(None, user_id), None, None)
+    interaction.client = app
+    interaction.message = SimpleNamespace(content="リマインダー: msg")
+    return interaction
+
+
+@pytest.mark.asyncio
+async def test_buttons_snooze_and_dismiss_a_delivered_reminder(make_app):
+    from remind.snooze import ReminderActionButton
+
+    app = await make_app(snooze_short_seconds=600)
+    assert app.delivery.snoozable({'is_recurring': 0}) and not app.delivery.snoozable({'is_recurring': 1})
+    repository = app.repository
+    reminder_id = await repository.add("1", "10", "100", "user", "1", "msg", NOW, False, None, None)
+    await repository.claim_deliveries([(reminder_id, NOW, "k")], "a", "t", NOW, NOW - 300)
+    await repository.complete("t", [(reminder_id, "k", None)], NOW, retain=[reminder_id])
+
+    stranger = click(app, 2)
+    await ReminderActionButton("short", reminder_id).callback(stranger)
+    assert "作成者と宛先のユーザーだけ" in stranger.response.messages[0]
+    assert (await repository.get(reminder_id))["next_fire_at"] is None
+
+    owner = click(app, 1)
+    before = int(time.time())
+    await ReminderActionButton("short", reminder_id).callback(owner)
+    fire_at = (await repository.get(reminder_id))["next_fire_at"]
+    assert before + 600 <= fire_at <= int(time.time()) + 600
+    assert owner.response.edits[0]["view"] is None and "に再通知します" in owner.response.edits[0]["content"]
+    assert await repository.usage("1", "10") == (1, 1)
+
+    owner = click(app, 1)
+    await ReminderActionButton("done", reminder_id).callback(owner)
+    assert await repository.get(reminder_id) is None
+    assert owner.response.edits[0]["content"] == "リマインダー: msg\n(完了)"
+
+
+@pytest.mark.asyncio
+async def test_snooze_buttons_can_be_turned_off(make_app):
+    app = await make_app(snooze_enabled=False)
+    assert not app.delivery.snoozable({'is_recurring': 0})
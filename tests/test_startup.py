@@ -0,0 +1,49 @@
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.startup import measure_cold_start, measure_import
+from remind.settings import Settings
+
+
+def test_settings_from_env_parses_types_and_keeps_defaults():
+    settings = Settings.from_env({
+        "SHARD_COUNT": "4", "SHARD_IDS": "1, 3", "DIGEST_ENABLED": "Yes", "SEND_ROUTE_PER": "2.5",
+        "DISCORD_TEST_GUILD_ID": "", "PREFETCH_SECONDS": "", "UNRELATED": "x",
+    }, metrics_port=9100)
+    assert settings.shard_count == 4 and settings.shard_ids == (1, 3)
+    assert settings.digest_enabled is True and settings.send_route_per == 2.5
+    assert settings.discord_test_guild_id == "" and settings.prefetch_seconds == 30
+    assert settings.metrics_port == 9100 and settings.db_path == "data/reminders.db"
+
+
+def test_settings_from_env_rejects_invalid_values():
+    with pytest.raises(ValueError, match="DISPATCH_CONCURRENCY"):
+        Settings.from_env({"DISPATCH_CONCURRENCY": "ten"})
+
+
+@pytest.mark.parametrize("module", ["bot", "remind.settings", "remind.time_parser", "remind.recurrence", "remind.repository"])
+def test_entry_point_and_pure_modules_do_not_import_discord(module):
+    assert measure_import(module, 1)["imports_discord"] is False
+
+
+@pytest.mark.asyncio
+async def test_create_app_wires_components_without_connecting(tmp_path):
+    from remind.app import ShardedRemindBot, create_app
+
+    app = create_app(Settings(db_path=str(tmp_path / "reminders.db"), digest_enabled=True))
+    assert [command.name for command in app.tree.get_commands()] == ["remind"]
+    assert {command.name for command in app.remind_commands.commands} >= {"set", "list", "delete", "history", "import", "export", "help"}
+    assert app.engine.prefetch == app.delivery.prewarm_targets and app.dispatcher.deliver_digest is not None
+    assert app.lease_manager is None and not os.path.exists(tmp_path / "reminders.db")
+
+    sharded = create_app(Settings(db_path=str(tmp_path / "sharded.db"), shard_count=2, shard_ids=(1,), prefetch_seconds=0))
+    assert isinstance(sharded, ShardedRemindBot) and sharded.shard_ids == [1]
+    assert sharded.lease_manager is not None and sharded.engine.prefetch is None
+
+
+def test_cold_start_benchmark_reports_each_phase(tmp_path):
+    result = measure_cold_start(1, str(tmp_path))
+    assert set(result) == {"import_seconds", "build_seconds", "open_seconds", "seconds", "process_seconds"}
+    assert result["seconds"]["min"] <= result["process_seconds"]["min"]
@@ -0,0 +1,338 @@
+import pytest
+import pytest_asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.storage import measure_backend, parse_args
+from remind.leases import shard_of
+from remind.settings import Settings
+from remind.storage import BACKENDS, create_store
+
+NOW = 1_700_000_000
+PAST = NOW - 3600
+FUTURE = NOW + 3600
+RULE = "FREQ=DAILY;BYHOUR=9;BYMINUTE=0"
+
+
+@pytest_asyncio.fixture(params=BACKENDS)
+async def store(request, tmp_path):
+    repo = create_store(request.param, str(tmp_path / "reminders.db"))
+    await repo.open()
+    yield repo
+    await repo.close()
+
+
+async def add_reminder(repo, user_id="1", guild_id="10", trigger_time=FUTURE, is_recurring=False, target=("user", None)):
+    target_type, target_id = target
+    return await repo.add(user_id, guild_id, "100", target_type, target_id or user_id, "msg", trigger_time,
+                          is_recurring, RULE if is_recurring else None, "2024-01-01 00:00:00")
+
+
+def test_create_store_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="sqlite, memory"):
+        create_store("redis")
+
+
+def test_settings_select_the_backend():
+    assert Settings.from_env({"STORAGE_BACKEND": "memory"}).storage_backend == "memory"
+    assert Settings().storage_backend == "sqlite"
+
+
+@pytest.mark.asyncio
+async def test_add_get_and_get_many(store):
+    first = await add_reminder(store)
+    second = await add_reminder(store, user_id="2", is_recurring=True)
+    row = await store.get(second)
+    assert (row["user_id"], row["guild_id"], row["target_id"], row["message"]) == ("2", "10", "2", "msg")
+    assert row["is_recurring"] == 1 and row["recurrence_rule"] == RULE and row["fire_count"] == 0
+    assert row["trigger_time"] == row["next_fire_at"] == FUTURE
+    assert [row["id"] for row in await store.get_many([second, first, 999, first])] == [first, second]
+    assert await store.get(999) is None
+
+
+@pytest.mark.asyncio
+async def test_add_many_returns_contiguous_ids_and_guild_pages(store):
+    rows = [(str(index % 3), "20", "100", "channel", "100", f"m{index}", NOW, NOW, False, None, None, 0)
+            for index in range(7)]
+    ids = await store.add_many(rows)
+    assert ids == list(range(ids[0], ids[0] + 7))
+    first = await store.list_page_for_guild("20", limit=4)
+    rest = await store.list_page_for_guild("20", after_id=first[-1]["id"], limit=4)
+    assert [row["id"] for row in first + rest] == ids
+    assert [row["message"] for row in rest] == ["m4", "m5", "m6"]
+    assert await store.list_page_for_guild("21") == []
+
+
+@pytest.mark.asyncio
+async def test_due_range_is_half_open_sorted_and_shard_filtered(store):
+    guilds = [str((index + 1) << 22) for index in range(4)]
+    ids = {}
+    for offset, guild_id in zip((30, 10, 20, 0), guilds):
+        ids[guild_id] = await add_reminder(store, guild_id=guild_id, trigger_time=NOW + offset)
+    due = await store.list_due_between(NOW, NOW + 20)
+    assert [(row["id"], row["next_fire_at"]) for row in due] == [(ids[guilds[1]], NOW + 10), (ids[guilds[2]], NOW + 20)]
+    owned = await store.list_due_between(PAST, FUTURE, shards=(2, [1]))
+    assert [shard_of(guild_id, 2) for guild_id in guilds] == [1, 0, 1, 0]
+    assert [row["id"] for row in owned] == [ids[guilds[2]], ids[guilds[0]]]
+
+
+@pytest.mark.asyncio
+async def test_active_pages_skip_spent_one_shots(store):
+    await add_reminder(store, trigger_time=PAST)
+    recurring = await add_reminder(store, trigger_time=PAST, is_recurring=True)
+    upcoming = [await add_reminder(store, trigger_time=FUTURE) for _ in range(3)]
+    await add_reminder(store, user_id="2")
+    await add_reminder(store, guild_id="11")
+    page = await store.list_active_page_for_user("1", "10", NOW, limit=2)
+    assert [row["id"] for row in page] == [recurring, upcoming[0]]
+    cursor = (page[-1]["next_fire_at"], page[-1]["id"])
+    assert [row["id"] for row in await store.list_active_page_for_user("1", "10", NOW, cursor, limit=2)] == upcoming[1:]
+
+
+@pytest.mark.asyncio
+async def test_usage_counts_follow_inserts_and_deletes(store):
+    reminder_id = await add_reminder(store)
+    await add_reminder(store)
+    await add_reminder(store, user_id="2")
+    assert await store.usage("1", "10") == (2, 3)
+    assert await store.delete(reminder_id) is True and await store.delete(reminder_id) is False
+    assert await store.usage("1", "10") == (1, 2)
+    assert await store.usage("3", "99") == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_failed_check_does_not_insert(store):
+    def check(user_count, guild_count):
+        raise RuntimeError(f"{user_count}/{guild_count}")
+
+    await add_reminder(store)
+    with pytest.raises(RuntimeError, match="1/1"):
+        await store.add("1", "10", "100", "user", "1", "msg", FUTURE, False, None, None, check=check)
+    assert await store.usage("1", "10") == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_claim_complete_deletes_one_shots_and_advances_recurring(store):
+    once = await add_reminder(store, trigger_time=NOW)
+    daily = await add_reminder(store, trigger_time=NOW, is_recurring=True)
+    firings = [(once, NOW, f"{once}:{NOW}"), (daily, NOW, f"{daily}:{NOW}")]
+    assert await store.claim_deliveries(firings, "a", "t1", NOW, NOW - 300) == [once, daily]
+    assert await store.claim_deliveries(firings, "a", "t2", NOW, NOW - 300) == []
+
+    finished = [(once, f"{once}:{NOW}", None), (daily, f"{daily}:{NOW}", FUTURE)]
+    assert await store.complete("wrong", finished, NOW) == ([], [])
+    history = [(once, "10", "1", NOW, 5, "sent"), (daily, "10", "1", NOW, 7, "sent")]
+    assert await store.complete("t1", finished, NOW, history=history) == ([once], [(daily, FUTURE)])
+    assert await store.get(once) is None
+    row = await store.get(daily)
+    assert row["next_fire_at"] == FUTURE and row["fire_count"] == 1
+    assert [row["id"] for row in await store.list_due_between(PAST, FUTURE)] == [daily]
+    assert await store.claim_deliveries(firings, "a", "t3", NOW + 1, NOW) == []
+    assert [row["lag_ms"] for row in await store.history_for_user(daily, "1", "10")] == [7]
+
+    await store.complete("t3", [], NOW + 10, prune_before=NOW + 5)
+    assert await store.claim_deliveries(firings[1:], "a", "t4", NOW + 10, NOW) == [daily]
+
+
+@pytest.mark.asyncio
+async def test_claims_of_live_owners_hold_until_released_or_stale(store):
+    reminder_id = await add_reminder(store, trigger_time=NOW)
+    firing = [(reminder_id, NOW, "k")]
+    await store.sync_leases("a", [0], 1, NOW, 15)
+    assert await store.claim_deliveries(firing, "a", "t1", NOW, NOW - 300) == [reminder_id]
+    assert await store.claim_deliveries(firing, "b", "t2", NOW + 1, NOW - 300) == []
+
+    await store.release_deliveries(["k"], "other")
+    assert await store.claim_deliveries(firing, "b", "t2", NOW + 1, NOW - 300) == []
+    await store.release_deliveries(["k"], "t1")
+    assert await store.claim_deliveries(firing, "b", "t2", NOW + 1, NOW - 300) == [reminder_id]
+    assert await store.claim_deliveries(firing, "a", "t3", NOW + 2, NOW + 1) == [reminder_id]
+
+    await store.release_leases("a", NOW + 3)
+    assert await store.claim_deliveries(firing, "b", "t4", NOW + 3, NOW - 300) == [reminder_id]
+
+
+@pytest.mark.asyncio
+async def test_leases_are_shared_between_owners(store):
+    assert await store.sync_leases("a", [], 2, NOW, 15) == ({0, 1}, {0: NOW, 1: NOW})
+    assert await store.sync_leases("b", [1], 2, NOW, 15) == (set(), {})
+    assert await store.sync_leases("a", [], 2, NOW + 5, 15) == ({0}, {})
+    assert await store.sync_leases("b", [1], 2, NOW + 6, 15) == ({1}, {1: NOW - 10})
+    await store.release_leases("a", NOW + 7)
+    assert await store.sync_leases("b", [1], 2, NOW + 7, 15) == ({0, 1}, {0: NOW - 8})
+
+
+@pytest.mark.asyncio
+async def test_owner_and_bulk_deletes(store):
+    mine = await add_reminder(store)
+    theirs = await add_reminder(store, user_id="2")
+    assert await store.delete_owned(theirs, "1", "10") is False
+    assert await store.delete_owned(mine, "1", "11") is False
+    assert await store.delete_owned(mine, "1", "10") is True
+    extra = [await add_reminder(store) for _ in range(2)]
+    assert await store.delete_many([theirs, *extra, theirs, 999]) == 3
+    assert await store.usage("1", "10") == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_targets_are_counted_and_purged(store):
+    channel = [await add_reminder(store, target=("channel", "500")) for _ in range(2)]
+    member = await add_reminder(store, user_id="2", target=("user", "2"))
+    gone = await add_reminder(store, guild_id="11")
+    targets = {(row["guild_id"], row["target_type"], row["target_id"]): row["reminders"] for row in await store.list_targets()}
+    assert targets == {("10", "channel", "500"): 2, ("10", "user", "2"): 1, ("11", "user", "1"): 1}
+
+    assert sorted(await store.purge_targets([("10", "channel", "500"), ("10", "role", "1")])) == channel
+    assert await store.purge_guilds(["11", "12"]) == [gone]
+    assert [row["id"] for row in await store.get_many([member, gone, *channel])] == [member]
+    assert await store.usage("2", "10") == (1, 1) and await store.usage("1", "11") == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_history_is_newest_first_and_pruned_oldest_first(store):
+    reminder_id = await add_reminder(store, trigger_time=NOW, is_recurring=True)
+    for index in range(4):
+        fire_at = NOW + index
+        await store.claim_deliveries([(reminder_id, fire_at, f"k{index}")], "a", "t", fire_at, PAST)
+        await store.complete("t", [(reminder_id, f"k{index}", fire_at + 1)], fire_at,
+                             history=[(reminder_id, "10", "1", fire_at, index, "sent")])
+    assert [row["lag_ms"] for row in await store.history_for_user(reminder_id, "1", "10", limit=3)] == [3, 2, 1]
+    assert await store.history_for_user(reminder_id, "2", "10") == []
+
+    assert await store.prune_history(NOW + 2, batch_size=1) == 1
+    assert await store.prune_history(NOW + 2, batch_size=10) == 1
+    assert await store.prune_history(NOW + 2, batch_size=10) == 0
+    assert [row["lag_ms"] for row in await store.history_for_user(reminder_id, "1", "10")] == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_prune_history_skips_recent_rows_with_lower_ids(store):
+    reminder_id = await add_reminder(store, trigger_time=NOW, is_recurring=True)
+    for index, recorded_at in enumerate([NOW + 10, NOW + 11, NOW - 5, NOW - 6]):
+        await store.claim_deliveries([(reminder_id, NOW + index, f"k{index}")], "a", "t", recorded_at, PAST)
+        await store.complete("t", [(reminder_id, f"k{index}", NOW + 100)], recorded_at,
+                             history=[(reminder_id, "10", "1", NOW + index, index, "sent")])
+    assert await store.prune_history(NOW, batch_size=1) == 1
+    assert [row["lag_ms"] for row in await store.history_for_user(reminder_id, "1", "10")] == [2, 1, 0]
+    assert await store.prune_history(NOW, batch_size=2) == 1
+    assert [row["lag_ms"] for row in await store.history_for_user(reminder_id, "1", "10")] == [1, 0]
+    freed, remaining = await store.incremental_vacuum(10)
+    assert freed >= 0 and remaining >= 0
+
+
+@pytest.mark.asyncio
+async def test_backends_agree_in_the_storage_benchmark(tmp_path):
+    args = parse_args(["--reminders", "300", "--horizon", "600", "--users", "5", "--guilds", "2", "--batch", "50"])
+    results = [await measure_backend(backend, args, str(tmp_path)) for backend in BACKENDS]
+    assert [result["due"] for result in results] == [300, 300]
+    assert results[0]["remaining"] == results[1]["remaining"] > 0
+    assert set(results[1]["seconds"]) == {"insert", "scan", "dispatch", "list"}
+
+
+@pytest.mark.asyncio
+async def test_retained_one_shots_can_be_snoozed_or_dismissed(store):
+    kept = await add_reminder(store, trigger_time=NOW)
+    dropped = await add_reminder(store, trigger_time=NOW)
+    shared = await add_reminder(store, user_id="2", trigger_time=NOW, target=("user", "3"))
+    daily = await add_reminder(store, trigger_time=NOW, is_recurring=True)
+    firings = [(reminder_id, NOW, f"k{reminder_id}") for reminder_id in (kept, dropped, shared)]
+    await store.claim_deliveries(firings, "a", "t", NOW, PAST)
+    finished = [(reminder_id, key, None) for reminder_id, _, key in firings]
+    assert await store.complete("t", finished, NOW, retain=[kept, shared]) == ([kept, dropped, shared], [])
+
+    assert (await store.get(kept))["next_fire_at"] is None and await store.get(dropped) is None
+    assert await store.usage("1", "10") == (1, 1)
+    assert [row["id"] for row in await store.list_due_between(PAST, FUTURE)] == [daily]
+    assert [row["id"] for row in await store.list_active_page_for_user("1", "10", PAST)] == [daily]
+    assert [row["id"] for row in await store.list_page_for_guild("10")] == [daily]
+
+    assert await store.snooze(kept, "2", NOW + 600) is None
+    assert await store.snooze(daily, "1", NOW + 600) is None
+    assert await store.snooze(kept, "1", NOW + 600) == "10"
+    row = await store.get(kept)
+    assert row["next_fire_at"] == row["trigger_time"] == NOW + 600
+    assert [row["id"] for row in await store.list_due_between(NOW, FUTURE)] == [kept]
+    assert await store.usage("1", "10") == (2, 2)
+    assert await store.snooze(kept, "1", NOW + 60) == "10"
+    assert [row["next_fire_at"] for row in await store.list_due_between(NOW, FUTURE)] == [NOW + 60]
+
+    assert await store.dismiss(shared, "1") is False
+    assert await store.dismiss(shared, "3") is True
+    assert await store.dismiss(kept, "1") is True and await store.dismiss(kept, "1") is False
+    assert await store.usage("1", "10") == (1, 1) and await store.usage("2", "10") == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_retained_one_shots_are_pruned_after_the_snooze_window(store):
+    ids = [await add_reminder(store, trigger_time=NOW + offset) for offset in range(3)]
+    await store.claim_deliveries([(reminder_id, NOW + offset, f"k{reminder_id}") for offset, reminder_id in enumerate(ids)],
+                                 "a", "t", NOW, PAST)
+    await store.complete("t", [(reminder_id, f"k{reminder_id}", None) for reminder_id in ids], NOW + 5, retain=ids)
+    assert await store.prune_done(NOW + 2, batch_size=1) == 1
+    assert await store.prune_done(NOW + 2, batch_size=10) == 1
+    assert [row["id"] for row in await store.get_many(ids)] == ids[2:]
+    assert await store.usage("1", "10") == (0, 0)
+    assert [row["reminders"] for row in await store.list_targets()] == [1]
+
+
+@pytest.mark.asyncio
+async def test_complete_leaves_rows_edited_during_delivery(store):
+    once = await add_reminder(store, trigger_time=NOW)
+    snoozed = await add_reminder(store, trigger_time=NOW)
+    daily = await add_reminder(store, trigger_time=NOW, is_recurring=True)
+    firings = [(reminder_id, NOW, f"k{reminder_id}") for reminder_id in (once, snoozed, daily)]
+    await store.claim_deliveries(firings, "a", "t", NOW, PAST)
+    await store.update_owned(once, "1", "10", next_fire_at=FUTURE, trigger_time=FUTURE)
+    await store.snooze(snoozed, "1", FUTURE)
+    await store.update_owned(daily, "1", "10", next_fire_at=FUTURE + 60)
+    finished = [(once, f"k{once}", None), (snoozed, f"k{snoozed}", None), (daily, f"k{daily}", NOW + 86400)]
+    assert await store.complete("t", finished, NOW, retain=[snoozed]) == ([], [])
+    rows = await store.get_many([once, snoozed, daily])
+    assert [(row["next_fire_at"], row["fire_count"]) for row in rows] == [(FUTURE, 0), (FUTURE, 0), (FUTURE + 60, 0)]
+    assert await store.usage("1", "10") == (3, 3)
+
+
+@pytest.mark.asyncio
+async def test_delete_matching_applies_every_filter_to_the_owners_rows(store):
+    one_shot = await add_reminder(store)
+    recurring = await add_reminder(store, is_recurring=True)
+    channel = await add_reminder(store, target=("channel", "500"))
+    other_guild = await add_reminder(store, guild_id="11")
+    theirs = await add_reminder(store, user_id="2")
+    assert await store.delete_matching("1", "10", target=("channel", 500)) == [channel]
+    assert await store.delete_matching("1", "10", recurring=True) == [recurring]
+    assert await store.delete_matching("1", "10", contains="nothing") == []
+    assert await store.delete_matching("1", "10", contains="ms") == [one_shot]
+    assert [row["id"] for row in await store.get_many([other_guild, theirs])] == [other_guild, theirs]
+    assert await store.usage("1", "10") == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_update_owned_edits_in_place_and_pauses_out_of_due_scans(store):
+    reminder_id = await add_reminder(store, trigger_time=NOW + 10, is_recurring=True)
+    assert await store.update_owned(reminder_id, "2", "10", message="x") is None
+    with pytest.raises(ValueError):
+        await store.update_owned(reminder_id, "1", "10", target_id="2")
+
+    row = await store.update_owned(reminder_id, "1", "10", message="edited", next_fire_at=NOW + 20, is_recurring=True)
+    assert (row["id"], row["message"], row["next_fire_at"], row["is_recurring"]) == (reminder_id, "edited", NOW + 20, 1)
+    assert [row["id"] for row in await store.list_due_between(NOW, NOW + 30)] == [reminder_id]
+
+    assert (await store.update_owned(reminder_id, "1", "10", paused_at=NOW))["paused_at"] == NOW
+    assert await store.list_due_between(NOW, NOW + 30) == []
+    assert [row["paused_at"] for row in await store.list_active_page_for_user("1", "10", NOW)] == [NOW]
+    assert await store.usage("1", "10") == (1, 1)
+
+    await store.update_owned(reminder_id, "1", "10", paused_at=None, next_fire_at=NOW + 25)
+    assert [row["next_fire_at"] for row in await store.list_due_between(NOW, NOW + 30)] == [NOW + 25]
+
+
+@pytest.mark.asyncio
+async def test_done_rows_cannot_be_edited_or_bulk_deleted(store):
+    reminder_id = await add_reminder(store, trigger_time=NOW)
+    await store.claim_deliveries([(reminder_id, NOW, "k")], "a", "t", NOW, PAST)
+    await store.complete("t", [(reminder_id, "k", None)], NOW, retain=[reminder_id])
+    assert await store.update_owned(reminder_id, "1", "10", next_fire_at=FUTURE) is None
+    assert await store.delete_matching("1", "10") == []
+    assert (await store.get(reminder_id))["next_fire_at"] is None
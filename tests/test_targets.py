@@ -0,0 +1,86 @@
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from remind.targets import TargetResolver, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.dm_channel = None
+        self.create_dm_calls = 0
+
+    async def create_dm(self):
+        self.create_dm_calls += 1
+        return f"dm-{self.id}"
+
+
+class FakeGuild:
+    def __init__(self, members=()):
+        self.id = 10
+        self.members = {member.id: member for member in members}
+        self.fetch_calls = 0
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+    async def fetch_member(self, user_id):
+        self.fetch_calls += 1
+        return FakeUser(user_id)
+
+
+class FakeBot:
+    def get_user(self, user_id):
+        return None
+
+    def get_channel(self, channel_id):
+        return None
+
+
+def test_ttl_cache_expires_and_evicts():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    clock.now = 11
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_gateway_cache_hit_needs_no_rest_call():
+    member = FakeUser(1)
+    guild = FakeGuild([member])
+    resolver = TargetResolver(FakeBot())
+    assert await resolver.resolve_user(guild, 1) is member
+    assert guild.fetch_calls == 0
+    assert resolver.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fetched_users_and_dm_channels_are_cached_until_invalidated():
+    guild = FakeGuild()
+    resolver = TargetResolver(FakeBot())
+    user = await resolver.resolve_user(guild, 2)
+    assert await resolver.resolve_user(guild, 2) is user
+    assert await resolver.dm_channel(user) == "dm-2"
+    assert await resolver.dm_channel(user) == "dm-2"
+    assert guild.fetch_calls == 1
+    assert user.create_dm_calls == 1
+    assert resolver.stats()["rest_calls"] == 2
+
+    resolver.invalidate_user(2)
+    await resolver.resolve_user(guild, 2)
+    assert guild.fetch_calls == 2
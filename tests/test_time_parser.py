@@ -3,12 +3,10 @@ from datetime import datetime, timedelta
 import pytz
 from freezegun import freeze_time
 
-# テスト対象の関数を bot.py からインポート
-# bot.py がプロジェクトルートにあると仮定
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from bot import parse_time_string
+from remind.time_parser import parse_time_string
 
 # テストで使用するタイムゾーン
 TEST_TIMEZONE = pytz.timezone("Asia/Tokyo")
@@ -155,6 +153,13 @@ def test_parse_with_dateutil(now):
     assert r_next is False
     assert rl_next is None
 
+
+@freeze_time(FROZEN_TIME_STR)
+def test_ascii_forms_outside_the_grammar_fall_back_to_dateutil(now):
+    """文法で解釈できないASCIIの表現は dateutil に渡すこと"""
+    assert parse_time_string("2024/05/09", now) == (TEST_TIMEZONE.localize(datetime(2024, 5, 9, 10, 0)), False, None)
+    assert parse_time_string("10:00 2024/05/09", now) == (TEST_TIMEZONE.localize(datetime(2024, 5, 9, 10, 0)), False, None)
+
 @freeze_time(FROZEN_TIME_STR)
 def test_parse_invalid_format(now):
     """無効なフォーマットのテスト"""
@@ -162,3 +167,82 @@ def test_parse_invalid_format(now):
     assert parse_time_string("in 5 parsecs", now) == (None, False, None)
     assert parse_time_string("every 2 days at 10", now) == (None, False, None) # 未対応形式
     assert parse_time_string("tomorrow", now) == (None, False, None) # 時刻がない
+
+
+@freeze_time(FROZEN_TIME_STR)
+def test_parse_compound_relative(now):
+    """複合相対時刻 (in 1h30m, in 1 hour and 30 minutes) のテスト"""
+    assert parse_time_string("in 1h30m", now) == (now + timedelta(hours=1, minutes=30), False, None)
+    assert parse_time_string("in 1 hour and 30 minutes", now) == (now + timedelta(hours=1, minutes=30), False, None)
+    assert parse_time_string("in 2w", now) == (now + timedelta(weeks=2), False, None)
+
+
+@freeze_time(FROZEN_TIME_STR) # 2024-05-09 は木曜日 (weekday=3)
+def test_parse_weekday_and_meridiem(now):
+    """曜日指定と am/pm 表記のテスト"""
+    dt, recurring, rule = parse_time_string("next friday 9am", now)
+    assert dt == TEST_TIMEZONE.localize(datetime(2024, 5, 10, 9, 0))
+    assert recurring is False
+    assert rule is None
+
+    assert parse_time_string("next thursday at 11:00", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 16, 11, 0))
+    assert parse_time_string("thursday 11am", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 9, 11, 0))
+    assert parse_time_string("3pm tomorrow", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 10, 15, 0))
+    assert parse_time_string("12am", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 10, 0, 0))
+    assert parse_time_string("every sat at 10pm", now) == (
+        TEST_TIMEZONE.localize(datetime(2024, 5, 11, 22, 0)), True, "FREQ=WEEKLY;BYDAY=SA;BYHOUR=22;BYMINUTE=0")
+
+
+@freeze_time(FROZEN_TIME_STR)
+def test_parse_rejects_out_of_range_values(now):
+    """範囲外の時刻・日付のテスト"""
+    assert parse_time_string("25:00", now) == (None, False, None)
+    assert parse_time_string("2024/02/30 10:00", now) == (None, False, None)
+
+
+@freeze_time(FROZEN_TIME_STR) # 2024-05-09 は木曜日 (weekday=3)
+def test_parse_japanese_relative_and_day(now):
+    """日本語の相対時刻・日付指定のテスト"""
+    assert parse_time_string("30分後", now) == (now + timedelta(minutes=30), False, None)
+    assert parse_time_string("1時間半後", now) == (now + timedelta(hours=1, minutes=30), False, None)
+    assert parse_time_string("２日後に", now) == (now + timedelta(days=2), False, None)
+    assert parse_time_string("明日 10時", now) == (TEST_TIMEZONE.localize(datetime(2024, 5, 10, 10, 0)), False, None)
+    assert parse_time_string("明後日の午後3時半", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 11, 15, 30))
+    assert parse_time_string("9時", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 10, 9, 0))
+
+
+@freeze_time(FROZEN_TIME_STR) # 2024-05-09 は木曜日 (weekday=3)
+def test_parse_japanese_weekday_and_recurring(now):
+    """日本語の曜日指定・繰り返し指定のテスト"""
+    assert parse_time_string("来週金曜", now) == (TEST_TIMEZONE.localize(datetime(2024, 5, 17, 10, 0)), False, None)
+    assert parse_time_string("金曜 9時", now)[0] == TEST_TIMEZONE.localize(datetime(2024, 5, 10, 9, 0))
+    assert parse_time_string("毎週月曜 9:00", now) == (
+        TEST_TIMEZONE.localize(datetime(2024, 5, 13, 9, 0)), True, "FREQ=WEEKLY;BYDAY=MO;BYHOUR=9;BYMINUTE=0")
+    assert parse_time_string("毎日 18時半", now) == (
+        TEST_TIMEZONE.localize(datetime(2024, 5, 9, 18, 30)), True, "FREQ=DAILY;BYHOUR=18;BYMINUTE=30")
+
+
+@freeze_time(FROZEN_TIME_STR)
+def test_parse_japanese_invalid_does_not_fall_back(now, monkeypatch):
+    """日本語の不正な入力は dateutil に渡さずに失敗すること"""
+    import remind.time_parser as time_parser
+    monkeypatch.setattr(time_parser, "parse_with_dateutil", lambda *args: pytest.fail("dateutil fallback"))
+    assert parse_time_string("明日", now) == (None, False, None)
+    assert parse_time_string("来月の頭", now) == (None, False, None)
+    assert parse_time_string("午後13時", now) == (None, False, None)
+
+
+def test_common_forms_match_the_grammar():
+    """1回の照合で解釈する形式は文法による解析と同じ結果になること"""
+    from remind.time_parser import _Grammar, common_form, normalize, tokenize
+
+    expressions = [
+        "15:30", "0:00", "23:59", "in 30 minutes", "in 2h", "in 1 week", "in 45 secs", "today at 9:05",
+        "tomorrow at 14:00", "every day at 9:00", "every fri at 7:30", "every wednesday at 18:00",
+        "2024/12/31 23:59", "2024-1-2 3:04",
+    ]
+    for expression in expressions:
+        normalized = normalize(expression)
+        assert common_form(normalized) == _Grammar(tokenize(normalized)).parse(), expression
+    for expression in ("24:00", "9:60", "2024/02/30 10:00", "every day at 25:00"):
+        assert common_form(normalize(expression)) is None
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.legacy_time_parser import legacy_parse_time_string
+from remind.time_parser import compile_expression, normalize, parse_time_string, parse_with_dateutil
+from remind.timeutil import TIMEZONE
+
+NOW = TIMEZONE.localize(datetime(2024, 5, 9, 10, 0))
+EXPRESSIONS = [
+    "15:30",
+    "2024/12/31 23:59",
+    "in 30 minutes",
+    "in 2 hours",
+    "tomorrow at 14:00",
+    "every day at 9:00",
+    "every friday at 10:00",
+    "next friday at 3pm",
+]
+JAPANESE_EXPRESSIONS = [
+    "30分後",
+    "明日 10時",
+    "毎週月曜 9:00",
+    "毎日 18時半",
+    "来週金曜",
+]
+LEGACY_RESULTS = {
+    "15:30": ("2024-05-09T15:30:00+09:00", False, None),
+    "in 30 minutes": ("2024-05-09T10:30:00+09:00", False, None),
+    "in 2 hours": ("2024-05-09T12:00:00+09:00", False, None),
+    "tomorrow at 14:00": ("2024-05-10T14:00:00+09:00", False, None),
+    "every day at 9:00": ("2024-05-10T09:00:00+09:00", True, "FREQ=DAILY;BYHOUR=9;BYMINUTE=0"),
+    "every friday at 10:00": ("2024-05-10T10:00:00+09:00", True, "FREQ=WEEKLY;BYDAY=FR;BYHOUR=10;BYMINUTE=0"),
+}
+
+
+def parse_all(parse, expressions=EXPRESSIONS):
+    return [parse(expression, NOW) for expression in expressions]
+
+
+def uncached_parse(time_str, now):
+    spec = compile_expression.__wrapped__(normalize(time_str))
+    return spec.resolve(now) if spec is not None else parse_with_dateutil(time_str, now)
+
+
+PARSERS = [legacy_parse_time_string, uncached_parse, parse_time_string]
+PARSER_IDS = ["legacy", "compiled-uncached", "compiled-cached"]
+
+
+def test_compiled_parser_matches_legacy_outputs():
+    for expression, expected in LEGACY_RESULTS.items():
+        for parse in PARSERS:
+            trigger_time, is_recurring, rule = parse(expression, NOW)
+            assert (trigger_time.isoformat(), is_recurring, rule) == expected
+
+
+@pytest.mark.parametrize("parse", PARSERS, ids=PARSER_IDS)
+def test_benchmark_parse_time_string(benchmark, parse):
+    benchmark.group = "parse_time_string"
+    benchmark.extra_info["expressions"] = len(EXPRESSIONS)
+    results = benchmark(parse_all, parse)
+    assert len(results) == len(EXPRESSIONS)
+
+
+@pytest.mark.parametrize("parse", PARSERS, ids=PARSER_IDS)
+def test_benchmark_parse_japanese(benchmark, parse):
+    benchmark.group = "parse_time_string_ja"
+    benchmark.extra_info["expressions"] = len(JAPANESE_EXPRESSIONS)
+    results = benchmark(parse_all, parse, JAPANESE_EXPRESSIONS)
+    assert len(results) == len(JAPANESE_EXPRESSIONS)